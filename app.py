@@ -20,6 +20,26 @@ login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Please log in to access this page.'
 
+# Configure key store (MongoDB), key caches, key pair pool, background jobs, crypto log writer, log rollups, metrics, profiling and access decisions
+from utils.nosql_handler import init_key_store
+from utils.key_cache import init_key_cache
+from utils.keypair_pool import init_keypair_pool
+from utils.jobs import init_job_queue
+from utils.logger import init_crypto_log_writer
+from utils.rollups import init_rollups
+from utils.metrics import init_metrics
+from utils.profiling import init_profiling
+from utils.access_control import init_acl_cache
+init_key_store(app)
+init_key_cache(app)
+init_keypair_pool(app)
+init_job_queue(app)
+init_crypto_log_writer(app)
+init_rollups(app)
+init_metrics(app)
+init_profiling(app)
+init_acl_cache(app)
+
 # --- PERUBAHAN DI SINI ---
 # IMPORTANT: Import all models here so Flask-Migrate can detect them!
 # Must be AFTER db is initialized
@@ -42,6 +62,7 @@ from routes.files import files_bp
 # Import route blueprints
 from routes.access import access_bp
 from routes.connections import connections_bp
+from routes.metrics import metrics_bp
 
 app.register_blueprint(auth_bp)
 app.register_blueprint(main_bp)
@@ -49,6 +70,7 @@ app.register_blueprint(files_bp)
 app.register_blueprint(performance_bp)
 app.register_blueprint(access_bp)
 app.register_blueprint(connections_bp)
+app.register_blueprint(metrics_bp)
 
 if __name__ == '__main__':
     print("🚀 Starting Flask development server...")
@@ -24,4 +24,81 @@ class Config:
     # Upload configuration
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'static/uploads'
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16777216))
+    # Chunk size for streaming encryption to disk (keeps upload memory flat)
+    ENCRYPTION_CHUNK_SIZE = int(os.environ.get('ENCRYPTION_CHUNK_SIZE', 65536))
+    
+    # Chunked AES-GCM container (format version 2) for new AES uploads
+    CONTAINER_FORMAT_ENABLED = os.environ.get('CONTAINER_FORMAT_ENABLED', 'true').lower() == 'true'
+    CONTAINER_CHUNK_SIZE = int(os.environ.get('CONTAINER_CHUNK_SIZE', 1048576))
+    CONTAINER_WORKERS = int(os.environ.get('CONTAINER_WORKERS', 0)) or None  # None = one per core
+    
+    # Excel sheets above either threshold are parsed in streaming mode (values only, bounded memory)
+    EXCEL_STREAMING_ROW_THRESHOLD = int(os.environ.get('EXCEL_STREAMING_ROW_THRESHOLD', 50000))  # 0 = off
+    EXCEL_STREAMING_CELL_THRESHOLD = int(os.environ.get('EXCEL_STREAMING_CELL_THRESHOLD', 500000))  # 0 = off
+    
+    # Background jobs (Excel parsing): 'thread' = local thread pool, 'sync' = run inside the request
+    JOB_QUEUE_MODE = os.environ.get('JOB_QUEUE_MODE', 'thread')
+    JOB_QUEUE_WORKERS = int(os.environ.get('JOB_QUEUE_WORKERS', 2))
+    JOB_QUEUE_MAX_PENDING = int(os.environ.get('JOB_QUEUE_MAX_PENDING', 32))  # beyond this, jobs run inline
+    # Excel jobs still unfinished this long after upload were lost in a restart -> 'failed' (0 = off).
+    # Checked on the first request of each worker process and by `flask fail-stale-jobs`
+    JOB_STALE_AFTER = int(os.environ.get('JOB_STALE_AFTER', 3600))  # seconds
+    
+    # Crypto log writer: 'buffered' = ring buffer + background batch inserts, 'sync' = insert immediately
+    CRYPTO_LOG_MODE = os.environ.get('CRYPTO_LOG_MODE', 'buffered')
+    CRYPTO_LOG_BUFFER_SIZE = int(os.environ.get('CRYPTO_LOG_BUFFER_SIZE', 10000))  # oldest rows dropped beyond this
+    CRYPTO_LOG_BATCH_SIZE = int(os.environ.get('CRYPTO_LOG_BATCH_SIZE', 500))
+    CRYPTO_LOG_FLUSH_INTERVAL = float(os.environ.get('CRYPTO_LOG_FLUSH_INTERVAL', 1.0))  # seconds
+    
+    # In-process metrics served at /metrics (Prometheus text format)
+    # METRICS_DIR: shared directory for per-process snapshots. REQUIRED for multi-process servers
+    # (gunicorn -w N): when empty, /metrics only reports the worker that answered the scrape
+    METRICS_DIR = os.environ.get('METRICS_DIR', '')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5.0))  # seconds
+    # METRICS_TOKEN: scrapers must send "Authorization: Bearer <METRICS_TOKEN>". When unset,
+    # /metrics answers 403 (it exposes operation counts and byte totals) unless METRICS_PUBLIC=true
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_PUBLIC = os.environ.get('METRICS_PUBLIC', 'false').lower() == 'true'
+    
+    # Opt-in request profiling: Server-Timing header + sampled slow-request log (exposes timings to clients)
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILING_SLOW_REQUEST_MS = float(os.environ.get('PROFILING_SLOW_REQUEST_MS', 500))
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 1.0))  # fraction of slow requests logged
+    
+    # Access decision cache (file downloads, profile listings); writes invalidate it in the
+    # handling process, other workers catch up within the TTL
+    ACL_CACHE_TTL = int(os.environ.get('ACL_CACHE_TTL', 30))  # seconds, 0 = off
+    ACL_CACHE_SIZE = int(os.environ.get('ACL_CACHE_SIZE', 4096))
+    
+    # Unlocked private-key cache (in process memory only, wiped on logout)
+    PRIVATE_KEY_CACHE_TTL = int(os.environ.get('PRIVATE_KEY_CACHE_TTL', 300))  # seconds
+    PRIVATE_KEY_CACHE_SIZE = int(os.environ.get('PRIVATE_KEY_CACHE_SIZE', 128))
+    
+    # Parsed public-key cache; optional shared tier: '' (off), 'local' or 'redis://host:6379/0'
+    PUBLIC_KEY_CACHE_TTL = int(os.environ.get('PUBLIC_KEY_CACHE_TTL', 3600))  # seconds
+    PUBLIC_KEY_CACHE_SIZE = int(os.environ.get('PUBLIC_KEY_CACHE_SIZE', 1024))
+    PUBLIC_KEY_SHARED_CACHE_URL = os.environ.get('PUBLIC_KEY_SHARED_CACHE_URL', '')
+    
+    # Background pool of pre-generated RSA key pairs for registration.
+    # Only used when KEY_WRAP_SCHEME = 'RSA-OAEP', and not under `python app.py`
+    # (the pool's spawned worker would re-import app.py as __main__)
+    KEYPAIR_POOL_ENABLED = os.environ.get('KEYPAIR_POOL_ENABLED', 'true').lower() == 'true'
+    KEYPAIR_POOL_SIZE = int(os.environ.get('KEYPAIR_POOL_SIZE', 8))
+    KEYPAIR_POOL_REFILL_INTERVAL = float(os.environ.get('KEYPAIR_POOL_REFILL_INTERVAL', 0))  # seconds
+    
+    # Key wrapping scheme for new users: 'X25519-HKDF-AESGCM' or 'RSA-OAEP'
+    KEY_WRAP_SCHEME = os.environ.get('KEY_WRAP_SCHEME', 'X25519-HKDF-AESGCM')
+    
+    # MongoDB key store (client is created lazily in each worker process)
+    MONGO_URI = os.environ.get('MONGO_URI') or 'mongodb://localhost:27017/'
+    MONGO_DB_NAME = os.environ.get('MONGO_DB_NAME') or 'secure_file_exchange_keystore'
+    MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 50))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 0)) or None  # None = no timeout
+    # 'primary' keeps read-after-write consistency (upload -> download)
+    MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+    MONGO_CREATE_INDEXES = os.environ.get('MONGO_CREATE_INDEXES', 'true').lower() == 'true'
+    
     ALLOWED_EXTENSIONS = set(os.environ.get('ALLOWED_EXTENSIONS', 'xlsx,xls,png,jpg,jpeg,gif').split(','))
\ No newline at end of file
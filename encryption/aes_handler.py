@@ -1,8 +1,12 @@
 import os
-import time
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.backends import default_backend
+from encryption.stream import (
+    CipherStream, transform_stream, transform_range, seek_cbc_block, DEFAULT_CHUNK_SIZE
+)
+from encryption.batch import cbc_encrypt_batch
+from encryption.timing import PhaseTimer
 
 class AESHandler:
     def __init__(self, key):
@@ -14,24 +18,117 @@ class AESHandler:
         self.key = key if isinstance(key, bytes) else key.encode()
         if len(self.key) not in [16, 24, 32]:
             raise ValueError("Key must be 16, 24, or 32 bytes")
+        # PhaseTimer dari encrypt/decrypt/encrypt_batch terakhir (setup, cipher, padding)
+        self.last_timing = None
     
     def encrypt(self, data):
-        start_time = time.time()
+        timer = PhaseTimer()
         iv = os.urandom(16)
         cipher = Cipher(algorithms.AES(self.key), modes.CBC(iv), backend=default_backend())
         encryptor = cipher.encryptor()
         padder = padding.PKCS7(128).padder()
+        timer.mark('setup')
         padded_data = padder.update(data) + padder.finalize()
+        timer.mark('padding')
         ciphertext = encryptor.update(padded_data) + encryptor.finalize()
-        encryption_time = time.time() - start_time
-        return ciphertext, iv, encryption_time
+        timer.mark('cipher')
+        self.last_timing = timer
+        return ciphertext, iv, timer.elapsed
+    
+    def encrypt_batch(self, payloads):
+        """
+        Encrypt many small payloads (e.g. Excel cells) in one call.
+        Each result is what encrypt() would return for that payload (own IV, AES-CBC, PKCS7).
+        Returns (ciphertexts, ivs, encryption_time)
+        """
+        timer = PhaseTimer()
+        encryptor = Cipher(algorithms.AES(self.key), modes.ECB(), backend=default_backend()).encryptor()
+        iv_blob = os.urandom(16 * len(payloads))
+        timer.mark('setup')
+        ciphertexts, ivs = cbc_encrypt_batch(encryptor.update, 16, payloads, iv_blob, timer)
+        self.last_timing = timer
+        return ciphertexts, ivs, timer.elapsed
+    
+    def init_encrypt(self):
+        """
+        Start an incremental AES-CBC encryption.
+        Returns a CipherStream (update/finalize); PKCS7 padding is applied on finalize.
+        """
+        timer = PhaseTimer()
+        iv = os.urandom(16)
+        cipher = Cipher(algorithms.AES(self.key), modes.CBC(iv), backend=default_backend())
+        encryptor = cipher.encryptor()
+        padder = padding.PKCS7(128).padder()
+        
+        def update(chunk):
+            return encryptor.update(padder.update(chunk))
+        
+        def finalize():
+            return encryptor.update(padder.finalize()) + encryptor.finalize()
+        
+        return CipherStream(update, finalize, iv=iv, timer=timer)
+    
+    def encrypt_stream(self, file_obj, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Generator form of encrypt() over any file-like object.
+        Returns (stream, chunks): stream.iv and stream.elapsed are valid once chunks is exhausted.
+        """
+        stream = self.init_encrypt()
+        return stream, transform_stream(stream, file_obj, chunk_size)
+    
+    def init_decrypt(self, iv):
+        """
+        Start an incremental AES-CBC decryption.
+        The unpadder holds back the last block, so padding is only stripped on finalize.
+        """
+        timer = PhaseTimer()
+        cipher = Cipher(algorithms.AES(self.key), modes.CBC(iv), backend=default_backend())
+        decryptor = cipher.decryptor()
+        unpadder = padding.PKCS7(128).unpadder()
+        
+        def update(chunk):
+            return unpadder.update(decryptor.update(chunk))
+        
+        def finalize():
+            return unpadder.update(decryptor.finalize()) + unpadder.finalize()
+        
+        return CipherStream(update, finalize, iv=iv, timer=timer)
+    
+    def decrypt_stream(self, file_obj, iv, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Generator form of decrypt() over any file-like object.
+        Returns (stream, chunks) like encrypt_stream().
+        """
+        stream = self.init_decrypt(iv)
+        return stream, transform_stream(stream, file_obj, chunk_size)
+    
+    def decrypt_range(self, file_obj, iv, start, end, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Decrypt only plaintext bytes [start, end] (inclusive) of a seekable CBC file.
+        Seeks to the block holding `start` and uses the preceding ciphertext block as IV.
+        Returns (stream, chunks) like decrypt_stream().
+        """
+        block_start, block_iv = seek_cbc_block(file_obj, iv, start, 16)
+        timer = PhaseTimer()
+        cipher = Cipher(algorithms.AES(self.key), modes.CBC(block_iv), backend=default_backend())
+        decryptor = cipher.decryptor()
+        stream = CipherStream(decryptor.update, decryptor.finalize, iv=block_iv, timer=timer)
+        # Baca blok utuh sampai blok yang memuat byte `end`
+        read_length = (end // 16 + 1) * 16 - block_start
+        chunks = transform_range(
+            stream, file_obj, read_length, start - block_start, end - start + 1, chunk_size, align=16
+        )
+        return stream, chunks
     
     def decrypt(self, ciphertext, iv):
-        start_time = time.time()
+        timer = PhaseTimer()
         cipher = Cipher(algorithms.AES(self.key), modes.CBC(iv), backend=default_backend())
         decryptor = cipher.decryptor()
-        padded_data = decryptor.update(ciphertext) + decryptor.finalize()
         unpadder = padding.PKCS7(128).unpadder()
+        timer.mark('setup')
+        padded_data = decryptor.update(ciphertext) + decryptor.finalize()
+        timer.mark('cipher')
         data = unpadder.update(padded_data) + unpadder.finalize()
-        decryption_time = time.time() - start_time
-        return data, decryption_time
\ No newline at end of file
+        timer.mark('padding')
+        self.last_timing = timer
+        return data, timer.elapsed
\ No newline at end of file
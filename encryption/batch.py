@@ -0,0 +1,86 @@
+"""
+Batch encryption of many small payloads (e.g. Excel cells)
+Produces exactly the same per-payload format as handler.encrypt(), but
+amortizes cipher setup, draws all IVs in one os.urandom() call and runs
+CBC for every payload in lock-step through a single ECB call per block round.
+"""
+
+
+def _xor_bytes(a, b):
+    """XOR two equal-length byte strings using big-int arithmetic (fast in CPython)"""
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+
+def pkcs7_pad(data, block_size):
+    pad_len = block_size - (len(data) % block_size)
+    return data + bytes([pad_len]) * pad_len
+
+
+def cbc_encrypt_batch(ecb_encrypt, block_size, payloads, iv_blob, timer=None):
+    """
+    CBC-encrypt each payload with its own IV, vectorized across payloads.
+
+    Round k XORs block k of every payload that still has one with its chain
+    value (IV or previous ciphertext block) and encrypts all of them with one
+    ECB call, so the number of cipher calls equals the longest payload's
+    block count instead of the number of payloads.
+
+    Args:
+        ecb_encrypt (callable): Raw block encryption (ECB) of a multiple of block_size
+        block_size (int): Cipher block size in bytes
+        payloads (list): Plaintext bytes per payload
+        iv_blob (bytes): len(payloads) * block_size random bytes
+        timer (PhaseTimer, optional): Receives the padding and cipher phases
+
+    Returns:
+        tuple: (ciphertexts, ivs) lists in payload order
+    """
+    padded = [pkcs7_pad(data, block_size) for data in payloads]
+    if timer is not None:
+        timer.mark('padding')
+    ivs = [iv_blob[i * block_size:(i + 1) * block_size] for i in range(len(padded))]
+    chain = list(ivs)
+    output = [[] for _ in padded]
+
+    # Urutkan dari yang terpanjang agar payload aktif selalu berupa prefix
+    order = sorted(range(len(padded)), key=lambda i: len(padded[i]), reverse=True)
+    active = len(order)
+    block_round = 0
+    while active:
+        offset = block_round * block_size
+        while active and len(padded[order[active - 1]]) <= offset:
+            active -= 1
+        if not active:
+            break
+        current = order[:active]
+        plain = b''.join(padded[i][offset:offset + block_size] for i in current)
+        chained = b''.join(chain[i] for i in current)
+        encrypted = ecb_encrypt(_xor_bytes(plain, chained))
+        for position, i in enumerate(current):
+            block = encrypted[position * block_size:(position + 1) * block_size]
+            output[i].append(block)
+            chain[i] = block
+        block_round += 1
+
+    ciphertexts = [b''.join(blocks) for blocks in output]
+    if timer is not None:
+        timer.mark('cipher')
+    return ciphertexts, ivs
+
+
+def keystream_encrypt_batch(keystream_func, payloads):
+    """
+    Encrypt each payload with the same fresh keystream prefix (stream cipher
+    restarted per payload, as RC4Handler.encrypt() does per call).
+
+    Args:
+        keystream_func (callable): keystream_func(length) -> keystream bytes
+        payloads (list): Plaintext bytes per payload
+
+    Returns:
+        list: Ciphertext per payload
+    """
+    if not payloads:
+        return []
+    keystream = keystream_func(max(len(data) for data in payloads))
+    return [_xor_bytes(data, keystream[:len(data)]) if data else b'' for data in payloads]
@@ -0,0 +1,279 @@
+"""
+Chunked authenticated container format for encrypted files (format version 2)
+Each chunk is encrypted independently with AES-256-GCM, so chunks can be
+encrypted/decrypted in parallel on a thread pool or read on their own.
+
+Layout:
+    header       32 bytes  (see HEADER_FORMAT)
+    chunk table  4 bytes per chunk (ciphertext length of each chunk, big-endian)
+    chunks       ciphertext || 16-byte GCM tag, in order
+
+Nonce per chunk = nonce_prefix (8 random bytes) || chunk index (4 bytes).
+The full header is used as associated data, so chunks cannot be moved
+between files and a truncated/re-sized container fails authentication.
+"""
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from encryption.timing import PhaseTimer
+
+# Versi format file di disk (disimpan di kolom File.format_version)
+LEGACY_FORMAT_VERSION = 1      # satu stream CBC/RC4, IV di kolom File.iv
+CONTAINER_FORMAT_VERSION = 2   # container ini
+
+MAGIC = b'SFEC'
+ALGORITHM_AES_GCM = 1
+TAG_SIZE = 16
+DEFAULT_CONTAINER_CHUNK_SIZE = 1024 * 1024  # 1 MB plaintext per chunk
+
+# magic, version, algorithm, reserved, chunk_size, plain_size, chunk_count, nonce_prefix
+HEADER_FORMAT = '>4sBBHIQI8s'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+TABLE_ENTRY_FORMAT = '>I'
+TABLE_ENTRY_SIZE = struct.calcsize(TABLE_ENTRY_FORMAT)
+
+
+class ContainerError(Exception):
+    """Raised when a container is malformed or fails authentication"""
+
+
+def default_workers():
+    """Default thread pool size: one worker per core, capped at 8"""
+    return min(8, os.cpu_count() or 1)
+
+
+def _chunk_nonce(nonce_prefix, index):
+    return nonce_prefix + struct.pack('>I', index)
+
+
+def _read_exact(file_obj, size):
+    """read() may return short reads on streams; loop until size bytes are read"""
+    data = file_obj.read(size)
+    while len(data) < size:
+        more = file_obj.read(size - len(data))
+        if not more:
+            raise ContainerError("Source ended before the declared size")
+        data += more
+    return data
+
+
+class ContainerEncryptor:
+    """
+    Encrypts a file-like object into the container format.
+
+    Usage:
+        encryptor = ContainerEncryptor(key, plain_size)
+        for block in encryptor.iter_encrypt(file_obj):
+            out.write(block)
+
+    Attributes:
+        timer (PhaseTimer): setup (key schedule) and cipher phases; GCM has no padding
+        elapsed (float): Wall-clock time spent encrypting (seconds)
+        bytes_out (int): Total container size written
+    """
+
+    def __init__(self, key, plain_size, chunk_size=DEFAULT_CONTAINER_CHUNK_SIZE, workers=None):
+        if len(key) != 32:
+            raise ValueError("Container format requires a 32-byte AES key")
+        self.timer = PhaseTimer()
+        self.aesgcm = AESGCM(key)
+        self.timer.mark('setup')
+        self.plain_size = plain_size
+        self.chunk_size = chunk_size
+        self.workers = workers or default_workers()
+        self.chunk_count = (plain_size + chunk_size - 1) // chunk_size
+        self.nonce_prefix = os.urandom(8)
+        self.header = struct.pack(
+            HEADER_FORMAT, MAGIC, CONTAINER_FORMAT_VERSION, ALGORITHM_AES_GCM, 0,
+            chunk_size, plain_size, self.chunk_count, self.nonce_prefix
+        )
+        self.iv = None  # IV tidak dipakai; nonce ada di header
+        self.bytes_out = 0
+
+    @property
+    def elapsed(self):
+        return self.timer.elapsed
+
+    def _chunk_table(self):
+        lengths = []
+        remaining = self.plain_size
+        for _ in range(self.chunk_count):
+            plain_len = min(self.chunk_size, remaining)
+            lengths.append(struct.pack(TABLE_ENTRY_FORMAT, plain_len + TAG_SIZE))
+            remaining -= plain_len
+        return b''.join(lengths)
+
+    def _encrypt_chunk(self, index, data):
+        return self.aesgcm.encrypt(_chunk_nonce(self.nonce_prefix, index), data, self.header)
+
+    def iter_encrypt(self, file_obj):
+        """
+        Generator yielding the container (header, table, chunks) in order.
+        Chunks are encrypted in windows of 2x workers so memory stays bounded.
+        """
+        prefix = self.header + self._chunk_table()
+        self.bytes_out += len(prefix)
+        yield prefix
+
+        window = self.workers * 2
+        index = 0
+        remaining = self.plain_size
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while remaining > 0:
+                batch = []
+                while len(batch) < window and remaining > 0:
+                    data = _read_exact(file_obj, min(self.chunk_size, remaining))
+                    batch.append((index, data))
+                    index += 1
+                    remaining -= len(data)
+
+                self.timer.start()
+                encrypted = list(executor.map(lambda item: self._encrypt_chunk(*item), batch))
+                self.timer.mark('cipher')
+
+                for block in encrypted:
+                    self.bytes_out += len(block)
+                    yield block
+
+
+class ContainerReader:
+    """
+    Random-access reader for the container format.
+
+    Attributes:
+        plain_size (int): Original plaintext size
+        chunk_size (int): Plaintext bytes per chunk (last chunk may be shorter)
+        chunk_count (int): Number of chunks
+        timer (PhaseTimer): setup (key schedule) and cipher phases
+        elapsed (float): Time spent decrypting (seconds)
+    """
+
+    def __init__(self, file_obj, key):
+        self.file_obj = file_obj
+        self.timer = PhaseTimer()
+        self.aesgcm = AESGCM(key)
+        self.timer.mark('setup')
+        self.iv = None
+
+        header = file_obj.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE:
+            raise ContainerError("Container header is truncated")
+        (magic, version, algorithm, _reserved, self.chunk_size,
+         self.plain_size, self.chunk_count, self.nonce_prefix) = struct.unpack(HEADER_FORMAT, header)
+        if magic != MAGIC or version != CONTAINER_FORMAT_VERSION:
+            raise ContainerError("Not a version 2 encrypted container")
+        if algorithm != ALGORITHM_AES_GCM:
+            raise ContainerError(f"Unsupported container algorithm id: {algorithm}")
+        self.header = header
+
+        table = file_obj.read(self.chunk_count * TABLE_ENTRY_SIZE)
+        if len(table) != self.chunk_count * TABLE_ENTRY_SIZE:
+            raise ContainerError("Container chunk table is truncated")
+        self.chunk_lengths = [
+            struct.unpack_from(TABLE_ENTRY_FORMAT, table, i * TABLE_ENTRY_SIZE)[0]
+            for i in range(self.chunk_count)
+        ]
+        if sum(self.chunk_lengths) - self.chunk_count * TAG_SIZE != self.plain_size:
+            raise ContainerError("Container chunk table does not match plaintext size")
+
+        # Offset absolut tiap chunk di file
+        self.chunk_offsets = []
+        offset = HEADER_SIZE + len(table)
+        for length in self.chunk_lengths:
+            self.chunk_offsets.append(offset)
+            offset += length
+
+    @property
+    def elapsed(self):
+        return self.timer.elapsed
+
+    def _read_chunk(self, index):
+        self.file_obj.seek(self.chunk_offsets[index])
+        data = self.file_obj.read(self.chunk_lengths[index])
+        if len(data) != self.chunk_lengths[index]:
+            raise ContainerError(f"Chunk {index} is truncated")
+        return data
+
+    def _decrypt_block(self, index, data):
+        try:
+            return self.aesgcm.decrypt(_chunk_nonce(self.nonce_prefix, index), data, self.header)
+        except Exception:
+            raise ContainerError(f"Chunk {index} failed authentication")
+
+    def decrypt_chunk(self, index):
+        """Decrypt a single chunk on its own"""
+        if not 0 <= index < self.chunk_count:
+            raise IndexError(f"Chunk index out of range: {index}")
+        data = self._read_chunk(index)
+        self.timer.start()
+        plaintext = self._decrypt_block(index, data)
+        self.timer.mark('cipher')
+        return plaintext
+
+    def iter_decrypt(self, workers=None, first_chunk=0, last_chunk=None):
+        """
+        Generator yielding decrypted chunks in order, decrypting windows of
+        chunks in parallel on a thread pool.
+
+        Args:
+            workers (int, optional): Thread pool size (default: one per core)
+            first_chunk (int): First chunk index to decrypt
+            last_chunk (int, optional): Last chunk index (inclusive), default the final chunk
+        """
+        workers = workers or default_workers()
+        if last_chunk is None:
+            last_chunk = self.chunk_count - 1
+        window = workers * 2
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            index = first_chunk
+            while index <= last_chunk:
+                batch_end = min(index + window, last_chunk + 1)
+                # Baca berurutan di thread ini (satu file handle), dekripsi paralel
+                batch = [(i, self._read_chunk(i)) for i in range(index, batch_end)]
+                self.timer.start()
+                decrypted = list(executor.map(lambda item: self._decrypt_block(*item), batch))
+                self.timer.mark('cipher')
+                for block in decrypted:
+                    yield block
+                index = batch_end
+
+
+    def iter_range(self, start, end, workers=None):
+        """
+        Generator yielding plaintext bytes [start, end] (inclusive).
+        Only the chunks overlapping the range are read and decrypted.
+        """
+        first_chunk = start // self.chunk_size
+        last_chunk = end // self.chunk_size
+        skip = start - first_chunk * self.chunk_size
+        length = end - start + 1
+        for block in self.iter_decrypt(workers, first_chunk, last_chunk):
+            if skip:
+                block = block[skip:]
+                skip = 0
+            block = block[:length]
+            length -= len(block)
+            if block:
+                yield block
+
+
+def encrypt_container_stream(key, file_obj, plain_size,
+                             chunk_size=DEFAULT_CONTAINER_CHUNK_SIZE, workers=None):
+    """
+    Generator form, mirroring handler.encrypt_stream().
+    Returns (encryptor, chunks): encryptor.elapsed is valid once chunks is exhausted.
+    """
+    encryptor = ContainerEncryptor(key, plain_size, chunk_size, workers)
+    return encryptor, encryptor.iter_encrypt(file_obj)
+
+
+def decrypt_container_stream(key, file_obj, workers=None):
+    """
+    Generator form, mirroring handler.decrypt_stream().
+    Returns (reader, chunks): reader.elapsed is valid once chunks is exhausted.
+    """
+    reader = ContainerReader(file_obj, key)
+    return reader, reader.iter_decrypt(workers)
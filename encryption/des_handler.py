@@ -1,7 +1,11 @@
-import time
 from Crypto.Cipher import DES
 from Crypto.Util.Padding import pad, unpad
 import os
+from encryption.stream import (
+    CipherStream, transform_stream, transform_range, seek_cbc_block, DEFAULT_CHUNK_SIZE
+)
+from encryption.batch import cbc_encrypt_batch
+from encryption.timing import PhaseTimer
 
 class DESHandler:
     def __init__(self, key):
@@ -14,22 +18,126 @@ class DESHandler:
         if len(self.key) != 8:
             self.key = (self.key[:8] if len(self.key) > 8 
                        else self.key.ljust(8, b'\0'))
+        # PhaseTimer dari encrypt/decrypt/encrypt_batch terakhir (setup, cipher, padding)
+        self.last_timing = None
     
     def encrypt(self, data):
         # ... (sisa fungsi tidak berubah) ...
-        start_time = time.time()
+        timer = PhaseTimer()
         iv = os.urandom(8)
         cipher = DES.new(self.key, DES.MODE_CBC, iv)
+        timer.mark('setup')
         padded_data = pad(data, DES.block_size)
+        timer.mark('padding')
         ciphertext = cipher.encrypt(padded_data)
-        encryption_time = time.time() - start_time
-        return ciphertext, iv, encryption_time
+        timer.mark('cipher')
+        self.last_timing = timer
+        return ciphertext, iv, timer.elapsed
+    
+    def encrypt_batch(self, payloads):
+        """
+        Encrypt many small payloads (e.g. Excel cells) in one call.
+        Each result is what encrypt() would return for that payload (own IV, DES-CBC, PKCS7).
+        Returns (ciphertexts, ivs, encryption_time)
+        """
+        timer = PhaseTimer()
+        cipher = DES.new(self.key, DES.MODE_ECB)
+        iv_blob = os.urandom(DES.block_size * len(payloads))
+        timer.mark('setup')
+        ciphertexts, ivs = cbc_encrypt_batch(cipher.encrypt, DES.block_size, payloads, iv_blob, timer)
+        self.last_timing = timer
+        return ciphertexts, ivs, timer.elapsed
+    
+    def init_encrypt(self):
+        """
+        Start an incremental DES-CBC encryption.
+        Data is buffered to whole 8-byte blocks; PKCS7 padding is applied on finalize.
+        """
+        timer = PhaseTimer()
+        iv = os.urandom(8)
+        cipher = DES.new(self.key, DES.MODE_CBC, iv)
+        buffer = bytearray()
+        
+        def update(chunk):
+            buffer.extend(chunk)
+            ready = len(buffer) - (len(buffer) % DES.block_size)
+            if not ready:
+                return b''
+            output = cipher.encrypt(bytes(buffer[:ready]))
+            del buffer[:ready]
+            return output
+        
+        def finalize():
+            return cipher.encrypt(pad(bytes(buffer), DES.block_size))
+        
+        return CipherStream(update, finalize, iv=iv, timer=timer)
+    
+    def encrypt_stream(self, file_obj, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Generator form of encrypt() over any file-like object.
+        Returns (stream, chunks): stream.iv and stream.elapsed are valid once chunks is exhausted.
+        """
+        stream = self.init_encrypt()
+        return stream, transform_stream(stream, file_obj, chunk_size)
+    
+    def init_decrypt(self, iv):
+        """
+        Start an incremental DES-CBC decryption.
+        The last block is always held back so it can be unpadded on finalize.
+        """
+        timer = PhaseTimer()
+        cipher = DES.new(self.key, DES.MODE_CBC, iv)
+        buffer = bytearray()
+        
+        def update(chunk):
+            buffer.extend(chunk)
+            ready = len(buffer) - (len(buffer) % DES.block_size)
+            if ready == len(buffer):
+                ready -= DES.block_size
+            if ready <= 0:
+                return b''
+            output = cipher.decrypt(bytes(buffer[:ready]))
+            del buffer[:ready]
+            return output
+        
+        def finalize():
+            return unpad(cipher.decrypt(bytes(buffer)), DES.block_size)
+        
+        return CipherStream(update, finalize, iv=iv, timer=timer)
+    
+    def decrypt_stream(self, file_obj, iv, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Generator form of decrypt() over any file-like object.
+        Returns (stream, chunks) like encrypt_stream().
+        """
+        stream = self.init_decrypt(iv)
+        return stream, transform_stream(stream, file_obj, chunk_size)
+    
+    def decrypt_range(self, file_obj, iv, start, end, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Decrypt only plaintext bytes [start, end] (inclusive) of a seekable CBC file.
+        Seeks to the block holding `start` and uses the preceding ciphertext block as IV.
+        Returns (stream, chunks) like decrypt_stream().
+        """
+        block_start, block_iv = seek_cbc_block(file_obj, iv, start, DES.block_size)
+        timer = PhaseTimer()
+        cipher = DES.new(self.key, DES.MODE_CBC, block_iv)
+        stream = CipherStream(cipher.decrypt, lambda: b'', iv=block_iv, timer=timer)
+        read_length = (end // DES.block_size + 1) * DES.block_size - block_start
+        chunks = transform_range(
+            stream, file_obj, read_length, start - block_start, end - start + 1,
+            chunk_size, align=DES.block_size
+        )
+        return stream, chunks
     
     def decrypt(self, ciphertext, iv):
         # ... (sisa fungsi tidak berubah) ...
-        start_time = time.time()
+        timer = PhaseTimer()
         cipher = DES.new(self.key, DES.MODE_CBC, iv)
+        timer.mark('setup')
         padded_data = cipher.decrypt(ciphertext)
+        timer.mark('cipher')
         data = unpad(padded_data, DES.block_size)
-        decryption_time = time.time() - start_time
-        return data, decryption_time
\ No newline at end of file
+        timer.mark('padding')
+        self.last_timing = timer
+        return data, timer.elapsed
\ No newline at end of file
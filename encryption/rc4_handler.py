@@ -1,5 +1,7 @@
-import time
 from Crypto.Cipher import ARC4
+from encryption.stream import CipherStream, transform_stream, transform_range, DEFAULT_CHUNK_SIZE
+from encryption.batch import keystream_encrypt_batch
+from encryption.timing import PhaseTimer
 
 class RC4Handler:
     def __init__(self, key):
@@ -9,19 +11,87 @@ class RC4Handler:
         """
         self.key_algorithm_name = 'RC4' # <-- TAMBAHKAN INI
         self.key = key if isinstance(key, bytes) else key.encode()
+        # PhaseTimer dari encrypt/decrypt/encrypt_batch terakhir (RC4 tidak punya padding)
+        self.last_timing = None
     
     def encrypt(self, data):
         # ... (sisa fungsi tidak berubah) ...
-        start_time = time.time()
+        timer = PhaseTimer()
         cipher = ARC4.new(self.key)
+        timer.mark('setup')
         ciphertext = cipher.encrypt(data)
-        encryption_time = time.time() - start_time
-        return ciphertext, None, encryption_time
+        timer.mark('cipher')
+        self.last_timing = timer
+        return ciphertext, None, timer.elapsed
+    
+    def encrypt_batch(self, payloads):
+        """
+        Encrypt many small payloads (e.g. Excel cells) in one call.
+        Like encrypt(), every payload starts from a fresh RC4 state, so the
+        keystream is generated once and XORed into each payload.
+        Returns (ciphertexts, ivs, encryption_time); ivs are all None.
+        """
+        timer = PhaseTimer()
+        ciphertexts = keystream_encrypt_batch(
+            lambda length: ARC4.new(self.key).encrypt(bytes(length)), payloads
+        )
+        timer.mark('cipher')
+        self.last_timing = timer
+        return ciphertexts, [None] * len(payloads), timer.elapsed
+    
+    def init_encrypt(self):
+        """
+        Start an incremental RC4 encryption (pure keystream, no IV or padding).
+        """
+        timer = PhaseTimer()
+        cipher = ARC4.new(self.key)
+        return CipherStream(cipher.encrypt, lambda: b'', iv=None, timer=timer)
+    
+    def encrypt_stream(self, file_obj, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Generator form of encrypt() over any file-like object.
+        Returns (stream, chunks): stream.elapsed is valid once chunks is exhausted.
+        """
+        stream = self.init_encrypt()
+        return stream, transform_stream(stream, file_obj, chunk_size)
+    
+    def init_decrypt(self, iv=None):
+        """
+        Start an incremental RC4 decryption (keystream only).
+        iv is accepted for a uniform handler API and ignored.
+        """
+        timer = PhaseTimer()
+        cipher = ARC4.new(self.key)
+        return CipherStream(cipher.decrypt, lambda: b'', iv=None, timer=timer)
+    
+    def decrypt_stream(self, file_obj, iv=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Generator form of decrypt() over any file-like object.
+        Returns (stream, chunks) like encrypt_stream().
+        """
+        stream = self.init_decrypt(iv)
+        return stream, transform_stream(stream, file_obj, chunk_size)
+    
+    def decrypt_range(self, file_obj, iv, start, end, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Decrypt only plaintext bytes [start, end] (inclusive) of a seekable file.
+        The keystream is advanced to `start` with ARC4's drop parameter, so no
+        ciphertext before the range is read. iv is ignored.
+        Returns (stream, chunks) like decrypt_stream().
+        """
+        timer = PhaseTimer()
+        cipher = ARC4.new(self.key, drop=start)
+        stream = CipherStream(cipher.decrypt, lambda: b'', iv=None, timer=timer)
+        file_obj.seek(start)
+        length = end - start + 1
+        return stream, transform_range(stream, file_obj, length, 0, length, chunk_size)
     
     def decrypt(self, ciphertext):
         # ... (sisa fungsi tidak berubah) ...
-        start_time = time.time()
+        timer = PhaseTimer()
         cipher = ARC4.new(self.key)
+        timer.mark('setup')
         data = cipher.decrypt(ciphertext)
-        decryption_time = time.time() - start_time
-        return data, decryption_time
\ No newline at end of file
+        timer.mark('cipher')
+        self.last_timing = timer
+        return data, timer.elapsed
\ No newline at end of file
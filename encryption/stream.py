@@ -0,0 +1,154 @@
+"""
+Incremental (streaming) cipher contexts shared by the AES, DES and RC4 handlers
+Lets large files be encrypted/decrypted in fixed-size chunks instead of one big buffer
+"""
+from encryption.timing import PhaseTimer
+
+# Ukuran blok baca/tulis default untuk mode streaming (64 KB)
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class CipherStream:
+    """
+    Incremental cipher context returned by handler.init_encrypt() / init_decrypt().
+
+    Usage:
+        stream = handler.init_encrypt()
+        out = stream.update(chunk)   # dapat dipanggil berkali-kali
+        out += stream.finalize()     # padding / unpadding terakhir
+
+    Attributes:
+        iv (bytes or None): IV yang dipakai (None untuk RC4)
+        timer (PhaseTimer): setup (init_*), cipher (update) dan padding (finalize)
+        elapsed (float): Total waktu cipher dalam detik
+        bytes_in (int): Jumlah byte masuk
+        bytes_out (int): Jumlah byte keluar
+    """
+
+    def __init__(self, update_func, finalize_func, iv=None, timer=None):
+        self.iv = iv
+        # Timer dibuat oleh init_*() sebelum cipher disiapkan; sisa waktunya dihitung sebagai setup
+        self.timer = timer or PhaseTimer()
+        self.timer.mark('setup')
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._update_func = update_func
+        self._finalize_func = finalize_func
+        self._finalized = False
+
+    def update(self, chunk):
+        """Process one chunk and return whatever output is ready"""
+        if self._finalized:
+            raise ValueError("Cipher stream already finalized")
+        self.timer.start()
+        output = self._update_func(chunk)
+        self.timer.mark('cipher')
+        self.bytes_in += len(chunk)
+        self.bytes_out += len(output)
+        return output
+
+    def finalize(self):
+        """Flush the remaining buffered data (handles padding)"""
+        if self._finalized:
+            raise ValueError("Cipher stream already finalized")
+        self.timer.start()
+        output = self._finalize_func()
+        self.timer.mark('padding')
+        self.bytes_out += len(output)
+        self._finalized = True
+        return output
+
+    @property
+    def elapsed(self):
+        return self.timer.elapsed
+
+
+def iter_file_chunks(file_obj, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Read a file-like object in fixed-size chunks
+
+    Args:
+        file_obj: Any object with a read(size) method
+        chunk_size (int): Bytes per chunk
+
+    Yields:
+        bytes: Next chunk of data
+    """
+    while True:
+        chunk = file_obj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def transform_stream(stream, file_obj, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Generator that pushes a file-like object through a CipherStream
+
+    Args:
+        stream (CipherStream): Encrypt or decrypt context
+        file_obj: Source file-like object
+        chunk_size (int): Bytes read per iteration
+
+    Yields:
+        bytes: Output chunks (never empty)
+    """
+    for chunk in iter_file_chunks(file_obj, chunk_size):
+        output = stream.update(chunk)
+        if output:
+            yield output
+    tail = stream.finalize()
+    if tail:
+        yield tail
+
+
+def seek_cbc_block(file_obj, iv, offset, block_size):
+    """
+    Position file_obj at the CBC block containing plaintext byte `offset`.
+    CBC only needs the previous ciphertext block as IV, so no earlier data is decrypted.
+
+    Returns:
+        tuple: (block_start, block_iv) where block_start is the byte offset of the block
+    """
+    first_block = offset // block_size
+    if first_block == 0:
+        block_iv = iv
+    else:
+        file_obj.seek((first_block - 1) * block_size)
+        block_iv = file_obj.read(block_size)
+    block_start = first_block * block_size
+    file_obj.seek(block_start)
+    return block_start, block_iv
+
+
+def transform_range(stream, file_obj, read_length, skip, length,
+                    chunk_size=DEFAULT_CHUNK_SIZE, align=1):
+    """
+    Generator that decrypts at most read_length bytes from the current position,
+    drops the first `skip` output bytes and stops after `length` output bytes.
+    The stream is never finalized: padding lies outside any valid byte range.
+
+    Args:
+        stream (CipherStream): Raw decrypt context positioned at the first block
+        file_obj: Ciphertext file-like object (already seeked)
+        read_length (int): Ciphertext bytes to read
+        skip (int): Leading output bytes to discard
+        length (int): Output bytes to emit
+        chunk_size (int): Bytes read per iteration
+        align (int): Block size reads must be a multiple of (CBC)
+    """
+    read_size = max(align, chunk_size - (chunk_size % align))
+    while read_length > 0 and length > 0:
+        chunk = file_obj.read(min(read_size, read_length))
+        if not chunk:
+            break
+        read_length -= len(chunk)
+        output = stream.update(chunk)
+        if skip:
+            dropped = min(skip, len(output))
+            output = output[dropped:]
+            skip -= dropped
+        output = output[:length]
+        length -= len(output)
+        if output:
+            yield output
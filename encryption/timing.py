@@ -0,0 +1,58 @@
+"""
+High-resolution phase timing for the cipher handlers
+Uses time.perf_counter_ns() (monotonic, nanosecond resolution) instead of
+time.time(), so small payloads no longer log 0.0 s and wall-clock jumps do
+not leak into execution_time.
+"""
+import time
+
+# Fase yang dicatat di CryptoLog (setup_time, cipher_time, padding_time)
+PHASES = ('setup', 'cipher', 'padding')
+
+
+class PhaseTimer:
+    """
+    Accumulates nanoseconds per phase.
+
+    Usage:
+        timer = PhaseTimer()          # mulai menghitung
+        ...buat cipher...
+        timer.mark('setup')           # waktu sejak start / mark terakhir -> setup
+        ...enkripsi...
+        timer.mark('cipher')
+
+    For work interleaved with I/O (streams), call start() before each timed
+    section so the time in between is not counted.
+    """
+
+    def __init__(self):
+        self.ns = dict.fromkeys(PHASES, 0)
+        self._last = time.perf_counter_ns()
+
+    def start(self):
+        """Start a new timed section (time since the last mark is discarded)"""
+        self._last = time.perf_counter_ns()
+
+    def mark(self, phase):
+        """Add the time since start()/the last mark to phase"""
+        now = time.perf_counter_ns()
+        self.ns[phase] += now - self._last
+        self._last = now
+
+    def merge(self, other):
+        """Add another timer's phases to this one"""
+        for phase in PHASES:
+            self.ns[phase] += other.ns[phase]
+
+    @property
+    def total_ns(self):
+        return sum(self.ns.values())
+
+    @property
+    def elapsed(self):
+        """Total time over all phases in seconds"""
+        return self.total_ns / 1e9
+
+    def phase_times(self):
+        """Phase durations in seconds, keyed like the CryptoLog columns"""
+        return {f'{phase}_time': self.ns[phase] / 1e9 for phase in PHASES}
@@ -0,0 +1,25 @@
+"""Drop hourly crypto_log_rollups rows (only daily rollups are written now)
+
+Revision ID: 4b7c2e9d1f63
+Revises: 8a3d5c1f7e92
+Create Date: 2026-10-17 19:12:45.204118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7c2e9d1f63'
+down_revision = '8a3d5c1f7e92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(sa.text("DELETE FROM crypto_log_rollups WHERE granularity = 'hour'"))
+
+
+def downgrade():
+    # Baris per jam tidak dibuat ulang; jalankan `flask backfill-rollups` jika perlu
+    pass
@@ -1,8 +1,8 @@
 from .user import User
 from .file import File
 from .report import FinancialReport
-from .log import CryptoLog
+from .log import CryptoLog, CryptoLogRollup, CryptoLatencyHistogram
 from .access import UserAccess
 from .file_access_request import FileAccessRequest
 
-__all__ = ['User', 'File', 'FinancialReport', 'UserAccess', 'CryptoLog', 'FileAccessRequest']
\ No newline at end of file
+__all__ = ['User', 'File', 'FinancialReport', 'UserAccess', 'CryptoLog', 'CryptoLogRollup', 'CryptoLatencyHistogram', 'FileAccessRequest']
\ No newline at end of file
@@ -11,6 +11,11 @@ class Connection(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Dipakai oleh pengecekan akses file (utils/access_control.py)
+        db.Index('ix_connections_requester_receiver_status', 'requester_id', 'receiver_id', 'status'),
+    )
+
     # Relationships
     requester = db.relationship('User', foreign_keys=[requester_id], backref=db.backref('sent_connections', lazy='dynamic'))
     receiver = db.relationship('User', foreign_keys=[receiver_id], backref=db.backref('received_connections', lazy='dynamic'))
@@ -21,6 +21,11 @@ class File(db.Model):
     # --- AKHIR PERUBAHAN ---
 
     iv = db.Column(db.String(256), nullable=True)  # Hex encoded IV
+    # 1 = single CBC/RC4 stream (IV in 'iv'), 2 = chunked AES-GCM container
+    format_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Excel parsing di background: None (bukan Excel), 'pending', 'processing', 'done', 'failed'
+    processing_status = db.Column(db.String(20), nullable=True)
+    processing_error = db.Column(db.String(255), nullable=True)
     encryption_time = db.Column(db.Float, nullable=True)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     upload_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # Alias for compatibility
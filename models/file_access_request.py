@@ -30,6 +30,8 @@ class FileAccessRequest(db.Model):
     # Prevent duplicate requests
     __table_args__ = (
         db.UniqueConstraint('requester_id', 'owner_id', 'file_id', name='unique_file_access_request'),
+        # Dipakai oleh pengecekan akses file (utils/access_control.py)
+        db.Index('ix_file_access_requests_requester_file_status', 'requester_id', 'file_id', 'status'),
     )
     
     def __repr__(self):
@@ -10,9 +10,84 @@ class CryptoLog(db.Model):
     file_id = db.Column(db.Integer, db.ForeignKey('files.id'), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     execution_time = db.Column(db.Float, nullable=False)  # in seconds
+    # Rincian execution_time per fase (detik, perf_counter_ns); NULL untuk log lama
+    setup_time = db.Column(db.Float, nullable=True)
+    cipher_time = db.Column(db.Float, nullable=True)
+    padding_time = db.Column(db.Float, nullable=True)
     data_size = db.Column(db.Integer, nullable=False)  # in bytes
     success = db.Column(db.Boolean, default=True, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     
     def __repr__(self):
-        return f'<CryptoLog {self.operation} {self.algorithm}>'
\ No newline at end of file
+        return f'<CryptoLog {self.operation} {self.algorithm}>'
+
+
+class CryptoLogRollup(db.Model):
+    """
+    Pre-aggregated CryptoLog metrics, updated incrementally by the log writer.
+    One row per (granularity, bucket_start, user, algorithm, operation, file_type, size_bucket).
+    """
+    __tablename__ = 'crypto_log_rollups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(4), nullable=False)  # 'day' (see GRANULARITIES in utils/rollups.py)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = tanpa user
+    algorithm = db.Column(db.String(10), nullable=False)
+    operation = db.Column(db.String(20), nullable=False)
+    file_type = db.Column(db.String(50), nullable=False, default='')  # '' = tidak diketahui
+    size_bucket = db.Column(db.Integer, nullable=False)  # floor(log2(data_size)), 0 untuk <= 1 byte
+    
+    count = db.Column(db.Integer, nullable=False, default=0)
+    time_sum = db.Column(db.Float, nullable=False, default=0)
+    time_sum_sq = db.Column(db.Float, nullable=False, default=0)
+    time_min = db.Column(db.Float, nullable=True)
+    time_max = db.Column(db.Float, nullable=True)
+    setup_time_sum = db.Column(db.Float, nullable=False, default=0)
+    cipher_time_sum = db.Column(db.Float, nullable=False, default=0)
+    padding_time_sum = db.Column(db.Float, nullable=False, default=0)
+    phase_count = db.Column(db.Integer, nullable=False, default=0)  # log dengan rincian fase
+    size_sum = db.Column(db.BigInteger, nullable=False, default=0)
+    size_sum_sq = db.Column(db.Float, nullable=False, default=0)
+    size_min = db.Column(db.BigInteger, nullable=True)
+    size_max = db.Column(db.BigInteger, nullable=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint(
+            'granularity', 'bucket_start', 'user_id', 'algorithm', 'operation', 'file_type', 'size_bucket',
+            name='unique_crypto_log_rollup'
+        ),
+    )
+    
+    def __repr__(self):
+        return f'<CryptoLogRollup {self.granularity} {self.bucket_start} {self.algorithm} {self.operation}>'
+
+
+class CryptoLatencyHistogram(db.Model):
+    """
+    Mergeable latency histogram of CryptoLog execution_time (fixed log buckets, see utils/rollups.py).
+    One row per (day, user, algorithm, operation, file_type, size_bucket, latency_bucket).
+    """
+    __tablename__ = 'crypto_latency_histograms'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, nullable=False)  # awal hari (UTC)
+    user_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = tanpa user
+    algorithm = db.Column(db.String(10), nullable=False)
+    operation = db.Column(db.String(20), nullable=False)
+    file_type = db.Column(db.String(50), nullable=False, default='')
+    size_bucket = db.Column(db.Integer, nullable=False)
+    latency_bucket = db.Column(db.Integer, nullable=False)
+    
+    count = db.Column(db.Integer, nullable=False, default=0)
+    max_time = db.Column(db.Float, nullable=True)  # nilai terbesar di bucket ini (detik)
+    
+    __table_args__ = (
+        db.UniqueConstraint(
+            'bucket_start', 'user_id', 'algorithm', 'operation', 'file_type', 'size_bucket', 'latency_bucket',
+            name='unique_crypto_latency_histogram'
+        ),
+    )
+    
+    def __repr__(self):
+        return f'<CryptoLatencyHistogram {self.bucket_start} {self.algorithm} {self.operation} {self.latency_bucket}>'
@@ -5,14 +5,14 @@ from models import User, File
 from models.access import UserAccess
 from models.file_access_request import FileAccessRequest
 from datetime import datetime
-from utils.rsa_handler import (
-    load_private_key, load_public_key, 
-    decrypt_with_private_key, encrypt_with_public_key
-)
+from utils.key_wrap import wrap_key, unwrap_key, scheme_for_key
 from utils.nosql_handler import (
-    get_file_key, get_user_private_key_enc, 
-    get_user_public_key, store_shared_key
+    get_file_key, store_shared_key,
+    get_owner_file_keys, bulk_store_shared_keys
 )
+from utils.key_cache import unlock_private_key, get_public_key
+from utils.profiling import span
+from utils.access_control import invalidate_access, invalidate_owner_access
 
 access_bp = Blueprint('access', __name__, url_prefix='/access')
 
@@ -24,6 +24,7 @@ def settings():
         is_private = request.form.get('is_private') == 'true'
         current_user.is_private = is_private
         db.session.commit()
+        invalidate_owner_access(current_user.id)
         flash('Profile settings updated!', 'success')
         return redirect(url_for('access.settings'))
 
@@ -45,6 +46,7 @@ def toggle_privacy():
     """Toggle user privacy status between public and private"""
     current_user.is_private = not current_user.is_private
     db.session.commit()
+    invalidate_owner_access(current_user.id)
     status = "Private" if current_user.is_private else "Public"
     flash(f'Your account is now {status}!', 'success')
     return redirect(url_for('main.dashboard'))
@@ -80,6 +82,7 @@ def grant_access():
     )
     db.session.add(new_access)
     db.session.commit()
+    invalidate_access(current_user.id, recipient.id)
     flash(f'Access granted to {username}!', 'success')
     return redirect(url_for('access.settings'))
 
@@ -142,7 +145,7 @@ def request_file_access(file_id):
     
     return jsonify({'success': True, 'message': 'Access request sent successfully'})
 
-access_bp.route('/request-user/<int:user_id>', methods=['POST'])
+@access_bp.route('/request-user/<int:user_id>', methods=['POST'])
 @login_required
 def request_user_access(user_id):
     """Request access to all files of a user"""
@@ -190,6 +193,31 @@ def request_user_access(user_id):
     
     return jsonify({'success': True, 'message': 'Access request sent successfully'})
 
+def share_all_file_keys(owner_id, owner_private_key, recipient_id, recipient_public_key):
+    """
+    Re-wrap every file key of an owner for one recipient ("all files" request).
+    The owner's key is unlocked once by the caller; Mongo is read with one
+    find() and written with one bulk_write().
+
+    Returns:
+        int: Number of file keys shared
+    """
+    # Hanya file yang masih ada di SQL (key file yang sudah dihapus dilewati)
+    owned_ids = {
+        row.id for row in db.session.query(File.id).filter(File.owner_id == owner_id)
+    }
+    recipient_scheme = scheme_for_key(recipient_public_key)
+    
+    entries = []
+    for doc in get_owner_file_keys(owner_id):
+        if doc['file_id'] not in owned_ids:
+            continue
+        raw_file_key = unwrap_key(owner_private_key, doc['encrypted_key'])
+        entries.append((doc['file_id'], wrap_key(recipient_public_key, raw_file_key), recipient_scheme))
+    
+    bulk_store_shared_keys(recipient_id, entries)
+    return len(entries)
+
 @access_bp.route('/respond-request/<int:request_id>/<string:action>', methods=['POST'])
 @login_required
 def respond_to_access_request(request_id, action):
@@ -213,42 +241,51 @@ def respond_to_access_request(request_id, action):
         try:
             # --- PROSES KEY EXCHANGE (Pertukaran Kunci) ---
             
-            # 1. Ambil Encrypted Private Key milik Organisasi (Current User)
-            owner_priv_enc = get_user_private_key_enc(current_user.id)
-            if not owner_priv_enc:
+            # 1 & 2. Ambil Encrypted Private Key Organisasi lalu buka pakai Password Login
+            # Ini langkah krusial: Membuka identitas digital Organisasi
+            # (dari cache jika sudah dibuka di sesi login ini)
+            with span('unlock_key'):
+                owner_private_key = unlock_private_key(current_user.id, password)
+            if owner_private_key is None:
                 raise Exception("Owner private key not found.")
             
-            # 2. Decrypt Private Key pakai Password Login
-            # Ini langkah krusial: Membuka identitas digital Organisasi
-            owner_private_key = load_private_key(owner_priv_enc, password)
+            # 3. Ambil Public Key Consultant (Requester) dari cache / MongoDB
+            with span('public_key'):
+                requester_public_key = get_public_key(access_request.requester_id)
+            if requester_public_key is None:
+                raise Exception("Requester public key not found.")
             
-            # 3. Ambil Encrypted File Key (Versi Owner) dari MongoDB
             if not access_request.file_id:
-                # Jika request untuk semua file, logika harus diulang untuk semua file (looping).
-                # Untuk penyederhanaan tugas ini, kita asumsikan per-file request.
-                raise Exception("File specific request required for key sharing.")
-
-            file_key_enc_owner = get_file_key(access_request.file_id, current_user.id)
-            if not file_key_enc_owner:
-                raise Exception("Original file key not found.")
+                # Request untuk semua file: re-wrap semua file key sekaligus
+                with span('share_keys'):
+                    shared_count = share_all_file_keys(
+                        current_user.id, owner_private_key,
+                        access_request.requester_id, requester_public_key
+                    )
+            else:
+                # 4. Ambil Encrypted File Key (Versi Owner) dari MongoDB
+                with span('key_lookup'):
+                    file_key_enc_owner = get_file_key(access_request.file_id, current_user.id)
+                if not file_key_enc_owner:
+                    raise Exception("Original file key not found.")
+                    
+                # 5. Decrypt File Key pakai Private Key Owner -> Dapat RAW AES KEY
+                # Di sini kita mendapatkan kunci asli file yang telanjang (raw) sebentar
+                with span('unwrap_key'):
+                    raw_file_key = unwrap_key(owner_private_key, file_key_enc_owner)
                 
-            # 4. Decrypt File Key pakai Private Key Owner -> Dapat RAW AES KEY
-            # Di sini kita mendapatkan kunci asli file yang telanjang (raw) sebentar
-            raw_file_key = decrypt_with_private_key(owner_private_key, file_key_enc_owner)
-            
-            # 5. Ambil Public Key Consultant (Requester) dari MongoDB
-            requester_pub_pem = get_user_public_key(access_request.requester_id)
-            if not requester_pub_pem:
-                raise Exception("Requester public key not found.")
-            
-            requester_public_key = load_public_key(requester_pub_pem)
-            
-            # 6. Encrypt RAW AES KEY pakai Public Key Consultant
-            # Kita bungkus ulang kunci aslinya khusus untuk Consultant
-            shared_key_enc = encrypt_with_public_key(requester_public_key, raw_file_key)
-            
-            # 7. Simpan Shared Key ke MongoDB untuk Consultant
-            store_shared_key(access_request.file_id, access_request.requester_id, shared_key_enc)
+                # 6. Encrypt RAW AES KEY pakai Public Key Consultant (RSA-OAEP atau X25519)
+                # Kita bungkus ulang kunci aslinya khusus untuk Consultant
+                with span('wrap_key'):
+                    shared_key_enc = wrap_key(requester_public_key, raw_file_key)
+                
+                # 7. Simpan Shared Key ke MongoDB untuk Consultant
+                with span('store_key'):
+                    store_shared_key(
+                        access_request.file_id, access_request.requester_id,
+                        shared_key_enc, scheme_for_key(requester_public_key)
+                    )
+                shared_count = 1
             
             # ----------------------------------------------
             
@@ -269,8 +306,13 @@ def respond_to_access_request(request_id, action):
                 )
                 db.session.add(new_access)
             
-            db.session.commit()
-            flash(f'Access granted! Key securely shared with {access_request.requester.username}.', 'success')
+            with span('db_commit'):
+                db.session.commit()
+            invalidate_access(current_user.id, access_request.requester_id)
+            if access_request.file_id:
+                flash(f'Access granted! Key securely shared with {access_request.requester.username}.', 'success')
+            else:
+                flash(f'Access granted! {shared_count} file keys securely shared with {access_request.requester.username}.', 'success')
             
         except ValueError:
              # Error ini muncul dari cryptography jika password salah
@@ -315,5 +357,6 @@ def revoke_access(access_id):
         db.session.delete(access)
     
     db.session.commit()
+    invalidate_access(current_user.id, file_request.requester_id)
     flash(f'Access to {file_name} revoked from {requester.username}.', 'success')
     return redirect(url_for('connections.notifications_page'))
\ No newline at end of file
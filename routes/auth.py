@@ -3,13 +3,15 @@ Authentication routes: register, login, logout
 """
 import os
 import base64
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from extensions import db
 from models import User
-from utils.rsa_handler import generate_key_pair, serialize_private_key, serialize_public_key
+from utils.rsa_handler import serialize_private_key, serialize_public_key
+from utils.key_wrap import generate_user_key_pair, scheme_for_key
 from utils.nosql_handler import store_user_keys
+from utils.key_cache import private_key_cache, new_key_session, get_key_session_id
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -60,10 +62,12 @@ def register():
         try:
             db.session.add(new_user)
             db.session.commit()
-            private_key, public_key = generate_key_pair()
+            # User baru memakai skema dari config (default X25519);
+            # RSA diambil dari pool background (fallback: generate langsung)
+            private_key, public_key = generate_user_key_pair(current_app.config['KEY_WRAP_SCHEME'])
             encrypted_private_key_pem = serialize_private_key(private_key, password)
             public_key_pem = serialize_public_key(public_key)
-            store_user_keys(new_user.id, public_key_pem, encrypted_private_key_pem)
+            store_user_keys(new_user.id, public_key_pem, encrypted_private_key_pem, scheme_for_key(public_key))
             flash('Registration successful! Please login.', 'success')
             return redirect(url_for('auth.login'))
         except Exception as e:
@@ -106,6 +110,8 @@ def login():
         
         # Login user
         login_user(user, remember=remember)
+        # Sesi baru untuk cache private key (kunci terbuka tidak dibawa antar login)
+        new_key_session()
         
         # Redirect to next page or dashboard
         next_page = request.args.get('next')
@@ -117,6 +123,9 @@ def login():
 @login_required
 def logout():
     """User logout"""
+    # Hapus private key yang sudah terbuka untuk sesi ini dari cache
+    private_key_cache.evict_session(current_user.id, get_key_session_id())
+    session.pop('key_session_id', None)
     logout_user()
     flash('You have been logged out.', 'info')
     return redirect(url_for('auth.login'))
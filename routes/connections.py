@@ -8,6 +8,7 @@ from flask_login import login_required, current_user
 from extensions import db
 from models.user import User
 from models.connection import Connection
+from utils.access_control import invalidate_access
 
 connections_bp = Blueprint('connections', __name__, url_prefix='/connections')
 
@@ -152,6 +153,7 @@ def respond_to_request(connection_id, action):
             flash('Connection request rejected', 'success')
         
         db.session.commit()
+        invalidate_access(connection.requester_id, connection.receiver_id)
         return redirect(url_for('connections.notifications_page'))
         
     except Exception as e:
@@ -173,6 +175,7 @@ def remove_connection(user_id):
     
     db.session.delete(connection)
     db.session.commit()
+    invalidate_access(current_user.id, user_id)
     
     flash(f'Connection with {other_user.username} removed', 'success')
     return redirect(url_for('connections.list_connections'))
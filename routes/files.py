@@ -6,38 +6,36 @@ Handles file upload, download, listing, and deletion
 """
 from flask import (
     Blueprint, render_template, request, redirect, url_for, flash, 
-    send_file, make_response, send_from_directory, current_app
+    send_file, make_response, send_from_directory, current_app,
+    Response, stream_with_context, jsonify
 )
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 import os
 import io
-import time
 import uuid
 import subprocess
 import sys
 from datetime import datetime
 
-import openpyxl
-from io import BytesIO
-import base64
-
 from extensions import db
 from models.file import File
 from models.report import FinancialReport
 from models.user import User
 from werkzeug.exceptions import BadRequest
-from models.access import UserAccess
-from models.connection import Connection
-from models.file_access_request import FileAccessRequest
 from cryptography.hazmat.primitives import serialization
-from utils.rsa_handler import load_public_key, encrypt_with_public_key
-from utils.nosql_handler import get_user_public_key, store_file_key
-from utils.rsa_handler import load_private_key, decrypt_with_private_key
-from utils.nosql_handler import get_file_key, get_shared_key, get_user_private_key_enc
+from utils.key_wrap import wrap_key, unwrap_key, scheme_for_key
+from utils.nosql_handler import store_file_key
+from utils.nosql_handler import get_file_key, get_shared_key
+from utils.key_cache import unlock_private_key, get_public_key
 from encryption.aes_handler import AESHandler
 from encryption.des_handler import DESHandler
 from encryption.rc4_handler import RC4Handler
+from encryption.stream import DEFAULT_CHUNK_SIZE
+from encryption.container import (
+    encrypt_container_stream, decrypt_container_stream, ContainerReader, DEFAULT_CONTAINER_CHUNK_SIZE,
+    LEGACY_FORMAT_VERSION, CONTAINER_FORMAT_VERSION
+)
 
 from utils.key_manager import generate_file_key, encrypt_file_key, decrypt_file_key
 from utils.pbe_handler import derive_key_from_password
@@ -45,42 +43,23 @@ from utils.pbe_handler import derive_key_from_password
 
 from utils.file_handler import (
     is_allowed_file, generate_unique_filename, get_file_size,
-    validate_file_size, save_encrypted_file, read_encrypted_file,
-    format_file_size, get_file_category, ensure_upload_directory
+    validate_file_size, save_encrypted_stream, read_encrypted_file, get_upload_path,
+    open_encrypted_file, format_file_size, get_file_category, ensure_upload_directory
 )
 from utils.validators import (
     validate_algorithm, validate_filename, 
     validate_encryption_password_length # <-- IMPOR BARU
 )
 from utils.logger import log_crypto_operation
+from utils.excel_ingest import ingest_excel
+from utils.jobs import job_queue
+from utils.profiling import span, record
+from utils.access_control import user_can_access_file, user_can_view_files, resolve_file_access_states
 
 files_bp = Blueprint('files', __name__, url_prefix='/files')
 
 ensure_upload_directory()
 
-# --- FUNGSI PARSING EXCEL (Tidak Berubah) ---
-def create_parsed_excel(file_data, handler):
-    try:
-        workbook = openpyxl.load_workbook(BytesIO(file_data))
-        sheet = workbook.active
-        for row in sheet.iter_rows():
-            for cell in row:
-                if cell.value:
-                    try:
-                        data_to_encrypt = str(cell.value).encode('utf-8')
-                        ciphertext, iv, _ = handler.encrypt(data_to_encrypt)
-                        combined_data = (iv if iv else b'') + ciphertext
-                        encrypted_string = base64.b64encode(combined_data).decode('utf-8')
-                        cell.value = encrypted_string
-                    except Exception as e:
-                        cell.value = f"Error: {str(e)}"
-        output_bio = BytesIO()
-        workbook.save(output_bio)
-        return output_bio.getvalue()
-    except Exception as e:
-        print(f"Gagal memproses excel per-sel: {e}")
-        return None
-
 # --- RUTE UPLOAD (Perubahan di sini) ---
 @files_bp.route('/upload', methods=['GET', 'POST'])
 @login_required
@@ -119,8 +98,8 @@ def upload():
     try:
         # --- [MODIFIKASI TAHAP 2: Hybrid Encryption] ---
         
-        file_data = file.read()
-        file_size = len(file_data)
+        # File tidak lagi dibaca utuh ke memori; ukuran diambil dari stream
+        file_size = get_file_size(file)
         unique_filename = generate_unique_filename(sanitized_name)
 
         # 1. Generate Random Symmetric Key (32 bytes untuk keamanan maksimal)
@@ -140,33 +119,49 @@ def upload():
             flash('Invalid algorithm', 'error')
             return redirect(url_for('files.upload'))
         
-        # 3. Enkripsi File Fisik
-        start_time = time.time()
-        ciphertext, iv, encryption_time = handler.encrypt(file_data)
-        
-        # 4. Ambil Public Key Owner (Organization) dari MongoDB
+        # 3. Ambil Public Key Owner (Organization) dari MongoDB
         # Ini memastikan hanya owner yang bisa membuka kunci ini nanti (via Private Key-nya)
-        user_pub_key_pem = get_user_public_key(current_user.id)
-        if not user_pub_key_pem:
+        # Dilakukan sebelum enkripsi agar tidak ada file yatim di disk jika kunci tidak ada
+        # (objek kunci yang sudah di-parse diambil dari cache bila ada)
+        with span('public_key'):
+            public_key = get_public_key(current_user.id)
+        if public_key is None:
             raise Exception("Public Key not found. Please contact admin to generate keys.")
-            
-        public_key = load_public_key(user_pub_key_pem)
         
-        # 5. Enkripsi Symmetric Key (file_key) dengan RSA Public Key
+        # 4. Bungkus Symmetric Key (file_key) dengan Public Key Owner (RSA-OAEP atau X25519)
         # Kita mengenkripsi full 32 bytes key master
-        encrypted_file_key = encrypt_with_public_key(public_key, file_key)
-        
-        # 6. Simpan File Fisik Terenkripsi ke Disk
-        save_encrypted_file(ciphertext, unique_filename)
-        
-        # 7. Proses Excel (Parsing) jika tipe file Excel
-        # Handler sudah menggunakan kunci baru, jadi fungsi ini tetap aman
-        parsed_filename = None
+        with span('wrap_key'):
+            encrypted_file_key = wrap_key(public_key, file_key)
+        
+        # 5 & 6. Enkripsi File Fisik secara streaming langsung ke Disk
+        # Ciphertext ditulis per blok, jadi memori tetap datar berapapun ukuran file
+        file.stream.seek(0)
+        use_container = algorithm == 'AES' and current_app.config.get('CONTAINER_FORMAT_ENABLED', False)
+        if use_container:
+            # AES baru memakai container chunked AES-GCM, chunk dienkripsi paralel di thread pool
+            stream, ciphertext_chunks = encrypt_container_stream(
+                file_key, file.stream, file_size,
+                current_app.config.get('CONTAINER_CHUNK_SIZE', DEFAULT_CONTAINER_CHUNK_SIZE),
+                current_app.config.get('CONTAINER_WORKERS')
+            )
+            format_version = CONTAINER_FORMAT_VERSION
+        else:
+            chunk_size = current_app.config.get('ENCRYPTION_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+            stream, ciphertext_chunks = handler.encrypt_stream(file.stream, chunk_size)
+            format_version = LEGACY_FORMAT_VERSION
+        _, encrypted_size = save_encrypted_stream(ciphertext_chunks, unique_filename)
+        iv = stream.iv
+        # Waktu cipher diukur dengan perf_counter_ns, dipisah per fase (setup / cipher / padding)
+        encryption_time = stream.elapsed
+        phase_times = stream.timer.phase_times()
+        record('cipher', encryption_time)
+        
+        # 7. Excel: isi file disimpan di memori untuk job parsing di background
+        # (stream upload sudah ditutup saat request selesai)
+        excel_data = None
         if get_file_category(sanitized_name) == 'excel':
-            parsed_excel_data = create_parsed_excel(file_data, handler) 
-            if parsed_excel_data:
-                parsed_filename = f"parsed_{unique_filename}"
-                save_encrypted_file(parsed_excel_data, parsed_filename)
+            file.stream.seek(0)
+            excel_data = file.read()
         
         # 8. Simpan Metadata ke MySQL
         # Catatan: Kolom 'salt' diisi dummy random karena tidak lagi dipakai untuk derivasi kunci,
@@ -176,12 +171,14 @@ def upload():
             owner_id=current_user.id,
             original_filename=sanitized_name,
             encrypted_filename=unique_filename,
-            parsed_filename=parsed_filename,
+            parsed_filename=None,
+            processing_status='pending' if excel_data is not None else None,
             file_size=file_size,
-            encrypted_size=len(ciphertext),
+            encrypted_size=encrypted_size,
             file_type=get_file_category(sanitized_name),
             encryption_algorithm=algorithm,
-            cipher_mode='CBC' if algorithm in ['AES', 'DES'] else None,
+            cipher_mode='GCM' if use_container else ('CBC' if algorithm in ['AES', 'DES'] else None),
+            format_version=format_version,
             salt=os.urandom(16).hex(), # Dummy Salt
             iv=iv.hex() if iv else None,
             encryption_time=encryption_time,
@@ -189,26 +186,38 @@ def upload():
             upload_date=datetime.utcnow()
         )
         
-        db.session.add(file_record)
-        db.session.commit() # Commit untuk mendapatkan ID file
+        with span('db_commit'):
+            db.session.add(file_record)
+            db.session.commit() # Commit untuk mendapatkan ID file
         
         # 9. Simpan Encrypted Symmetric Key ke MongoDB
         # Kita simpan kuncinya di NoSQL agar terpisah dari database metadata utama
-        store_file_key(file_record.id, current_user.id, encrypted_file_key)
+        with span('store_key'):
+            store_file_key(file_record.id, current_user.id, encrypted_file_key, scheme_for_key(public_key))
         
         # 10. Logging
-        log_crypto_operation(
-            user_id=current_user.id, file_id=file_record.id, operation_type='encryption',
-            algorithm=algorithm, file_size=file_size, execution_time=encryption_time, success=True
-        )
-        
-        # 11. Proses Data Finansial (Excel) ke Database
-        if get_file_category(sanitized_name) == 'excel':
-            try:
-                process_excel_file(file_data, file_record.id, handler)
-                flash(f'File uploaded and encrypted successfully with {algorithm} (Hybrid)! Excel data processed.', 'success')
-            except Exception as excel_error:
-                flash(f'File uploaded with {algorithm}, but Excel processing failed: {str(excel_error)}', 'info')
+        with span('log'):
+            log_crypto_operation(
+                user_id=current_user.id, file_id=file_record.id, file_type=file_record.file_type, operation_type='encryption',
+                algorithm=algorithm, file_size=file_size, execution_time=encryption_time, success=True,
+                phase_times=phase_times
+            )
+        
+        # 11. Parsing Excel + Data Finansial dijalankan sebagai job di background
+        # Handler sudah menggunakan kunci baru, jadi job ini tetap aman
+        if excel_data is not None:
+            file_id = file_record.id
+            with span('excel_job'):
+                queued = job_queue.submit(process_excel_upload, file_id, excel_data, handler)
+            if queued:
+                flash(f'File uploaded and encrypted successfully with {algorithm} (Hybrid)! Excel data is being processed in the background.', 'success')
+            else:
+                # Job sudah berjalan langsung (mode sync / antrian penuh) di sesi DB lain
+                db.session.refresh(file_record)
+                if file_record.processing_status == 'done':
+                    flash(f'File uploaded and encrypted successfully with {algorithm} (Hybrid)! Excel data processed.', 'success')
+                else:
+                    flash(f'File uploaded with {algorithm}, but Excel processing failed: {file_record.processing_error}', 'info')
         else:
             flash(f'File uploaded and encrypted successfully with {algorithm} (Hybrid)!', 'success')
         
@@ -243,112 +252,24 @@ def view_user_files(username):
     if profile_user.id == current_user.id:
         return redirect(url_for('files.my_files'))
 
-    can_view = False
-    
-    if not profile_user.is_private:
-        can_view = True
-    else:
-        # Check if there's a UserAccess record
-        access_record = UserAccess.query.filter_by(
-            owner_id=profile_user.id,
-            authorized_user_id=current_user.id
-        ).first()
-        if connection:
-            can_view = True
-        
-        # Also check if there's an accepted connection
-        if not can_view:
-            connection = Connection.query.filter(
-                ((Connection.requester_id == profile_user.id) & (Connection.receiver_id == current_user.id)) |
-                ((Connection.requester_id == current_user.id) & (Connection.receiver_id == profile_user.id)),
-                Connection.status == 'accepted'
-            ).first()
-            if connection:
-                can_view = True
+    # Profil publik, UserAccess, atau koneksi yang sudah diterima (keputusan di-cache)
+    can_view = user_can_view_files(profile_user, current_user.id)
 
     if can_view:
-        from models.file_access_request import FileAccessRequest
-        
         files = profile_user.files.order_by(File.upload_date.desc()).all()
         for file in files:
             file.formatted_size = format_file_size(file.file_size)
         
-        # Check which files the user has been granted access to
-        granted_file_ids = []
-        approved_requests = FileAccessRequest.query.filter_by(
-            requester_id=current_user.id,
-            owner_id=profile_user.id,
-            status='approved'
-        ).all()
-        
-        for req in approved_requests:
-            if req.file_id:
-                granted_file_ids.append(req.file_id)
-            else:
-                # If file_id is None, they have access to all files
-                granted_file_ids = [f.id for f in files]
-                break
-        
-        # Check which files have pending access requests
-        pending_file_ids = []
-        pending_requests = FileAccessRequest.query.filter_by(
-            requester_id=current_user.id,
-            owner_id=profile_user.id,
-            status='pending'
-        ).all()
+        # Status request akses (granted / pending) semua file dalam satu query -> dict per file_id
+        access_states = resolve_file_access_states((f.id for f in files), current_user.id)
         
-        for req in pending_requests:
-            if req.file_id:
-                pending_file_ids.append(req.file_id)
-            else:
-                # If file_id is None, they requested access to all files
-                pending_file_ids = [f.id for f in files]
-                break
-        
-        return render_template('user_files.html', files=files, profile_user=profile_user, is_private=False, granted_file_ids=granted_file_ids, pending_file_ids=pending_file_ids)
+        return render_template('user_files.html', files=files, profile_user=profile_user, is_private=False, access_states=access_states)
     else:
         # Instead of redirecting, render the user profile page and show a private account message
-        return render_template('user_files.html', files=[], profile_user=profile_user, is_private=True, granted_file_ids=[], pending_file_ids=[])
+        return render_template('user_files.html', files=[], profile_user=profile_user, is_private=True, access_states={})
 # --- AKHIR RUTE BARU ---
 
 
-# --- MODIFIKASI HELPER AKSES ---
-def user_can_access_file(file_id, user_id):
-    """
-    Memeriksa apakah pengguna (user_id) dapat mengakses file (file_id) berdasarkan koneksi atau file access request.
-    """
-    file_record = db.session.get(File, file_id)
-    if not file_record:
-        return False, None
-    
-    if file_record.owner_id == user_id:
-        return True, file_record
-
-    # Check if there's an approved file access request for this specific file
-    file_access_request = FileAccessRequest.query.filter_by(
-        requester_id=user_id,
-        owner_id=file_record.owner_id,
-        file_id=file_id,
-        status='approved'
-    ).first()
-    
-    if file_access_request:
-        return True, file_record
-
-    # Check if there's an accepted connection between the users
-    connection = Connection.query.filter(
-        ((Connection.requester_id == file_record.owner_id) & (Connection.receiver_id == user_id)) |
-        ((Connection.requester_id == user_id) & (Connection.receiver_id == file_record.owner_id)),
-        Connection.status == 'accepted'
-    ).first()
-    
-    if connection:
-        return True, file_record
-        
-    return False, None
-# --- AKHIR MODIFIKASI HELPER ---
-
-
 # --- RUTE DOWNLOAD HIBRIDA (Tidak Berubah dari Langkah 1) ---
 @files_bp.route('/decrypt/<int:file_id>', methods=['GET'])
 @login_required
@@ -373,7 +294,8 @@ def handle_download(file_id):
     Menggantikan logika lama yang berbasis Password-Based Encryption (PBE).
     """
     # 1. Cek izin akses dasar (Owner atau Shared)
-    can_access, file_record = user_can_access_file(file_id, current_user.id)
+    with span('access_check'):
+        can_access, file_record = user_can_access_file(file_id, current_user.id)
     
     # Cek referrer untuk redirect yang tepat jika error
     referrer = request.referrer
@@ -394,36 +316,44 @@ def handle_download(file_id):
             return redirect(referrer)
         return redirect(url_for('files.download_logic', file_id=file_id))
 
-    try:
-        # 3. Ambil Encrypted Private Key User Saat Ini dari MongoDB
-        # Kunci ini diperlukan untuk membuka identitas digital user
-        user_priv_enc = get_user_private_key_enc(current_user.id)
-        if not user_priv_enc:
-            raise Exception("Your private key verification failed. Keys not found.")
+    # Dukungan HTTP Range (preview / resume): cek rentang sebelum membuka kunci apapun
+    is_satisfiable, byte_range = parse_byte_range(file_record)
+    if not is_satisfiable:
+        response = make_response('', 416)
+        response.headers['Content-Range'] = f'bytes */{file_record.file_size or 0}'
+        return response
 
-        # 4. Decrypt Private Key User pakai Password Login
+    try:
+        # 3 & 4. Ambil Encrypted Private Key dari MongoDB lalu buka pakai Password Login
+        # Kunci yang sudah dibuka di sesi login ini diambil dari cache (tanpa KDF lagi)
         # Jika password salah, proses ini akan gagal (ValueError)
-        user_private_key = load_private_key(user_priv_enc, password)
+        with span('unlock_key'):
+            user_private_key = unlock_private_key(current_user.id, password)
+        if user_private_key is None:
+            raise Exception("Your private key verification failed. Keys not found.")
 
         # 5. Tentukan sumber kunci file (Apakah saya Owner atau Konsultan?)
         encrypted_file_key = None
         
-        if file_record.owner_id == current_user.id:
-            # Jika saya Owner, ambil kunci dari koleksi 'file_keys'
-            encrypted_file_key = get_file_key(file_id, current_user.id)
-        else:
-            # Jika saya Konsultan (Diberi Akses), ambil dari 'shared_keys'
-            encrypted_file_key = get_shared_key(file_id, current_user.id)
+        with span('key_lookup'):
+            if file_record.owner_id == current_user.id:
+                # Jika saya Owner, ambil kunci dari koleksi 'file_keys'
+                encrypted_file_key = get_file_key(file_id, current_user.id)
+            else:
+                # Jika saya Konsultan (Diberi Akses), ambil dari 'shared_keys'
+                encrypted_file_key = get_shared_key(file_id, current_user.id)
             
         if not encrypted_file_key:
             raise Exception("Decryption key not found for your account. Please request access again.")
 
-        # 6. Decrypt File Key (RSA) -> Menjadi RAW AES/DES/RC4 KEY
+        # 6. Buka File Key (RSA-OAEP / X25519) -> Menjadi RAW AES/DES/RC4 KEY
         # Membuka 'bungkusan' kunci menggunakan Private Key user
-        raw_file_key = decrypt_with_private_key(user_private_key, encrypted_file_key)
+        with span('unwrap_key'):
+            raw_file_key = unwrap_key(user_private_key, encrypted_file_key)
 
         # 7. Lanjut ke proses dekripsi file fisik menggunakan Raw Key
-        return decrypt_file_data_v2(file_record, raw_file_key, current_user.id)
+        with span('decrypt_setup'):
+            return decrypt_file_data_v2(file_record, raw_file_key, current_user.id, byte_range)
         
     except ValueError:
         # Error ini biasanya muncul dari cryptography jika password salah
@@ -439,6 +369,27 @@ def handle_download(file_id):
         return redirect(url_for('files.download_logic', file_id=file_id))
 
 
+def parse_byte_range(file_record):
+    """
+    Baca header Range dari request untuk file ini.
+    
+    Returns:
+        tuple: (is_satisfiable, byte_range) dengan byte_range = (start, stop) eksklusif,
+               atau None jika seluruh file yang diminta
+    """
+    range_header = request.range
+    # Multi-range tidak didukung; sesuai RFC 7233 kita kirim seluruh file saja
+    if not range_header or range_header.units != 'bytes' or len(range_header.ranges) != 1:
+        return True, None
+    if file_record.file_size is None:
+        return True, None
+    
+    byte_range = range_header.range_for_length(file_record.file_size)
+    if byte_range is None:
+        return False, None
+    return True, byte_range
+
+
 def decrypt_file_data(file_record, file_key, user_id):
     """Fungsi helper terpusat untuk dekripsi (Tidak Berubah)"""
     try:
@@ -451,16 +402,15 @@ def decrypt_file_data(file_record, file_key, user_id):
         elif algorithm == 'RC4': handler = RC4Handler(file_key)
         else: raise Exception("Unknown algorithm")
 
-        start_time = time.time()
         if algorithm == 'RC4':
             decrypted_data, decryption_time = handler.decrypt(encrypted_data)
         else:
             decrypted_data, decryption_time = handler.decrypt(encrypted_data, iv)
         
         log_crypto_operation(
-            user_id=user_id, file_id=file_record.id, operation_type='decryption',
+            user_id=user_id, file_id=file_record.id, file_type=file_record.file_type, operation_type='decryption',
             algorithm=algorithm, file_size=file_record.file_size,
-            execution_time=decryption_time, success=True
+            execution_time=decryption_time, success=True, phase_times=handler.last_timing.phase_times()
         )
         
         response = make_response(decrypted_data)
@@ -471,22 +421,25 @@ def decrypt_file_data(file_record, file_key, user_id):
         return response
     except Exception as e:
         log_crypto_operation(
-            user_id=user_id, file_id=file_record.id, operation_type='decryption',
+            user_id=user_id, file_id=file_record.id, file_type=file_record.file_type, operation_type='decryption',
             algorithm=file_record.encryption_algorithm, file_size=file_record.file_size,
             execution_time=0, success=False, error_message=str(e)
         )
         raise e
 
-def decrypt_file_data_v2(file_record, raw_file_key, user_id):
+def decrypt_file_data_v2(file_record, raw_file_key, user_id, byte_range=None):
     """
     Versi V2: Mendekripsi file fisik menggunakan Raw Key yang sudah didapatkan.
     Fungsi ini menerima kunci mentah (bytes) yang sudah didekripsi dari RSA,
     sehingga tidak perlu lagi melakukan derivasi password (PBKDF2).
+    File dibaca dan didekripsi per chunk lalu dikirim sebagai streaming response,
+    jadi memori tetap datar dan byte pertama langsung terkirim.
+    Jika byte_range (start, stop) diberikan, hanya rentang itu yang didekripsi (HTTP 206).
     """
+    encrypted_file = None
     try:
-        # 1. Baca file terenkripsi dari penyimpanan disk
-        # Menggunakan helper 'read_encrypted_file' yang sudah ada di utils/file_handler.py
-        encrypted_data = read_encrypted_file(file_record.encrypted_filename)
+        # 1. Buka file terenkripsi dari penyimpanan disk (dibaca per chunk, bukan sekaligus)
+        encrypted_file = open_encrypted_file(file_record.encrypted_filename)
         
         # 2. Siapkan parameter dekripsi
         # Mengambil IV dari database jika mode cipher memerlukannya (CBC)
@@ -504,44 +457,36 @@ def decrypt_file_data_v2(file_record, raw_file_key, user_id):
         else: 
             raise Exception(f"Unknown encryption algorithm: {algorithm}")
 
-        # 4. Proses Dekripsi & Logging Waktu
-        # start_time sebenarnya sudah ditangani di dalam handler.decrypt, 
-        # tapi kita ambil return value decryption_time-nya.
-        
-        if algorithm == 'RC4':
-            # RC4 adalah Stream Cipher, tidak butuh IV
-            decrypted_data, decryption_time = handler.decrypt(encrypted_data)
+        # 4. Siapkan stream dekripsi
+        workers = current_app.config.get('CONTAINER_WORKERS')
+        chunk_size = current_app.config.get('ENCRYPTION_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+        if byte_range:
+            # Hanya blok/chunk yang memuat rentang diminta yang dibaca dan didekripsi
+            start, end = byte_range[0], byte_range[1] - 1
+            if file_record.format_version == CONTAINER_FORMAT_VERSION:
+                stream = ContainerReader(encrypted_file, raw_file_key)
+                plaintext_chunks = stream.iter_range(start, end, workers)
+            else:
+                stream, plaintext_chunks = handler.decrypt_range(encrypted_file, iv, start, end, chunk_size)
+            data_size = end - start + 1
+        elif file_record.format_version == CONTAINER_FORMAT_VERSION:
+            # Container chunked: tiap chunk diautentikasi dan didekripsi paralel
+            stream, plaintext_chunks = decrypt_container_stream(raw_file_key, encrypted_file, workers)
+            data_size = file_record.file_size
         else:
-            # AES dan DES (Mode CBC) membutuhkan IV
-            decrypted_data, decryption_time = handler.decrypt(encrypted_data, iv)
-        
-        # 5. Log Operasi Berhasil ke Database
-        log_crypto_operation(
-            user_id=user_id, 
-            file_id=file_record.id, 
-            operation_type='decryption',
-            algorithm=algorithm, 
-            file_size=file_record.file_size,
-            execution_time=decryption_time, 
-            success=True
-        )
-        
-        # 6. Buat Response Flask untuk Download File
-        response = make_response(decrypted_data)
-        response.headers['Content-Type'] = 'application/octet-stream'
-        # Mengatur nama file agar didownload dengan nama aslinya
-        response.headers['Content-Disposition'] = f'attachment; filename="{file_record.original_filename}"'
-        response.headers['Content-Length'] = str(len(decrypted_data))
-        response.headers['Cache-Control'] = 'no-cache'
-        
-        return response
+            # CBC: unpadding hanya dilakukan pada blok terakhir; RC4: keystream biasa (IV diabaikan)
+            stream, plaintext_chunks = handler.decrypt_stream(encrypted_file, iv, chunk_size)
+            data_size = file_record.file_size
 
     except Exception as e:
-        # 7. Log Operasi Gagal (jika ada error)
+        if encrypted_file:
+            encrypted_file.close()
+        # Log Operasi Gagal (jika ada error sebelum streaming dimulai)
         # Sangat penting untuk audit trail keamanan
         log_crypto_operation(
             user_id=user_id, 
             file_id=file_record.id, 
+            file_type=file_record.file_type, 
             operation_type='decryption',
             algorithm=file_record.encryption_algorithm if file_record else 'Unknown', 
             file_size=file_record.file_size if file_record else 0,
@@ -552,6 +497,76 @@ def decrypt_file_data_v2(file_record, raw_file_key, user_id):
         # Lempar error kembali agar bisa ditangkap oleh blok try-except di handle_download
         raise e
 
+    def generate():
+        # 5. Kirim plaintext per chunk; log dicatat setelah stream selesai
+        try:
+            for chunk in plaintext_chunks:
+                yield chunk
+        except Exception as e:
+            record('cipher', stream.elapsed)
+            # Header sudah terkirim, jadi error hanya bisa dicatat di log
+            log_crypto_operation(
+                user_id=user_id, 
+                file_id=file_record.id, 
+                file_type=file_record.file_type, 
+                operation_type='decryption',
+                algorithm=algorithm, 
+                file_size=data_size,
+                execution_time=stream.elapsed, 
+                success=False, 
+                error_message=str(e),
+                phase_times=stream.timer.phase_times()
+            )
+            raise
+        else:
+            # Fase streaming hanya masuk slow-request log (header Server-Timing sudah terkirim)
+            record('cipher', stream.elapsed)
+            with span('log'):
+                log_crypto_operation(
+                    user_id=user_id, 
+                    file_id=file_record.id, 
+                    file_type=file_record.file_type, 
+                    operation_type='decryption',
+                    algorithm=algorithm, 
+                    file_size=data_size,
+                    execution_time=stream.elapsed, 
+                    success=True,
+                    phase_times=stream.timer.phase_times()
+                )
+        finally:
+            encrypted_file.close()
+
+    # 6. Buat Streaming Response Flask untuk Download File
+    response = Response(stream_with_context(generate()), mimetype='application/octet-stream')
+    # Mengatur nama file agar didownload dengan nama aslinya
+    response.headers['Content-Disposition'] = f'attachment; filename="{file_record.original_filename}"'
+    response.headers['Accept-Ranges'] = 'bytes'
+    if byte_range:
+        response.status_code = 206
+        response.headers['Content-Range'] = f'bytes {byte_range[0]}-{byte_range[1] - 1}/{file_record.file_size}'
+        response.headers['Content-Length'] = str(data_size)
+    elif file_record.file_size is not None:
+        # Ukuran plaintext sudah tersimpan saat upload
+        response.headers['Content-Length'] = str(file_record.file_size)
+    response.headers['Cache-Control'] = 'no-cache'
+    
+    return response
+
+@files_bp.route('/status/<int:file_id>')
+@login_required
+def processing_status(file_id):
+    """JSON status of background Excel processing (polled by the file list)"""
+    can_access, file_record = user_can_access_file(file_id, current_user.id)
+    if not can_access:
+        return jsonify({'success': False, 'message': 'File not found'}), 404
+    return jsonify({
+        'success': True,
+        'file_id': file_record.id,
+        'status': file_record.processing_status,
+        'parsed': bool(file_record.parsed_filename),
+        'error': file_record.processing_error
+    })
+
 # --- RUTE LAINNYA (Tidak Berubah) ---
 @files_bp.route('/download-encrypted/<int:file_id>')
 @login_required
@@ -593,6 +608,9 @@ def delete(file_id):
     
     try:
         from models.log import CryptoLog
+        from utils.logger import crypto_log_writer
+        # Tulis log yang masih di buffer dulu agar ikut terhapus
+        crypto_log_writer.flush()
         CryptoLog.query.filter_by(file_id=file_record.id).delete()
         FinancialReport.query.filter_by(file_id=file_record.id).delete()
         
@@ -616,29 +634,67 @@ def delete(file_id):
     return redirect(url_for('main.dashboard'))
 
 
-def process_excel_file(file_data, file_id, handler):
-    # (Fungsi ini tidak berubah dari Langkah 1)
+def process_excel_upload(file_id, file_data, handler):
+    """
+    Background job: build the cell-encrypted copy and the FinancialReport of an
+    uploaded workbook, tracking progress in File.processing_status.
+    """
+    file_record = db.session.get(File, file_id)
+    if file_record is None:
+        return  # File sudah dihapus sebelum job berjalan
+    file_record.processing_status = 'processing'
+    db.session.commit()
+    
     try:
-        try:
-            workbook = openpyxl.load_workbook(BytesIO(file_data))
-        except Exception as load_error:
-            if "zip" in str(load_error).lower():
-                raise Exception("Only .xlsx files are supported for data extraction. Old .xls format is not supported.")
-            raise load_error
-        
-        sheet = workbook.active
-        revenue = sheet['B2'].value if sheet['B2'].value else 0
-        expenses = sheet['B3'].value if sheet['B3'].value else 0
-        profit = sheet['B4'].value if sheet['B4'].value else 0
-        
-        def encrypt_value(value):
-            data = str(value).encode('utf-8')
-            ciphertext, iv, _ = handler.encrypt(data)
-            return ciphertext.hex(), iv.hex() if iv else None
+        # Workbook hanya di-load sekali: nilai laporan dan salinan terenkripsi per-sel
+        # diambil dari model yang sama. Sheet besar diproses per baris (streaming)
+        # dan salinannya ditulis langsung ke disk
+        parsed_filename = f"parsed_{file_record.encrypted_filename}"
+        excel_ingestion = ingest_excel(
+            file_data, handler, get_upload_path(parsed_filename),
+            row_threshold=current_app.config.get('EXCEL_STREAMING_ROW_THRESHOLD', 0),
+            cell_threshold=current_app.config.get('EXCEL_STREAMING_CELL_THRESHOLD', 0)
+        )
+        if excel_ingestion.parsed_path:
+            file_record.parsed_filename = parsed_filename
+            db.session.commit()
+            # Semua sel satu workbook dicatat sebagai satu operasi 'cell_encrypt'
+            log_crypto_operation(
+                user_id=file_record.owner_id,
+                file_id=file_id,
+                operation_type='cell_encryption',
+                algorithm=handler.key_algorithm_name,
+                file_size=excel_ingestion.cell_bytes,
+                execution_time=excel_ingestion.cell_time,
+                success=True,
+                file_type=file_record.file_type,
+                phase_times=excel_ingestion.cell_phase_times
+            )
+        
+        process_excel_file(excel_ingestion, file_id, handler)
+        file_record = db.session.get(File, file_id)
+        file_record.processing_status = 'done'
+        file_record.processing_error = None
+    except Exception as e:
+        db.session.rollback()
+        file_record = db.session.get(File, file_id)
+        if file_record is None:
+            return
+        file_record.processing_status = 'failed'
+        file_record.processing_error = str(e)[:255]
+    db.session.commit()
+
+def process_excel_file(excel_ingestion, file_id, handler):
+    """Simpan nilai laporan (sudah diambil oleh ingest_excel) sebagai FinancialReport terenkripsi"""
+    try:
+        if excel_ingestion.error:
+            raise Exception(excel_ingestion.error)
         
-        revenue_enc, _ = encrypt_value(revenue)
-        expenses_enc, _ = encrypt_value(expenses)
-        profit_enc, _ = encrypt_value(profit)
+        values = excel_ingestion.report_values
+        ciphertexts, _, _ = handler.encrypt_batch([
+            str(values[field]).encode('utf-8') for field in ('revenue', 'expenses', 'profit')
+        ])
+        revenue_enc, expenses_enc, profit_enc = [ciphertext.hex() for ciphertext in ciphertexts]
         
         report = FinancialReport(
             file_id=file_id,
@@ -650,8 +706,6 @@ def process_excel_file(file_data, file_id, handler):
         )
         db.session.add(report)
         db.session.commit()
-    except ImportError:
-        raise Exception("openpyxl not installed. Install with: pip install openpyxl")
     except Exception as e:
         db.session.rollback()
         raise Exception(f"Excel processing error: {str(e)}")
@@ -0,0 +1,31 @@
+import hmac
+import os
+from flask import Blueprint, Response, current_app, request, abort
+from utils.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+_warned_single_process = False
+
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint (text exposition format 0.0.4)"""
+    global _warned_single_process
+    # Scraper harus mengirim "Authorization: Bearer <METRICS_TOKEN>"
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            abort(401)
+    elif not current_app.config.get('METRICS_PUBLIC', False):
+        # Tanpa token, endpoint ditutup kecuali dibuka eksplisit (METRICS_PUBLIC)
+        abort(403)
+
+    # Tanpa METRICS_DIR, server multi-worker hanya melaporkan worker yang menjawab scrape
+    if not metrics.directory and not _warned_single_process:
+        _warned_single_process = True
+        print(f"Warning: METRICS_DIR is not set; /metrics only reports process {os.getpid()}. "
+              "Set METRICS_DIR when running multiple worker processes.")
+
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
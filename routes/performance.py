@@ -1,27 +1,80 @@
-from flask import Blueprint, render_template
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required
+from sqlalchemy import func
 from extensions import db
-from models import CryptoLog, File
+from models import CryptoLogRollup, CryptoLatencyHistogram, File
+from utils.rollups import rollup_query, latency_percentiles, throughput_stats, bytes_per_second
 
 performance_bp = Blueprint('performance', __name__, url_prefix='/performance')
 
+# Kelas ukuran untuk tabel throughput: (label, size_bucket minimum, size_bucket maksimum)
+THROUGHPUT_SIZE_CLASSES = [
+    ('< 64 KB', 0, 15),
+    ('64 KB - 1 MB', 16, 19),
+    ('1 - 16 MB', 20, 23),
+    ('>= 16 MB', 24, 63),
+]
+THROUGHPUT_OPERATIONS = ('encrypt', 'decrypt', 'cell_encrypt')
+
+# Batas atas parameter ?days= (10 tahun)
+MAX_LATENCY_DAYS = 3650
+
+
+def summarize_throughput(throughput):
+    """Merge throughput_stats() rows into THROUGHPUT_SIZE_CLASSES (MB/s per algorithm and operation)"""
+    rows = []
+    for algo in ('AES', 'DES', 'RC4'):
+        for operation in THROUGHPUT_OPERATIONS:
+            entries = [
+                (size_bucket, values) for (a, o, size_bucket), values in throughput.items()
+                if (a, o) == (algo, operation)
+            ]
+            if not entries:
+                continue
+            classes = []
+            for _, low, high in THROUGHPUT_SIZE_CLASSES:
+                total_size = sum(v['total_size'] for b, v in entries if low <= b <= high)
+                total_time = sum(v['total_time'] for b, v in entries if low <= b <= high)
+                rate = bytes_per_second(total_size, total_time)
+                classes.append(rate / (1024 * 1024) if rate is not None else None)
+            overall = bytes_per_second(
+                sum(v['total_size'] for _, v in entries), sum(v['total_time'] for _, v in entries)
+            )
+            rows.append({
+                'algorithm': algo,
+                'operation': operation,
+                'operations': sum(v['operations'] for _, v in entries),
+                'overall_mbps': overall / (1024 * 1024) if overall is not None else None,
+                'classes_mbps': classes,
+            })
+    return rows
+
 @performance_bp.route('/', defaults={'file_type': 'all'})
 @performance_bp.route('/<string:file_type>')
 @login_required
 def show_performance(file_type):
     """Menampilkan dasbor perbandingan performa, bisa difilter berdasarkan tipe file."""
     
-    # Query dasar untuk logs
-    log_query = db.session.query(CryptoLog).join(File, CryptoLog.file_id == File.id)
-    file_query = File.query
+    # Statistik log dibaca dari rollup harian (lihat utils/rollups.py)
+    log_query = rollup_query(
+        CryptoLogRollup.algorithm,
+        CryptoLogRollup.operation,
+        file_type=None if file_type == 'all' else file_type
+    )
+    file_query = db.session.query(
+        File.encryption_algorithm,
+        func.count(File.id),
+        func.coalesce(func.sum(File.file_size), 0),
+        func.coalesce(func.sum(File.encrypted_size), 0)
+    )
 
     # Terapkan filter jika bukan 'all'
     if file_type != 'all':
-        log_query = log_query.filter(File.file_type == file_type)
         file_query = file_query.filter(File.file_type == file_type)
 
-    logs = log_query.all()
-    files = file_query.all()
+    log_rows = log_query.all()
+    file_rows = file_query.group_by(File.encryption_algorithm).all()
     
     # Inisialisasi struktur data untuk statistik
     stats = {
@@ -30,16 +83,11 @@ def show_performance(file_type):
         'RC4': {'encrypt_count': 0, 'encrypt_time': 0, 'decrypt_count': 0, 'decrypt_time': 0},
     }
     
-    # Proses setiap log
-    for log in logs:
-        algo = log.algorithm
-        if algo in stats:
-            if log.operation == 'encrypt':
-                stats[algo]['encrypt_count'] += 1
-                stats[algo]['encrypt_time'] += log.execution_time
-            elif log.operation == 'decrypt':
-                stats[algo]['decrypt_count'] += 1
-                stats[algo]['decrypt_time'] += log.execution_time
+    # Satu baris per (algoritma, operasi)
+    for row in log_rows:
+        if row.algorithm in stats and row.operation in ('encrypt', 'decrypt'):
+            stats[row.algorithm][f'{row.operation}_count'] = int(row.operations)
+            stats[row.algorithm][f'{row.operation}_time'] = float(row.total_time)
     
     # Hitung rata-rata waktu
     for algo in stats:
@@ -60,12 +108,12 @@ def show_performance(file_type):
         'RC4': {'count': 0, 'total_original': 0, 'total_encrypted': 0},
     }
 
-    for f in files:
-        algo = f.encryption_algorithm
+    # Satu baris per algoritma
+    for algo, count, total_original, total_encrypted in file_rows:
         if algo in size_stats:
-            size_stats[algo]['count'] += 1
-            size_stats[algo]['total_original'] += f.file_size
-            size_stats[algo]['total_encrypted'] += f.encrypted_size
+            size_stats[algo]['count'] = count
+            size_stats[algo]['total_original'] = int(total_original)
+            size_stats[algo]['total_encrypted'] = int(total_encrypted)
     
     for algo in size_stats:
         if size_stats[algo]['count'] > 0:
@@ -76,6 +124,42 @@ def show_performance(file_type):
         else:
             size_stats[algo]['avg_overhead_percent'] = 0
             
+    # Persentil latensi per (algoritma, operasi) dari histogram harian
+    percentiles = latency_percentiles(
+        CryptoLatencyHistogram.algorithm,
+        CryptoLatencyHistogram.operation,
+        file_type=None if file_type == 'all' else file_type
+    )
+    latency_stats = []
+    for algo in stats:
+        for operation in ('encrypt', 'decrypt'):
+            if (algo, operation) in percentiles:
+                latency_stats.append(dict(percentiles[(algo, operation)], algorithm=algo, operation=operation))
+
+    # Throughput (byte/detik) per kelas ukuran, termasuk enkripsi per-sel Excel
+    throughput_rows = summarize_throughput(
+        throughput_stats(file_type=None if file_type == 'all' else file_type, operations=THROUGHPUT_OPERATIONS)
+    )
+
+    # Rincian waktu per fase (setup / cipher / padding), hanya log yang punya rincian fase
+    phase_rows = []
+    for row in rollup_query(
+        CryptoLogRollup.algorithm, CryptoLogRollup.operation,
+        file_type=None if file_type == 'all' else file_type, operations=THROUGHPUT_OPERATIONS
+    ).order_by(CryptoLogRollup.algorithm, CryptoLogRollup.operation).all():
+        phases = {phase: float(getattr(row, f'{phase}_time')) for phase in ('setup', 'cipher', 'padding')}
+        phase_total = sum(phases.values())
+        # Rata-rata hanya atas log yang punya rincian fase (log lama tidak ikut)
+        count = int(row.phase_operations)
+        if not phase_total or not count:
+            continue
+        phase_rows.append({
+            'algorithm': row.algorithm,
+            'operation': row.operation,
+            'avg_ms': {phase: value / count * 1000 for phase, value in phases.items()},
+            'percent': {phase: value / phase_total * 100 for phase, value in phases.items()},
+        })
+
     # Siapkan data untuk Chart.js
     chart_labels = list(stats.keys())
     encryption_times = [data['avg_encrypt_time'] for data in stats.values()]
@@ -88,9 +172,84 @@ def show_performance(file_type):
         'performance.html',
         stats=stats,
         size_stats=size_stats,
+        latency_stats=latency_stats,
+        throughput_rows=throughput_rows,
+        phase_rows=phase_rows,
+        throughput_classes=[label for label, _, _ in THROUGHPUT_SIZE_CLASSES],
         chart_labels=chart_labels,
         encryption_times=encryption_times,
         decryption_times=decryption_times,
         current_filter=file_type,
         available_types=available_types
-    )
\ No newline at end of file
+    )
+
+
+@performance_bp.route('/latency')
+@login_required
+def latency():
+    """
+    JSON latency percentiles (p50/p90/p99/max, in seconds) per algorithm and
+    operation, overall and per file-size bucket.
+
+    Query args:
+        file_type: 'all' (default) or a file type
+        days: only the last N days, 1 to MAX_LATENCY_DAYS; larger values are
+              clamped (default: all history)
+    """
+    file_type = request.args.get('file_type', 'all')
+    days = None
+    if request.args.get('days'):
+        try:
+            days = int(request.args['days'])
+        except ValueError:
+            days = 0
+        if days < 1:
+            return jsonify({'success': False, 'message': 'days must be a positive integer'}), 400
+        days = min(days, MAX_LATENCY_DAYS)
+    since = datetime.utcnow() - timedelta(days=days - 1) if days else None
+
+    percentiles = latency_percentiles(
+        CryptoLatencyHistogram.algorithm,
+        CryptoLatencyHistogram.operation,
+        CryptoLatencyHistogram.size_bucket,
+        file_type=None if file_type == 'all' else file_type,
+        since=since
+    )
+    overall = latency_percentiles(
+        CryptoLatencyHistogram.algorithm,
+        CryptoLatencyHistogram.operation,
+        file_type=None if file_type == 'all' else file_type,
+        since=since
+    )
+
+    results = []
+    for (algo, operation), summary in sorted(overall.items()):
+        by_size = [
+            dict(values, size_bucket=size_bucket, min_bytes=2 ** size_bucket if size_bucket else 0,
+                 max_bytes=2 ** (size_bucket + 1) - 1)
+            for (a, o, size_bucket), values in sorted(percentiles.items())
+            if (a, o) == (algo, operation)
+        ]
+        results.append(dict(summary, algorithm=algo, operation=operation, by_size=by_size))
+
+    return jsonify({'success': True, 'file_type': file_type, 'days': days, 'latency': results})
+
+
+@performance_bp.route('/throughput')
+@login_required
+def throughput():
+    """
+    JSON throughput (bytes/s, total bytes over total time) per algorithm,
+    operation and power-of-two size class, including Excel cell encryption.
+
+    Query args:
+        file_type: 'all' (default) or a file type
+    """
+    file_type = request.args.get('file_type', 'all')
+    stats = throughput_stats(file_type=None if file_type == 'all' else file_type)
+    results = [
+        dict(values, algorithm=algo, operation=operation, size_bucket=size_bucket,
+             min_bytes=2 ** size_bucket if size_bucket else 0, max_bytes=2 ** (size_bucket + 1) - 1)
+        for (algo, operation, size_bucket), values in sorted(stats.items())
+    ]
+    return jsonify({'success': True, 'file_type': file_type, 'throughput': results})
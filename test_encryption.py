@@ -164,6 +164,172 @@ def test_file_encryption():
     
     return test_content == decrypted_data
 
+def test_streaming_encryption():
+    """Test chunked (streaming) encryption, decryption and range decryption against the one-shot API"""
+    print("\n" + "="*60)
+    print("Testing Streaming Encryption")
+    print("="*60)
+    
+    import io
+    
+    # Ukuran sengaja tidak kelipatan blok maupun chunk
+    plaintext = os.urandom(200 * 1024 + 5)
+    chunk_size = 4096 + 3
+    
+    all_passed = True
+    for name, handler in [
+        ("AES", AESHandler(os.urandom(32))),
+        ("DES", DESHandler(os.urandom(8))),
+        ("RC4", RC4Handler(os.urandom(16))),
+    ]:
+        stream, chunks = handler.encrypt_stream(io.BytesIO(plaintext), chunk_size)
+        ciphertext = b"".join(chunks)
+        
+        if name == "RC4":
+            decrypted, _ = handler.decrypt(ciphertext)
+        else:
+            decrypted, _ = handler.decrypt(ciphertext, stream.iv)
+        
+        # Dekripsi streaming harus menghasilkan plaintext yang sama
+        _, plain_chunks = handler.decrypt_stream(io.BytesIO(ciphertext), stream.iv, chunk_size)
+        streamed = b"".join(plain_chunks)
+        
+        # Random access: hanya rentang byte tertentu (melewati batas blok)
+        start, end = 12345, 150000
+        _, range_chunks = handler.decrypt_range(io.BytesIO(ciphertext), stream.iv, start, end, chunk_size)
+        ranged = b"".join(range_chunks)
+        
+        passed = (decrypted == plaintext and streamed == plaintext
+                  and ranged == plaintext[start:end + 1]
+                  and stream.bytes_out == len(ciphertext))
+        print(f"{name}: {len(ciphertext)} bytes ciphertext, {stream.elapsed:.6f} s -> {'✅' if passed else '❌'}")
+        all_passed = all_passed and passed
+    
+    return all_passed
+
+def test_container_format():
+    """Test the chunked AES-GCM container (parallel chunks, random access, tamper detection)"""
+    print("\n" + "="*60)
+    print("Testing Chunked Container Format")
+    print("="*60)
+    
+    import io
+    from encryption.container import (
+        encrypt_container_stream, decrypt_container_stream, ContainerReader, ContainerError
+    )
+    
+    key = os.urandom(32)
+    plaintext = os.urandom(300 * 1024 + 7)
+    chunk_size = 64 * 1024
+    
+    encryptor, chunks = encrypt_container_stream(key, io.BytesIO(plaintext), len(plaintext), chunk_size, workers=4)
+    container = b"".join(chunks)
+    print(f"Container size: {len(container)} bytes, {encryptor.chunk_count} chunks")
+    
+    # Dekripsi penuh (paralel)
+    reader, plain_chunks = decrypt_container_stream(key, io.BytesIO(container), workers=4)
+    roundtrip_ok = b"".join(plain_chunks) == plaintext
+    print(f"Full round trip: {'✅' if roundtrip_ok else '❌'}")
+    
+    # Dekripsi satu chunk saja
+    reader = ContainerReader(io.BytesIO(container), key)
+    single_ok = reader.decrypt_chunk(2) == plaintext[2 * chunk_size:3 * chunk_size]
+    single_ok = single_ok and b"".join(reader.iter_range(70000, 200000)) == plaintext[70000:200001]
+    print(f"Single chunk / range decrypt: {'✅' if single_ok else '❌'}")
+    
+    # Ubah satu byte -> autentikasi harus gagal
+    tampered = bytearray(container)
+    tampered[-5] ^= 0x01
+    try:
+        b"".join(decrypt_container_stream(key, io.BytesIO(bytes(tampered)))[1])
+        tamper_ok = False
+    except ContainerError:
+        tamper_ok = True
+    print(f"Tamper detection: {'✅' if tamper_ok else '❌'}")
+    
+    return roundtrip_ok and single_ok and tamper_ok
+
+def test_batch_encryption():
+    """Test batch (per-cell) encryption against the one-shot API"""
+    print("\n" + "="*60)
+    print("Testing Batch Cell Encryption")
+    print("="*60)
+    
+    # Panjang bervariasi: kosong, kurang dari satu blok, tepat satu blok, beberapa blok
+    payloads = [b"", b"1", b"Revenue", b"x" * 8, b"y" * 16, "Laba bersih 2024".encode()] + \
+               [str(i * 7919).encode() * (1 + i % 7) for i in range(1000)]
+    
+    all_passed = True
+    for name, handler in [
+        ("AES", AESHandler(os.urandom(32))),
+        ("DES", DESHandler(os.urandom(8))),
+        ("RC4", RC4Handler(os.urandom(16))),
+    ]:
+        ciphertexts, ivs, batch_time = handler.encrypt_batch(payloads)
+        if name == "RC4":
+            decrypted = [handler.decrypt(c)[0] for c in ciphertexts]
+        else:
+            decrypted = [handler.decrypt(c, iv)[0] for c, iv in zip(ciphertexts, ivs)]
+        
+        passed = decrypted == payloads
+        if name != "RC4":
+            # Setiap sel harus punya IV sendiri
+            passed = passed and len(set(ivs)) == len(payloads)
+        print(f"{name}: {len(payloads)} cells in {batch_time:.6f} s -> {'✅' if passed else '❌'}")
+        all_passed = all_passed and passed
+    
+    return all_passed
+
+def test_phase_timing():
+    """Test PhaseTimer accounting: phases sum to the reported time, padding only where it exists"""
+    print("\n" + "="*60)
+    print("Testing Phase Timing (setup / cipher / padding)")
+    print("="*60)
+    
+    import io
+    import time
+    from encryption.stream import CipherStream
+    
+    plaintext = os.urandom(10 * 1024 + 3)
+    all_passed = True
+    for name, handler in [
+        ("AES", AESHandler(os.urandom(32))),
+        ("DES", DESHandler(os.urandom(8))),
+        ("RC4", RC4Handler(os.urandom(16))),
+    ]:
+        _, _, encrypt_time = handler.encrypt(plaintext)
+        timing = handler.last_timing
+        phases = timing.phase_times()
+        # Jumlah fase harus sama dengan waktu yang dikembalikan handler
+        passed = abs(sum(phases.values()) - encrypt_time) < 1e-9 and timing.total_ns > 0
+        if name == "RC4":
+            # RC4 adalah stream cipher: tidak ada padding
+            passed = passed and timing.ns['padding'] == 0
+        print(f"{name}: setup {timing.ns['setup']} ns, cipher {timing.ns['cipher']} ns, "
+              f"padding {timing.ns['padding']} ns -> {'✅' if passed else '❌'}")
+        all_passed = all_passed and passed
+    
+    # CipherStream: update() dihitung sebagai cipher, finalize() sebagai padding
+    stream = CipherStream(lambda chunk: chunk, lambda: (time.sleep(0.002), b'')[1])
+    stream.update(b'x' * 1024)
+    before = dict(stream.timer.ns)
+    stream.finalize()
+    after = stream.timer.ns
+    finalize_ok = (before['padding'] == 0 and after['padding'] >= 2_000_000
+                   and after['cipher'] == before['cipher']
+                   and abs(stream.elapsed - sum(stream.timer.phase_times().values())) < 1e-9)
+    print(f"CipherStream.finalize() -> padding: {after['padding']} ns {'✅' if finalize_ok else '❌'}")
+    
+    # Stream AES sungguhan: padding hanya tercatat setelah finalize()
+    stream, chunks = AESHandler(os.urandom(32)).encrypt_stream(io.BytesIO(plaintext), 4096)
+    b"".join(chunks)
+    stream_ok = stream.timer.ns['padding'] > 0 and stream.timer.ns['cipher'] > 0
+    print(f"AES stream phases: {stream.timer.ns} {'✅' if stream_ok else '❌'}")
+    
+    all_passed = all_passed and finalize_ok and stream_ok
+    assert all_passed, "Phase timing mismatch"
+    return all_passed
+
 def test_performance():
     """Test encryption performance"""
     print("\n" + "="*60)
@@ -270,6 +436,30 @@ def main():
         print(f"❌ File Encryption Test Error: {e}")
         results.append(("File Encryption", False))
     
+    try:
+        results.append(("Streaming", test_streaming_encryption()))
+    except Exception as e:
+        print(f"❌ Streaming Test Error: {e}")
+        results.append(("Streaming", False))
+    
+    try:
+        results.append(("Container", test_container_format()))
+    except Exception as e:
+        print(f"❌ Container Test Error: {e}")
+        results.append(("Container", False))
+    
+    try:
+        results.append(("Batch", test_batch_encryption()))
+    except Exception as e:
+        print(f"❌ Batch Test Error: {e}")
+        results.append(("Batch", False))
+    
+    try:
+        results.append(("Phase Timing", test_phase_timing()))
+    except Exception as e:
+        print(f"❌ Phase Timing Test Error: {e}")
+        results.append(("Phase Timing", False))
+    
     try:
         test_performance()
     except Exception as e:
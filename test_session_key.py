@@ -106,6 +106,53 @@ def test_workflow():
         print("   ❌ Files don't match!")
         return False
 
+def test_key_wrapping():
+    """Test wrapping file keys with RSA-OAEP and X25519 key pairs"""
+    print("\n" + "="*60)
+    print("Testing Key Wrapping (RSA-OAEP & X25519)")
+    print("="*60)
+    
+    from utils.key_wrap import (
+        generate_user_key_pair, scheme_for_key, wrap_key, unwrap_key,
+        SCHEME_RSA_OAEP, SCHEME_X25519
+    )
+    from utils.rsa_handler import (
+        serialize_private_key, serialize_public_key, load_private_key, load_public_key
+    )
+    
+    file_key = generate_file_key('AES')
+    for scheme in [SCHEME_RSA_OAEP, SCHEME_X25519]:
+        print(f"\n--- Testing {scheme} ---")
+        private_key, public_key = generate_user_key_pair(scheme)
+        
+        # Simpan & muat ulang seperti saat register/download
+        private_pem = serialize_private_key(private_key, "password123")
+        public_pem = serialize_public_key(public_key)
+        private_key = load_private_key(private_pem, "password123")
+        public_key = load_public_key(public_pem)
+        
+        if scheme_for_key(public_key) != scheme or scheme_for_key(private_key) != scheme:
+            print(f"❌ {scheme} scheme detection FAILED!")
+            return False
+        
+        wrapped = wrap_key(public_key, file_key)
+        print(f"Wrapped key size: {len(wrapped)} bytes")
+        if unwrap_key(private_key, wrapped) != file_key:
+            print(f"❌ {scheme} wrap/unwrap FAILED!")
+            return False
+        
+        # Kunci orang lain tidak boleh bisa membuka
+        other_private, _ = generate_user_key_pair(scheme)
+        try:
+            unwrap_key(other_private, wrapped)
+            print(f"❌ {scheme} unwrapped with the wrong key!")
+            return False
+        except Exception:
+            pass
+        print(f"✅ {scheme} key wrapping works!")
+    
+    return True
+
 if __name__ == "__main__":
     print("\n" + "="*60)
     print("🔐 SESSION KEY & KEY MANAGEMENT TEST")
@@ -117,14 +164,18 @@ if __name__ == "__main__":
     # Test full workflow
     test2 = test_workflow()
     
+    # Test key wrapping
+    test3 = test_key_wrapping()
+    
     # Summary
     print("\n" + "="*60)
     print("📋 TEST SUMMARY")
     print("="*60)
     print(f"Key Encryption Test: {'✅ PASSED' if test1 else '❌ FAILED'}")
     print(f"Workflow Test: {'✅ PASSED' if test2 else '❌ FAILED'}")
+    print(f"Key Wrapping Test: {'✅ PASSED' if test3 else '❌ FAILED'}")
     
-    if test1 and test2:
+    if test1 and test2 and test3:
         print("\n🎉 All tests passed! Session key management works correctly!")
     else:
         print("\n⚠️ Some tests failed!")
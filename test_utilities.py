@@ -190,6 +190,286 @@ def test_key_manager():
     match = original_key == decrypted_key
     print(f"   Keys match: {match} {'✓' if match else '✗'}")
 
+def test_access_cache():
+    """Test the access decision cache (TTL, LRU, invalidation)"""
+    print("\n" + "="*50)
+    print("Testing access_control.py (AccessDecisionCache)")
+    print("="*50)
+    
+    import time
+    from utils.access_control import AccessDecisionCache
+    
+    # Test TTL expiry
+    print("\n1. TTL Expiry:")
+    cache = AccessDecisionCache(max_size=10, ttl=0.05)
+    cache.put(('file', 2, 10), 2, 1, True)
+    hit = cache.get(('file', 2, 10))
+    time.sleep(0.1)
+    expired = cache.get(('file', 2, 10))
+    ok = hit == (True, True) and expired == (False, None)
+    print(f"   {'✓' if ok else '✗'} fresh: {hit}, after TTL: {expired}")
+    assert ok
+    
+    # Test LRU eviction
+    print("\n2. LRU Eviction:")
+    cache = AccessDecisionCache(max_size=2, ttl=60)
+    cache.put(('file', 2, 10), 2, 1, True)
+    cache.put(('file', 2, 11), 2, 1, False)
+    cache.get(('file', 2, 10))  # 10 jadi yang terakhir dipakai
+    cache.put(('file', 2, 12), 2, 1, True)
+    ok = (cache.get(('file', 2, 11)) == (False, None)
+          and cache.get(('file', 2, 10)) == (True, True)
+          and cache.get(('file', 2, 12)) == (True, True))
+    print(f"   {'✓' if ok else '✗'} least recently used entry evicted")
+    assert ok
+    
+    # Test invalidate_pair (kedua arah)
+    print("\n3. invalidate_pair:")
+    cache = AccessDecisionCache(max_size=10, ttl=60)
+    cache.put(('file', 2, 10), 2, 1, True)     # 2 melihat file milik 1
+    cache.put(('profile', 1, 2), 1, 2, True)   # 1 melihat profil 2
+    cache.put(('file', 3, 10), 3, 1, True)     # pasangan lain
+    cache.invalidate_pair(2, 1)
+    ok = (cache.get(('file', 2, 10)) == (False, None)
+          and cache.get(('profile', 1, 2)) == (False, None)
+          and cache.get(('file', 3, 10)) == (True, True))
+    print(f"   {'✓' if ok else '✗'} both directions dropped, other pairs kept")
+    assert ok
+    
+    # Test invalidate_owner (mis. setelah toggle privacy)
+    print("\n4. invalidate_owner:")
+    cache = AccessDecisionCache(max_size=10, ttl=60)
+    cache.put(('profile', 2, 1), 2, 1, False)
+    cache.put(('profile', 3, 1), 3, 1, False)
+    cache.put(('file', 3, 10), 3, 1, False)
+    cache.put(('profile', 1, 4), 1, 4, True)   # 1 sebagai viewer, bukan owner
+    cache.invalidate_owner(1)
+    ok = (all(cache.get(key) == (False, None) for key in (('profile', 2, 1), ('profile', 3, 1), ('file', 3, 10)))
+          and cache.get(('profile', 1, 4)) == (True, True))
+    print(f"   {'✓' if ok else '✗'} owner's decisions dropped, viewer entries kept")
+    assert ok
+    
+    # Cache dimatikan (ACL_CACHE_TTL = 0)
+    cache = AccessDecisionCache(max_size=10, ttl=0)
+    cache.put(('file', 2, 10), 2, 1, True)
+    ok = cache.get(('file', 2, 10)) == (False, None)
+    print(f"   {'✓' if ok else '✗'} TTL 0 disables caching")
+    assert ok
+
+def test_access_invalidation():
+    """Test that revoking access / toggling privacy takes effect in the same process"""
+    print("\n" + "="*50)
+    print("Testing access_control.py (invalidation with a database)")
+    print("="*50)
+    
+    from flask import Flask
+    from extensions import db
+    from models import User, File, FileAccessRequest
+    from models.connection import Connection  # noqa: F401 (tabel connections untuk create_all)
+    from utils.access_control import (
+        acl_cache, user_can_access_file, user_can_view_files,
+        invalidate_access, invalidate_owner_access
+    )
+    
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    # Cache proses dipakai bersama test lain: pulihkan pengaturannya walau assert gagal
+    previous_size, previous_ttl = acl_cache.max_size, acl_cache.ttl
+    acl_cache.configure(max_size=100, ttl=60)
+    try:
+        with app.app_context():
+            db.create_all()
+            try:
+                owner = User(username='owner', email='owner@example.com', password_hash='x', is_private=True)
+                viewer = User(username='viewer', email='viewer@example.com', password_hash='x')
+                db.session.add_all([owner, viewer])
+                db.session.flush()
+                file_record = File(file_uuid='test-file', original_filename='report.xlsx', encrypted_filename='report.enc',
+                                   owner_id=owner.id, encryption_algorithm='AES', salt='00')
+                db.session.add(file_record)
+                db.session.flush()
+                file_request = FileAccessRequest(requester_id=viewer.id, owner_id=owner.id,
+                                                 file_id=file_record.id, status='approved')
+                db.session.add(file_request)
+                db.session.commit()
+                
+                # Test revoke
+                print("\n1. Revoked File Access Request:")
+                allowed, record = user_can_access_file(file_record.id, viewer.id)
+                cached = acl_cache.get(('file', viewer.id, file_record.id))
+                ok = allowed and record is not None and record.id == file_record.id and cached == (True, True)
+                print(f"   {'✓' if ok else '✗'} approved: {allowed}, cached: {cached}")
+                assert ok
+                
+                # Sama seperti routes/access.py revoke_access
+                file_request.status = 'revoked'
+                db.session.commit()
+                invalidate_access(owner.id, viewer.id)
+                result = user_can_access_file(file_record.id, viewer.id)
+                ok = result == (False, None)
+                print(f"   {'✓' if ok else '✗'} after revoke: {result}")
+                assert ok
+                
+                # Test privacy toggle
+                print("\n2. Privacy Toggle:")
+                before = user_can_view_files(owner, viewer.id)
+                owner.is_private = False
+                db.session.commit()
+                invalidate_owner_access(owner.id)
+                after = user_can_view_files(owner, viewer.id)
+                dropped = acl_cache.get(('profile', viewer.id, owner.id)) == (False, None)
+                ok = before is False and after is True and dropped
+                print(f"   {'✓' if ok else '✗'} private: {before}, public: {after}, cached decision dropped: {dropped}")
+                assert ok
+            finally:
+                db.session.remove()
+                db.drop_all()
+    finally:
+        # configure() juga mengosongkan cache
+        acl_cache.configure(max_size=previous_size, ttl=previous_ttl)
+
+def test_rollups():
+    """Test rollup aggregation, latency buckets, percentiles and throughput"""
+    print("\n" + "="*50)
+    print("Testing rollups.py")
+    print("="*50)
+    
+    import math
+    import random
+    from datetime import datetime, timedelta
+    from utils.rollups import (
+        aggregate_rows, aggregate_latency, latency_bucket, latency_bucket_upper,
+        histogram_percentiles, bytes_per_second, ROLLUP_MERGE
+    )
+    
+    # Test merge associativity: dua batch yang di-upsert = satu batch
+    print("\n1. aggregate_rows Merge:")
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1, 10, 30)
+    rows = []
+    for i in range(200):
+        row = {
+            'timestamp': start + timedelta(minutes=rng.randint(0, 3000)),
+            'user_id': rng.choice([1, 2, None]),
+            'algorithm': rng.choice(['AES', 'DES', 'RC4']),
+            'operation': rng.choice(['encrypt', 'decrypt']),
+            'file_type': rng.choice(['excel', 'image', None]),
+            'data_size': rng.choice([0, 1, 700, 5000, 2 ** 20]),
+            'execution_time': rng.uniform(1e-5, 0.5),
+        }
+        if i % 3:  # sebagian log tanpa rincian fase (log lama)
+            row.update(setup_time=1e-4, cipher_time=row['execution_time'] - 2e-4, padding_time=1e-4)
+        rows.append(row)
+    
+    def merge(first, second):
+        # Sama seperti _upsert_generic / ON DUPLICATE KEY UPDATE
+        merged = {key: dict(agg) for key, agg in first.items()}
+        for key, agg in second.items():
+            if key not in merged:
+                merged[key] = dict(agg)
+                continue
+            for column in ROLLUP_MERGE['sum']:
+                merged[key][column] += agg[column]
+            for column in ROLLUP_MERGE['min']:
+                merged[key][column] = min(merged[key][column], agg[column])
+            for column in ROLLUP_MERGE['max']:
+                merged[key][column] = max(merged[key][column], agg[column])
+        return merged
+    
+    def same(a, b):
+        return a.keys() == b.keys() and all(
+            math.isclose(a[key][column], b[key][column], rel_tol=1e-9, abs_tol=1e-12)
+            for key in a for column in a[key]
+        )
+    
+    whole = aggregate_rows(rows)
+    merged = merge(aggregate_rows(rows[:80]), aggregate_rows(rows[80:]))
+    regrouped = merge(aggregate_rows(rows[:30]), merge(aggregate_rows(rows[30:150]), aggregate_rows(rows[150:])))
+    incremental = aggregate_rows(rows[120:], aggregate_rows(rows[:120]))
+    day_count = sum(agg['count'] for key, agg in whole.items() if key[0] == 'day')
+    phase_count = sum(agg['phase_count'] for key, agg in whole.items() if key[0] == 'day')
+    ok = same(whole, merged) and same(whole, regrouped) and same(whole, incremental)
+    print(f"   {'✓' if ok else '✗'} 2 / 3 merged batches and incremental fold equal one batch ({len(whole)} keys)")
+    assert ok
+    ok = day_count == len(rows) and phase_count == sum(1 for row in rows if 'setup_time' in row)
+    print(f"   {'✓' if ok else '✗'} count: {day_count}, phase_count: {phase_count}")
+    assert ok
+    # Operasi gagal (execution_time=0, success=False) tidak ikut rollup
+    failed = dict(rows[0], execution_time=0, success=False)
+    ok = same(whole, aggregate_rows(rows + [failed])) and same(whole, aggregate_rows([dict(rows[0], success=True)] + rows[1:]))
+    print(f"   {'✓' if ok else '✗'} failed operations skipped")
+    assert ok
+    
+    # Test latency bucket boundaries
+    print("\n2. latency_bucket Boundaries:")
+    test_times = [
+        (0.0, 0), (None, 0), (0.9e-6, 0),   # di bawah 1 us
+        (1e-6, 1), (2e-6, 9), (4e-6, 17),   # 2**k us -> bucket 8k + 1
+        (2 ** 10 / 1e6, 81), (2 ** 20 / 1e6, 161),
+    ]
+    for execution_time, expected in test_times:
+        bucket = latency_bucket(execution_time)
+        status = "✓" if bucket == expected else "✗"
+        print(f"   {status} {execution_time} s → bucket {bucket}")
+        assert bucket == expected
+    # Setiap nilai ada di [upper(b - 1), upper(b)) dan bucket tetangga naik satu
+    ok = True
+    for i in range(1, 400):
+        execution_time = 1e-6 * 1.05 ** i
+        bucket = latency_bucket(execution_time)
+        ok = ok and latency_bucket_upper(bucket - 1) <= execution_time * (1 + 1e-12)
+        ok = ok and execution_time < latency_bucket_upper(bucket) * (1 + 1e-12)
+        ok = ok and latency_bucket_upper(bucket) / latency_bucket_upper(bucket - 1) < 1.091
+    print(f"   {'✓' if ok else '✗'} values fall inside their bucket, relative width < 9.1%")
+    assert ok
+    
+    # Test percentiles against a known distribution: 1..1000 ms
+    print("\n3. histogram_percentiles:")
+    times = [ms / 1000 for ms in range(1, 1001)]
+    histograms = aggregate_latency([
+        {'timestamp': start, 'algorithm': 'AES', 'operation': 'encrypt', 'data_size': 1024, 'execution_time': t}
+        for t in reversed(times)
+    ])
+    # Upload gagal dicatat dengan execution_time=0, success=False: tidak boleh masuk bucket 0
+    failed = [
+        {'timestamp': start, 'algorithm': 'AES', 'operation': 'encrypt', 'data_size': 1024,
+         'execution_time': 0, 'success': False}
+        for _ in range(500)
+    ]
+    aggregate_latency(failed, histograms)
+    result = histogram_percentiles({key[-1]: (h['count'], h['max_time']) for key, h in histograms.items()})
+    ok = result['count'] == 1000 and result['max'] == 1.0
+    for p, exact in ((50, 0.5), (90, 0.9), (99, 0.99)):
+        estimate = result[f'p{p}']
+        # Batas atas bucket: tidak pernah di bawah nilai sebenarnya, galat < 9.1%
+        passed = exact <= estimate < exact * 1.091
+        ok = ok and passed
+        print(f"   {'✓' if passed else '✗'} p{p}: {estimate:.4f} s (exact {exact} s)")
+    single = histogram_percentiles({latency_bucket(0.0123): (5, 0.0123)})
+    empty = histogram_percentiles({})
+    ok = ok and single['p50'] == single['p99'] == single['max'] == 0.0123
+    ok = ok and empty == {'count': 0, 'max': 0.0, 'p50': 0.0, 'p90': 0.0, 'p99': 0.0}
+    ok = ok and not any(key[-1] == 0 for key in histograms)
+    print(f"   {'✓' if ok else '✗'} one-bucket values capped at max, empty histogram all zero, failed rows skipped")
+    assert ok
+    
+    # Test throughput
+    print("\n4. bytes_per_second:")
+    from decimal import Decimal
+    test_rates = [
+        ((1024 * 1024, 0.5), 2 * 1024 * 1024),
+        ((Decimal(3000), Decimal('1.5')), 2000.0),  # SUM() dari MySQL
+        ((1024, 0), None),
+        ((None, None), None),
+        ((0, 2.0), 0.0),
+    ]
+    for (total_size, total_time), expected in test_rates:
+        rate = bytes_per_second(total_size, total_time)
+        passed = rate == expected if expected is None else math.isclose(rate, expected)
+        print(f"   {'✓' if passed else '✗'} {total_size} bytes / {total_time} s → {rate}")
+        assert passed
+
 if __name__ == "__main__":
     print("\n" + "="*70)
     print("PHASE 2 UTILITY FUNCTIONS TEST")
@@ -199,6 +479,9 @@ if __name__ == "__main__":
         test_validators()
         test_file_handler()
         test_key_manager()
+        test_access_cache()
+        test_access_invalidation()
+        test_rollups()
         
         print("\n" + "="*70)
         print("✓ ALL TESTS COMPLETED SUCCESSFULLY!")
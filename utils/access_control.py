@@ -0,0 +1,302 @@
+"""
+File authorization queries
+A user may open a file when they own it, when the owner approved an access
+request for that file (or for all of the owner's files), or when the two
+users have an accepted connection. The decision and the file row come back
+from a single SELECT with EXISTS subqueries, backed by the composite indexes
+on file_access_requests(requester_id, file_id, status) and
+connections(requester_id, receiver_id, status).
+
+Decisions are cached per request (flask.g) and across requests in
+acl_cache (short TTL). Routes that change access (connections accepted or
+removed, access requests approved or revoked, privacy toggled) invalidate
+the affected pair explicitly; other worker processes catch up within
+ACL_CACHE_TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_request_context
+from sqlalchemy import select, exists, or_, and_, case, func
+
+from extensions import db
+from models.file import File
+from models.file_access_request import FileAccessRequest
+from models.connection import Connection
+from models.access import UserAccess
+
+# Status akses per file untuk daftar file (resolve_file_access_states)
+ACCESS_GRANTED = 'granted'
+ACCESS_PENDING = 'pending'
+
+# Default: 30 detik, maksimal 4096 keputusan per proses
+DEFAULT_ACL_CACHE_TTL = 30
+DEFAULT_ACL_CACHE_SIZE = 4096
+
+
+class AccessDecisionCache:
+    """
+    Size-bounded LRU cache of access decisions with a short TTL.
+
+    Keys are ('file', user_id, file_id) and ('profile', viewer_id, owner_id);
+    every entry remembers the viewer and the owner it is about, so a change
+    between two users can drop exactly their decisions.
+    """
+
+    def __init__(self, max_size=DEFAULT_ACL_CACHE_SIZE, ttl=DEFAULT_ACL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, max_size=None, ttl=None):
+        """Apply settings from Config (called once at startup)"""
+        with self._lock:
+            if max_size is not None:
+                self.max_size = max_size
+            if ttl is not None:
+                self.ttl = ttl
+            self._entries.clear()
+
+    def get(self, key):
+        """Return (True, decision) on a hit, (False, None) on miss / expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            decision, _, _, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, decision
+
+    def put(self, key, viewer_id, owner_id, decision):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (decision, viewer_id, owner_id, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_pair(self, user_a, user_b):
+        """Drop decisions between two users, in both directions"""
+        pair = {user_a, user_b}
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if {entry[1], entry[2]} == pair]:
+                del self._entries[key]
+
+    def invalidate_owner(self, owner_id):
+        """Drop every decision about an owner's files and profile"""
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry[2] == owner_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+acl_cache = AccessDecisionCache()
+
+
+def init_acl_cache(app):
+    """Configure the process-wide access decision cache from the Flask config"""
+    acl_cache.configure(
+        max_size=app.config.get('ACL_CACHE_SIZE', DEFAULT_ACL_CACHE_SIZE),
+        ttl=app.config.get('ACL_CACHE_TTL', DEFAULT_ACL_CACHE_TTL)
+    )
+
+
+def _request_decisions():
+    # Cache per request: pengecekan berulang dalam satu request tidak menyentuh lock / DB
+    if not has_request_context():
+        return {}
+    if '_acl_decisions' not in g:
+        g._acl_decisions = {}
+    return g._acl_decisions
+
+
+def _cached_decision(key):
+    decisions = _request_decisions()
+    if key in decisions:
+        return True, decisions[key]
+    found, decision = acl_cache.get(key)
+    if found:
+        decisions[key] = decision
+    return found, decision
+
+
+def _remember(key, viewer_id, owner_id, decision):
+    _request_decisions()[key] = decision
+    acl_cache.put(key, viewer_id, owner_id, decision)
+
+
+def invalidate_access(user_a, user_b):
+    """Call after committing a change to the access between two users"""
+    acl_cache.invalidate_pair(user_a, user_b)
+    if has_request_context():
+        g.pop('_acl_decisions', None)
+
+
+def invalidate_owner_access(owner_id):
+    """Call after committing a change that affects everyone viewing owner_id (e.g. privacy)"""
+    acl_cache.invalidate_owner(owner_id)
+    if has_request_context():
+        g.pop('_acl_decisions', None)
+
+
+def file_access_clause(user_id):
+    """
+    Boolean SQL expression: may user_id open the File row of the outer query?
+
+    Every branch is its own EXISTS so each one is an index lookup (no OR
+    across index columns).
+    """
+    approved_for_file = exists().where(
+        FileAccessRequest.requester_id == user_id,
+        FileAccessRequest.file_id == File.id,
+        FileAccessRequest.status == 'approved'
+    )
+    # Request untuk semua file owner (file_id = NULL)
+    approved_for_owner = exists().where(
+        FileAccessRequest.requester_id == user_id,
+        FileAccessRequest.file_id.is_(None),
+        FileAccessRequest.status == 'approved',
+        FileAccessRequest.owner_id == File.owner_id
+    )
+    # Koneksi dua arah: cek kedua arah dengan urutan kolom index yang sama
+    connected_from_owner = exists().where(
+        Connection.requester_id == File.owner_id,
+        Connection.receiver_id == user_id,
+        Connection.status == 'accepted'
+    )
+    connected_to_owner = exists().where(
+        Connection.requester_id == user_id,
+        Connection.receiver_id == File.owner_id,
+        Connection.status == 'accepted'
+    )
+    return or_(
+        File.owner_id == user_id,
+        approved_for_file,
+        approved_for_owner,
+        connected_from_owner,
+        connected_to_owner
+    )
+
+
+def user_can_access_file(file_id, user_id):
+    """
+    Memeriksa apakah pengguna (user_id) dapat mengakses file (file_id) berdasarkan
+    kepemilikan, koneksi atau file access request, dalam satu query.
+    Keputusan yang sudah di-cache hanya butuh lookup primary key untuk baris File.
+
+    Args:
+        file_id (int): File to open
+        user_id (int): User asking for it
+
+    Returns:
+        tuple: (True, File) when allowed, otherwise (False, None)
+    """
+    key = ('file', user_id, file_id)
+    found, allowed = _cached_decision(key)
+    if found:
+        if not allowed:
+            return False, None
+        file_record = db.session.get(File, file_id)
+        return (True, file_record) if file_record else (False, None)
+
+    row = db.session.execute(
+        select(File, file_access_clause(user_id).label('allowed')).where(File.id == file_id)
+    ).first()
+    if row is None:
+        # File tidak ada: tidak di-cache (id bisa dipakai oleh upload berikutnya)
+        return False, None
+    allowed = bool(row.allowed)
+    _remember(key, user_id, row.File.owner_id, allowed)
+    return (True, row.File) if allowed else (False, None)
+
+
+def user_can_view_files(profile_user, viewer_id):
+    """
+    Whether viewer_id may see profile_user's file list: the profile is public,
+    the owner granted UserAccess, or the two users are connected.
+
+    Args:
+        profile_user (User): Owner of the listing
+        viewer_id (int): User looking at it
+
+    Returns:
+        bool
+    """
+    if not profile_user.is_private:
+        return True
+
+    key = ('profile', viewer_id, profile_user.id)
+    found, allowed = _cached_decision(key)
+    if found:
+        return allowed
+
+    granted = exists().where(
+        UserAccess.owner_id == profile_user.id,
+        UserAccess.authorized_user_id == viewer_id
+    )
+    connected = exists().where(
+        or_(
+            (Connection.requester_id == profile_user.id) & (Connection.receiver_id == viewer_id),
+            (Connection.requester_id == viewer_id) & (Connection.receiver_id == profile_user.id)
+        ),
+        Connection.status == 'accepted'
+    )
+    allowed = bool(db.session.execute(select(or_(granted, connected))).scalar())
+    _remember(key, viewer_id, profile_user.id, allowed)
+    return allowed
+
+
+def resolve_file_access_states(file_ids, requester_id):
+    """
+    Access-request state of many files for one requester, in one grouped query.
+
+    A file is granted when an approved request covers it (for that file or
+    for all of the owner's files); otherwise pending when a pending request
+    covers it. Connections do not count here: the listing shows the request
+    state, downloads are still checked by user_can_access_file().
+
+    Args:
+        file_ids (iterable): Files to resolve (any owners)
+        requester_id (int): User the listing is for
+
+    Returns:
+        dict: file_id -> ACCESS_GRANTED or ACCESS_PENDING; files without a
+              request are left out (use states.get(file_id))
+    """
+    file_ids = set(file_ids)
+    if not file_ids:
+        return {}
+
+    covers_file = and_(
+        FileAccessRequest.requester_id == requester_id,
+        FileAccessRequest.status.in_(('approved', 'pending')),
+        or_(
+            FileAccessRequest.file_id == File.id,
+            # Request untuk semua file owner (file_id = NULL)
+            and_(FileAccessRequest.file_id.is_(None), FileAccessRequest.owner_id == File.owner_id)
+        )
+    )
+    rows = db.session.execute(
+        select(
+            File.id,
+            func.max(case((FileAccessRequest.status == 'approved', 1), else_=0)).label('approved'),
+            func.max(case((FileAccessRequest.status == 'pending', 1), else_=0)).label('pending')
+        )
+        .join(FileAccessRequest, covers_file)
+        .where(File.id.in_(file_ids))
+        .group_by(File.id)
+    ).all()
+
+    return {
+        row.id: ACCESS_GRANTED if row.approved else ACCESS_PENDING
+        for row in rows
+    }
@@ -0,0 +1,235 @@
+"""
+Single-pass Excel ingestion for uploads
+Loads the workbook once, pulls the FinancialReport fields and produces the
+cell-encrypted (parsed) copy from the same in-memory model.
+
+Large sheets switch to a streaming mode: rows are read through openpyxl's
+read_only iterator and written through a write_only workbook straight to a
+temporary file on disk, so memory stays bounded. Streaming keeps only the
+active sheet's values (no styles, merged cells or other sheets).
+"""
+import base64
+import os
+import time
+from io import BytesIO
+
+import openpyxl
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string
+
+from encryption.timing import PhaseTimer
+from utils.metrics import EXCEL_INGEST_SECONDS, EXCEL_CELLS
+
+# Sel sumber untuk kolom FinancialReport (lihat create_template.py)
+REPORT_CELLS = {
+    'revenue': 'B2',
+    'expenses': 'B3',
+    'profit': 'B4',
+}
+
+# Baris yang dienkripsi sekaligus dalam mode streaming
+STREAMING_BATCH_ROWS = 1000
+
+
+class ExcelIngestion:
+    """
+    Result of ingest_excel().
+
+    Attributes:
+        parsed_path (str or None): Where the cell-encrypted copy was written
+        report_values (dict or None): Raw values for REPORT_CELLS (missing -> 0)
+        error (str or None): Why the workbook could not be read
+        streamed (bool): True if the streaming (read_only/write_only) mode was used
+        cell_count (int): Number of cells encrypted
+        cell_bytes (int): Plaintext bytes of the encrypted cells
+        cell_time (float): Seconds spent in cell encryption (cipher only, no I/O)
+        cell_phase_times (dict): cell_time split into setup_time, cipher_time and padding_time
+    """
+
+    def __init__(self, parsed_path=None, report_values=None, error=None, streamed=False, cell_totals=None):
+        self.parsed_path = parsed_path
+        self.report_values = report_values
+        self.error = error
+        self.streamed = streamed
+        cell_totals = cell_totals or _new_cell_totals()
+        self.cell_count = cell_totals['count']
+        self.cell_bytes = cell_totals['bytes']
+        self.cell_time = cell_totals['timer'].elapsed
+        self.cell_phase_times = cell_totals['timer'].phase_times()
+
+
+def _new_cell_totals():
+    return {'count': 0, 'bytes': 0, 'timer': PhaseTimer()}
+
+
+def _as_file(source):
+    """Accept raw bytes or a seekable file-like object and rewind it"""
+    if isinstance(source, (bytes, bytearray)):
+        return BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def load_workbook_data(source, **options):
+    """Load an .xlsx workbook with a readable error for old .xls files"""
+    try:
+        return openpyxl.load_workbook(_as_file(source), **options)
+    except Exception as load_error:
+        if "zip" in str(load_error).lower():
+            raise Exception("Only .xlsx files are supported for data extraction. Old .xls format is not supported.")
+        raise load_error
+
+
+def extract_report_values(sheet):
+    """Read the FinancialReport fields from the sheet (before cells are encrypted)"""
+    values = {}
+    for field, coordinate in REPORT_CELLS.items():
+        value = sheet[coordinate].value
+        values[field] = value if value else 0
+    return values
+
+
+def _encrypt_values(values, handler, cell_totals):
+    """Encrypt a list of cell values in one batch -> base64(iv || ciphertext) strings"""
+    payloads = [str(value).encode('utf-8') for value in values]
+    ciphertexts, ivs, _ = handler.encrypt_batch(payloads)
+    cell_totals['count'] += len(payloads)
+    cell_totals['bytes'] += sum(len(payload) for payload in payloads)
+    cell_totals['timer'].merge(handler.last_timing)
+    return [
+        base64.b64encode((iv if iv else b'') + ciphertext).decode('utf-8')
+        for ciphertext, iv in zip(ciphertexts, ivs)
+    ]
+
+
+def encrypt_sheet_cells(sheet, handler, cell_totals):
+    """Replace every non-empty cell with base64(iv || ciphertext), encrypted in one batch"""
+    cells = [cell for row in sheet.iter_rows() for cell in row if cell.value]
+    for cell, encrypted in zip(cells, _encrypt_values([cell.value for cell in cells], handler, cell_totals)):
+        cell.value = encrypted
+
+
+def should_stream(source, row_threshold=0, cell_threshold=0):
+    """
+    Decide between the full and the streaming mode from the sheet's declared
+    dimensions (read_only load only parses the workbook index, not the cells).
+    A threshold of 0 disables that check; sheets without a dimension record
+    are streamed whenever a threshold is set.
+    """
+    if not row_threshold and not cell_threshold:
+        return False
+    workbook = load_workbook_data(source, read_only=True)
+    try:
+        sheet = workbook.active
+        max_row, max_column = sheet.max_row, sheet.max_column
+    finally:
+        workbook.close()
+    if max_row is None or max_column is None:
+        return True
+    return bool((row_threshold and max_row > row_threshold)
+                or (cell_threshold and max_row * max_column > cell_threshold))
+
+
+def _save_atomically(save_func, output_path):
+    # Tulis ke file sementara lalu rename, jadi tidak ada file parsed setengah jadi
+    temp_path = f"{output_path}.tmp"
+    try:
+        save_func(temp_path)
+        os.replace(temp_path, output_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _stream_parsed_copy(source, handler, output_path, cell_totals):
+    """Streaming mode: read_only rows -> batch encrypt -> write_only workbook on disk"""
+    report_positions = {}
+    for field, coordinate in REPORT_CELLS.items():
+        column, row = coordinate_from_string(coordinate)
+        report_positions[(row, column_index_from_string(column) - 1)] = field
+    report_values = {field: 0 for field in REPORT_CELLS}
+
+    source_workbook = load_workbook_data(source, read_only=True)
+    output_workbook = openpyxl.Workbook(write_only=True)
+    try:
+        source_sheet = source_workbook.active
+        output_sheet = output_workbook.create_sheet(title=source_sheet.title)
+
+        def flush(rows):
+            values = [value for row in rows for value in row if value]
+            encrypted = iter(_encrypt_values(values, handler, cell_totals))
+            for row in rows:
+                output_sheet.append([next(encrypted) if value else value for value in row])
+
+        pending = []
+        for row_number, row in enumerate(source_sheet.iter_rows(values_only=True), start=1):
+            for (report_row, column), field in report_positions.items():
+                if report_row == row_number and column < len(row) and row[column]:
+                    report_values[field] = row[column]
+            pending.append(row)
+            if len(pending) >= STREAMING_BATCH_ROWS:
+                flush(pending)
+                pending = []
+        if pending:
+            flush(pending)
+
+        _save_atomically(output_workbook.save, output_path)
+    finally:
+        source_workbook.close()
+    return report_values
+
+
+def ingest_excel(source, handler, output_path, row_threshold=0, cell_threshold=0):
+    """
+    Load the workbook once and derive everything the upload needs from it.
+
+    Args:
+        source (bytes or file-like): Uploaded .xlsx content
+        handler: AES/DES/RC4 handler holding the file key
+        output_path (str): Where to write the cell-encrypted copy
+        row_threshold (int): Stream sheets with more rows than this (0 = never)
+        cell_threshold (int): Stream sheets with more cells than this (0 = never)
+
+    Returns:
+        ExcelIngestion
+    """
+    start = time.perf_counter()
+    ingestion = _ingest(source, handler, output_path, row_threshold, cell_threshold)
+    mode = 'failed' if ingestion.error else ('streamed' if ingestion.streamed else 'full')
+    EXCEL_INGEST_SECONDS.observe(time.perf_counter() - start, mode=mode)
+    if ingestion.cell_count:
+        EXCEL_CELLS.inc(ingestion.cell_count, algorithm=handler.key_algorithm_name)
+    return ingestion
+
+
+def _ingest(source, handler, output_path, row_threshold, cell_threshold):
+    try:
+        streamed = should_stream(source, row_threshold, cell_threshold)
+    except Exception as e:
+        return ExcelIngestion(error=str(e))
+
+    cell_totals = _new_cell_totals()
+    if streamed:
+        try:
+            report_values = _stream_parsed_copy(source, handler, output_path, cell_totals)
+            return ExcelIngestion(output_path, report_values, streamed=True, cell_totals=cell_totals)
+        except Exception as e:
+            return ExcelIngestion(error=str(e), streamed=True)
+
+    try:
+        workbook = load_workbook_data(source)
+    except Exception as e:
+        return ExcelIngestion(error=str(e))
+
+    sheet = workbook.active
+    report_values = extract_report_values(sheet)
+
+    parsed_path = None
+    try:
+        encrypt_sheet_cells(sheet, handler, cell_totals)
+        _save_atomically(workbook.save, output_path)
+        parsed_path = output_path
+    except Exception as e:
+        print(f"Gagal memproses excel per-sel: {e}")
+
+    return ExcelIngestion(parsed_path, report_values, cell_totals=cell_totals if parsed_path else None)
@@ -3,9 +3,12 @@ Utility functions for file handling
 Handles file operations, path management, and file metadata
 """
 import os
+import time
 import uuid
 from werkzeug.utils import secure_filename
 from config import Config
+from utils.metrics import DISK_IO_SECONDS, DISK_IO_BYTES
+from utils.profiling import record
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {
@@ -175,11 +178,50 @@ def save_encrypted_file(encrypted_data, filename):
     """
     file_path = get_upload_path(filename)
     
+    start = time.perf_counter()
     with open(file_path, 'wb') as f:
         f.write(encrypted_data)
+    write_time = time.perf_counter() - start
+    DISK_IO_SECONDS.observe(write_time, operation='write')
+    record('disk_write', write_time)
+    DISK_IO_BYTES.inc(len(encrypted_data), operation='write')
     
     return file_path
 
+def save_encrypted_stream(chunks, filename):
+    """
+    Save encrypted data to disk chunk by chunk (streaming upload)
+    
+    Args:
+        chunks (iterable of bytes): Ciphertext chunks, e.g. from handler.encrypt_stream()
+        filename (str): Filename to save as
+    
+    Returns:
+        tuple: (file_path, bytes_written)
+    """
+    file_path = get_upload_path(filename)
+    bytes_written = 0
+    write_time = 0.0
+    
+    try:
+        with open(file_path, 'wb') as f:
+            for chunk in chunks:
+                # Hanya waktu tulis yang diukur (chunk dihasilkan oleh cipher)
+                start = time.perf_counter()
+                f.write(chunk)
+                write_time += time.perf_counter() - start
+                bytes_written += len(chunk)
+    except Exception:
+        # Jangan tinggalkan file setengah jadi di disk
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    DISK_IO_SECONDS.observe(write_time, operation='write')
+    DISK_IO_BYTES.inc(bytes_written, operation='write')
+    record('disk_write', write_time)
+    
+    return file_path, bytes_written
+
 def read_encrypted_file(filename):
     """
     Read encrypted file from disk
@@ -195,8 +237,66 @@ def read_encrypted_file(filename):
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {filename}")
     
+    start = time.perf_counter()
     with open(file_path, 'rb') as f:
-        return f.read()
+        data = f.read()
+    read_time = time.perf_counter() - start
+    DISK_IO_SECONDS.observe(read_time, operation='read')
+    record('disk_read', read_time)
+    DISK_IO_BYTES.inc(len(data), operation='read')
+    return data
+
+def open_encrypted_file(filename):
+    """
+    Open encrypted file from disk for chunked (streaming) reads
+    
+    Args:
+        filename (str): Name of the file
+    
+    Returns:
+        MeteredFile: Binary file handle; caller is responsible for closing it
+    """
+    file_path = get_upload_path(filename)
+    
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {filename}")
+    
+    return MeteredFile(open(file_path, 'rb'))
+
+class MeteredFile:
+    """
+    Read-only file wrapper that records read time and bytes for /metrics.
+    The totals are reported once, when the file is closed.
+    """
+    
+    def __init__(self, file_obj):
+        self._file = file_obj
+        self.read_time = 0.0
+        self.bytes_read = 0
+    
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self._file.read(size)
+        self.read_time += time.perf_counter() - start
+        self.bytes_read += len(data)
+        return data
+    
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            DISK_IO_SECONDS.observe(self.read_time, operation='read')
+            record('disk_read', self.read_time)
+            DISK_IO_BYTES.inc(self.bytes_read, operation='read')
+    
+    def __getattr__(self, name):
+        # seek, tell, closed, dll. diteruskan ke file asli
+        return getattr(self._file, name)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
 
 def delete_file(filename):
     """
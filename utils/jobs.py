@@ -0,0 +1,197 @@
+"""
+Local background job queue (no external broker)
+Runs slow post-upload work such as Excel parsing on a thread pool inside an
+app context, so the upload request returns once the ciphertext is committed.
+"""
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 32
+DEFAULT_STALE_AFTER = 3600  # detik
+STALE_JOB_ERROR = 'Processing was interrupted by a server restart. Please upload the file again.'
+
+
+class JobQueue:
+    """
+    Thread-pool job queue bound to the Flask app.
+
+    Modes:
+        'thread' - jobs run on a background thread pool (default)
+        'sync'   - jobs run inline in submit() (tests, debugging)
+
+    When more than max_pending jobs are queued, submit() runs the job inline
+    instead, so queued payloads never grow without bound.
+    """
+
+    def __init__(self, mode='thread', workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        self.mode = mode
+        self.workers = workers
+        self.max_pending = max_pending
+        self.app = None
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def configure(self, app, mode=None, workers=None, max_pending=None):
+        """Bind to the app and apply settings from Config"""
+        self.app = app
+        if mode is not None:
+            self.mode = mode
+        if workers is not None:
+            self.workers = workers
+        if max_pending is not None:
+            self.max_pending = max_pending
+
+    def _get_executor(self):
+        # Thread pool dibuat per proses (aman untuk server pre-fork)
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, func, args, kwargs):
+        with self.app.app_context():
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                print(f"Background job {func.__name__} failed: {e}")
+                raise
+
+    def _run_queued(self, func, args, kwargs):
+        try:
+            return self._run(func, args, kwargs)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) in an app context.
+
+        Returns:
+            bool: True if the job was queued, False if it already ran inline
+        """
+        if self.app is None:
+            raise RuntimeError("JobQueue is not configured; call init_job_queue(app) first")
+
+        with self._lock:
+            queued = self.mode != 'sync' and self._pending < self.max_pending
+            if queued:
+                self._pending += 1
+                executor = self._get_executor()
+
+        if not queued:
+            try:
+                self._run(func, args, kwargs)
+            except Exception:
+                pass
+            return False
+
+        executor.submit(self._run_queued, func, args, kwargs)
+        return True
+
+    def shutdown(self, wait=True):
+        """Finish queued jobs and stop the pool (registered with atexit)"""
+        with self._lock:
+            executor = self._executor if self._pid == os.getpid() else None
+            self._executor = None
+            self._pid = None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+job_queue = JobQueue()
+atexit.register(job_queue.shutdown)
+
+
+def fail_stale_jobs(app, stale_after=DEFAULT_STALE_AFTER):
+    """
+    Mark Excel processing jobs that can no longer finish as failed.
+
+    Jobs live only in process memory (the plaintext workbook is never stored),
+    so jobs queued by a worker that restarted or crashed are lost and cannot be
+    re-enqueued. Files still 'pending'/'processing' stale_after seconds after
+    upload are marked 'failed', so the file list stops waiting for them.
+    Jobs of other live workers are younger than the cutoff and left alone.
+
+    Returns:
+        int: Number of files marked as failed
+    """
+    from extensions import db
+    from models.file import File
+
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    with app.app_context():
+        try:
+            count = File.query.filter(
+                File.processing_status.in_(('pending', 'processing')),
+                File.uploaded_at < cutoff
+            ).update(
+                {'processing_status': 'failed', 'processing_error': STALE_JOB_ERROR},
+                synchronize_session=False
+            )
+            db.session.commit()
+        except Exception as e:
+            # Mis. tabel belum ada (sebelum flask db upgrade) atau database belum siap
+            db.session.rollback()
+            print(f"Stale job check skipped: {e}")
+            return 0
+    if count:
+        print(f"Marked {count} interrupted Excel processing job(s) as failed")
+    return count
+
+
+@click.command('fail-stale-jobs')
+@click.option('--older-than', type=int, default=None,
+              help='Seconds since upload (default: JOB_STALE_AFTER).')
+@with_appcontext
+def fail_stale_jobs_command(older_than):
+    """Mark Excel processing jobs lost in a restart as failed."""
+    from flask import current_app
+    app = current_app._get_current_object()
+    if older_than is None:
+        older_than = app.config.get('JOB_STALE_AFTER', DEFAULT_STALE_AFTER) or DEFAULT_STALE_AFTER
+    count = fail_stale_jobs(app, older_than)
+    click.echo(f"Marked {count} stale job(s) as failed.")
+
+
+def init_job_queue(app):
+    """
+    Configure the process-wide job queue from the Flask config.
+
+    Jobs lost in a restart are failed by the first request each worker
+    process serves (never at import time, so scripts and tests importing
+    the app do not touch the files table), or on demand with
+    `flask fail-stale-jobs`.
+    """
+    job_queue.configure(
+        app,
+        mode=app.config.get('JOB_QUEUE_MODE', 'thread'),
+        workers=app.config.get('JOB_QUEUE_WORKERS', DEFAULT_WORKERS),
+        max_pending=app.config.get('JOB_QUEUE_MAX_PENDING', DEFAULT_MAX_PENDING)
+    )
+    app.cli.add_command(fail_stale_jobs_command)
+
+    stale_after = app.config.get('JOB_STALE_AFTER', DEFAULT_STALE_AFTER)
+    if stale_after <= 0:
+        return
+    checked_pids = set()
+    lock = threading.Lock()
+
+    @app.before_request
+    def _fail_stale_jobs_once():
+        if app.testing:
+            return
+        with lock:
+            if os.getpid() in checked_pids:
+                return
+            checked_pids.add(os.getpid())
+        fail_stale_jobs(app, stale_after)
@@ -0,0 +1,354 @@
+"""
+In-process caches for unlocked private keys and parsed public keys
+Avoids re-running the PKCS8 KDF + key parsing (load_private_key) on every download
+and the Mongo round trip + PEM parse (load_public_key) on every upload / approval
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask import session
+
+from utils.nosql_handler import get_user_private_key_enc, get_user_public_key
+from utils.rsa_handler import load_private_key, load_public_key
+from utils.metrics import PRIVATE_KEY_UNLOCK_SECONDS
+from utils.profiling import span
+
+# Default: 5 menit, maksimal 128 kunci terbuka per proses
+DEFAULT_PRIVATE_KEY_TTL = 300
+DEFAULT_PRIVATE_KEY_CACHE_SIZE = 128
+
+# Public key jarang berubah: 1 jam, maksimal 1024 kunci per proses
+DEFAULT_PUBLIC_KEY_TTL = 3600
+DEFAULT_PUBLIC_KEY_CACHE_SIZE = 1024
+SHARED_KEY_PREFIX = 'sfe:pubkey:'
+
+
+class PrivateKeyCache:
+    """
+    Size-bounded LRU cache of unlocked private keys with a short TTL.
+
+    Entries are keyed by (user_id, login session id) and live only in process
+    memory. Each entry also keeps an HMAC of the password that unlocked it
+    (with a random per-process secret), so a hit still requires the same
+    password but skips the expensive KDF.
+    """
+
+    def __init__(self, max_size=DEFAULT_PRIVATE_KEY_CACHE_SIZE, ttl=DEFAULT_PRIVATE_KEY_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._secret = os.urandom(32)
+
+    def configure(self, max_size=None, ttl=None):
+        """Apply settings from Config (called once at startup)"""
+        with self._lock:
+            if max_size is not None:
+                self.max_size = max_size
+            if ttl is not None:
+                self.ttl = ttl
+            self._evict_overflow()
+
+    def _password_tag(self, password):
+        if isinstance(password, str):
+            password = password.encode()
+        return hmac.new(self._secret, password, hashlib.sha256).digest()
+
+    def _evict_overflow(self):
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _purge_expired(self):
+        # Jangan biarkan kunci kedaluwarsa tinggal di memori sampai tergeser LRU
+        now = time.monotonic()
+        for cache_key in [k for k, entry in self._entries.items() if entry[2] < now]:
+            del self._entries[cache_key]
+
+    def get(self, user_id, session_id, password):
+        """Return the cached key, or None on miss / expiry / password mismatch"""
+        if self.max_size <= 0:
+            return None
+        cache_key = (user_id, session_id)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            private_key, password_tag, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[cache_key]
+                return None
+            if not hmac.compare_digest(password_tag, self._password_tag(password)):
+                return None
+            self._entries.move_to_end(cache_key)
+            return private_key
+
+    def put(self, user_id, session_id, password, private_key):
+        """Store an unlocked key for this user and login session"""
+        if self.max_size <= 0:
+            return
+        cache_key = (user_id, session_id)
+        with self._lock:
+            self._purge_expired()
+            self._entries[cache_key] = (
+                private_key, self._password_tag(password), time.monotonic() + self.ttl
+            )
+            self._entries.move_to_end(cache_key)
+            self._evict_overflow()
+
+    def evict_session(self, user_id, session_id):
+        """Drop the key for one login session (used on logout)"""
+        with self._lock:
+            self._entries.pop((user_id, session_id), None)
+
+    def evict_user(self, user_id):
+        """Drop every cached key belonging to a user"""
+        with self._lock:
+            for cache_key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[cache_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class LocalPemStore:
+    """
+    Process-local stand-in for the shared PEM tier (same interface as RedisPemStore).
+    Useful for development and tests; it is not shared between workers.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            return self._data.get(user_id)
+
+    def set(self, user_id, public_key_pem, ttl):
+        with self._lock:
+            self._data[user_id] = public_key_pem
+
+    def delete(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+
+class RedisPemStore:
+    """Shared PEM tier in Redis, so every worker skips the Mongo round trip"""
+
+    def __init__(self, url):
+        import redis  # optional dependency
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, user_id):
+        return self._redis.get(f"{SHARED_KEY_PREFIX}{user_id}")
+
+    def set(self, user_id, public_key_pem, ttl):
+        self._redis.set(f"{SHARED_KEY_PREFIX}{user_id}", public_key_pem, ex=ttl)
+
+    def delete(self, user_id):
+        self._redis.delete(f"{SHARED_KEY_PREFIX}{user_id}")
+
+
+def create_pem_store(url):
+    """
+    Build the shared tier from PUBLIC_KEY_SHARED_CACHE_URL:
+    '' -> None (local cache only), 'local' -> LocalPemStore, 'redis://...' -> RedisPemStore
+    """
+    if not url:
+        return None
+    if url == 'local':
+        return LocalPemStore()
+    try:
+        return RedisPemStore(url)
+    except ImportError:
+        print("Warning: redis is not installed, public key cache runs without a shared tier")
+        return None
+
+
+class PublicKeyCache:
+    """
+    Size-bounded LRU cache of parsed public key objects.
+
+    Entries are keyed by user_id and remember the SHA-256 fingerprint of the
+    PEM they were parsed from. With a shared tier the PEM is read from it on
+    every lookup (cheap) and the parsed object is reused only while the
+    fingerprint still matches, so key changes made by another worker are
+    picked up immediately. Without it, the TTL bounds staleness across workers
+    and store_user_keys() invalidates the local entry.
+    """
+
+    def __init__(self, max_size=DEFAULT_PUBLIC_KEY_CACHE_SIZE, ttl=DEFAULT_PUBLIC_KEY_TTL, shared_store=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_store = shared_store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, max_size=None, ttl=None, shared_store=None):
+        """Apply settings from Config (called once at startup)"""
+        with self._lock:
+            if max_size is not None:
+                self.max_size = max_size
+            if ttl is not None:
+                self.ttl = ttl
+            self.shared_store = shared_store
+            self._entries.clear()
+
+    @staticmethod
+    def fingerprint(public_key_pem):
+        if isinstance(public_key_pem, str):
+            public_key_pem = public_key_pem.encode()
+        return hashlib.sha256(public_key_pem).digest()
+
+    def _lookup(self, user_id, fingerprint=None):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            entry_fingerprint, public_key, expires_at = entry
+            if expires_at < time.monotonic() or (fingerprint and fingerprint != entry_fingerprint):
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return public_key
+
+    def _store(self, user_id, fingerprint, public_key):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (fingerprint, public_key, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _shared_get(self, user_id):
+        try:
+            return self.shared_store.get(user_id)
+        except Exception as e:
+            print(f"Public key shared cache unavailable: {e}")
+            return None
+
+    def get(self, user_id):
+        """
+        Return the user's parsed public key.
+
+        Returns:
+            Public key object, or None if the user has no stored key.
+        """
+        public_key_pem = None
+        if self.shared_store is not None:
+            public_key_pem = self._shared_get(user_id)
+            if public_key_pem is not None:
+                fingerprint = self.fingerprint(public_key_pem)
+                public_key = self._lookup(user_id, fingerprint)
+                if public_key is not None:
+                    return public_key
+        else:
+            public_key = self._lookup(user_id)
+            if public_key is not None:
+                return public_key
+
+        if public_key_pem is None:
+            public_key_pem = get_user_public_key(user_id)
+            if not public_key_pem:
+                return None
+            if self.shared_store is not None:
+                try:
+                    self.shared_store.set(user_id, public_key_pem, self.ttl)
+                except Exception as e:
+                    print(f"Public key shared cache unavailable: {e}")
+
+        public_key = load_public_key(public_key_pem)
+        self._store(user_id, self.fingerprint(public_key_pem), public_key)
+        return public_key
+
+    def invalidate(self, user_id):
+        """Forget a user's key in this process and in the shared tier (key changed)"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if self.shared_store is not None:
+            try:
+                self.shared_store.delete(user_id)
+            except Exception as e:
+                print(f"Public key shared cache unavailable: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+private_key_cache = PrivateKeyCache()
+public_key_cache = PublicKeyCache()
+
+
+def init_key_cache(app):
+    """Configure the process-wide key caches from the Flask config"""
+    private_key_cache.configure(
+        max_size=app.config.get('PRIVATE_KEY_CACHE_SIZE', DEFAULT_PRIVATE_KEY_CACHE_SIZE),
+        ttl=app.config.get('PRIVATE_KEY_CACHE_TTL', DEFAULT_PRIVATE_KEY_TTL)
+    )
+    public_key_cache.configure(
+        max_size=app.config.get('PUBLIC_KEY_CACHE_SIZE', DEFAULT_PUBLIC_KEY_CACHE_SIZE),
+        ttl=app.config.get('PUBLIC_KEY_CACHE_TTL', DEFAULT_PUBLIC_KEY_TTL),
+        shared_store=create_pem_store(app.config.get('PUBLIC_KEY_SHARED_CACHE_URL'))
+    )
+
+
+def get_public_key(user_id):
+    """Parsed public key for a user (cached), or None if the user has no keys"""
+    return public_key_cache.get(user_id)
+
+
+def new_key_session():
+    """Start a fresh key-cache session id (called on login)"""
+    session['key_session_id'] = secrets.token_hex(16)
+    return session['key_session_id']
+
+
+def get_key_session_id():
+    """Current login session id for the key cache, created on first use"""
+    if 'key_session_id' not in session:
+        return new_key_session()
+    return session['key_session_id']
+
+
+def unlock_private_key(user_id, password):
+    """
+    Return the user's unlocked private key, from the cache when possible.
+
+    Args:
+        user_id (int): Owner of the key
+        password (str): Login password protecting the PKCS8 PEM
+
+    Returns:
+        Private key object, or None if the user has no stored key.
+        Raises ValueError (from cryptography) when the password is wrong.
+    """
+    start = time.perf_counter()
+    session_id = get_key_session_id()
+    private_key = private_key_cache.get(user_id, session_id, password)
+    if private_key is not None:
+        PRIVATE_KEY_UNLOCK_SECONDS.observe(time.perf_counter() - start, result='hit')
+        return private_key
+
+    private_key_enc = get_user_private_key_enc(user_id)
+    if not private_key_enc:
+        PRIVATE_KEY_UNLOCK_SECONDS.observe(time.perf_counter() - start, result='missing')
+        return None
+
+    try:
+        with span('kdf'):
+            private_key = load_private_key(private_key_enc, password)
+    except Exception:
+        PRIVATE_KEY_UNLOCK_SECONDS.observe(time.perf_counter() - start, result='failed')
+        raise
+    private_key_cache.put(user_id, session_id, password, private_key)
+    PRIVATE_KEY_UNLOCK_SECONDS.observe(time.perf_counter() - start, result='miss')
+    return private_key
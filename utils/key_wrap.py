@@ -0,0 +1,118 @@
+"""
+Pluggable key-wrapping layer for file keys
+Supports RSA-OAEP (existing users) and X25519 + HKDF-SHA256 + AES-GCM (ECIES, new users)
+"""
+import os
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, x25519
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.backends import default_backend
+
+from utils.rsa_handler import encrypt_with_public_key, decrypt_with_private_key
+from utils.keypair_pool import keypair_pool
+from utils.metrics import KEY_WRAP_SECONDS
+
+SCHEME_RSA_OAEP = 'RSA-OAEP'
+SCHEME_X25519 = 'X25519-HKDF-AESGCM'
+SUPPORTED_SCHEMES = (SCHEME_RSA_OAEP, SCHEME_X25519)
+
+_HKDF_INFO = b'secure-file-exchange key wrap v1'
+_X25519_KEY_SIZE = 32
+_NONCE_SIZE = 12
+
+
+def generate_user_key_pair(scheme=SCHEME_X25519):
+    """
+    Generate a key pair for a new user.
+
+    Args:
+        scheme (str): SCHEME_RSA_OAEP or SCHEME_X25519
+
+    Returns:
+        tuple: (private_key, public_key)
+    """
+    if scheme == SCHEME_RSA_OAEP:
+        # RSA mahal, jadi diambil dari pool background
+        return keypair_pool.get_key_pair()
+    if scheme == SCHEME_X25519:
+        private_key = x25519.X25519PrivateKey.generate()
+        return private_key, private_key.public_key()
+    raise ValueError(f"Unknown key wrap scheme: {scheme}")
+
+
+def scheme_for_key(key):
+    """Return the wrap scheme name for a public or private key object"""
+    if isinstance(key, (rsa.RSAPublicKey, rsa.RSAPrivateKey)):
+        return SCHEME_RSA_OAEP
+    if isinstance(key, (x25519.X25519PublicKey, x25519.X25519PrivateKey)):
+        return SCHEME_X25519
+    raise ValueError(f"Unsupported key type: {type(key).__name__}")
+
+
+def _raw_public_bytes(public_key):
+    return public_key.public_bytes(
+        encoding=serialization.Encoding.Raw,
+        format=serialization.PublicFormat.Raw
+    )
+
+
+def _derive_wrapping_key(shared_secret, ephemeral_public, recipient_public):
+    # Kedua public key diikat ke info HKDF agar KEK unik per pasangan
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=_HKDF_INFO + ephemeral_public + recipient_public,
+        backend=default_backend()
+    ).derive(shared_secret)
+
+
+def _x25519_wrap(public_key, data):
+    ephemeral_key = x25519.X25519PrivateKey.generate()
+    ephemeral_public = _raw_public_bytes(ephemeral_key.public_key())
+    wrapping_key = _derive_wrapping_key(
+        ephemeral_key.exchange(public_key), ephemeral_public, _raw_public_bytes(public_key)
+    )
+    nonce = os.urandom(_NONCE_SIZE)
+    ciphertext = AESGCM(wrapping_key).encrypt(nonce, data, ephemeral_public)
+    # Format: ephemeral public key (32) || nonce (12) || ciphertext + tag
+    return ephemeral_public + nonce + ciphertext
+
+
+def _x25519_unwrap(private_key, wrapped):
+    if len(wrapped) < _X25519_KEY_SIZE + _NONCE_SIZE + 16:
+        raise Exception("Wrapped key is too short")
+    ephemeral_public = wrapped[:_X25519_KEY_SIZE]
+    nonce = wrapped[_X25519_KEY_SIZE:_X25519_KEY_SIZE + _NONCE_SIZE]
+    ciphertext = wrapped[_X25519_KEY_SIZE + _NONCE_SIZE:]
+    shared_secret = private_key.exchange(x25519.X25519PublicKey.from_public_bytes(ephemeral_public))
+    wrapping_key = _derive_wrapping_key(
+        shared_secret, ephemeral_public, _raw_public_bytes(private_key.public_key())
+    )
+    try:
+        return AESGCM(wrapping_key).decrypt(nonce, ciphertext, ephemeral_public)
+    except Exception:
+        raise Exception("Wrapped key failed authentication")
+
+
+def wrap_key(public_key, data):
+    """
+    Wrap (encrypt) a symmetric key for the owner of public_key.
+    The scheme follows the key type; use scheme_for_key() to record it.
+    """
+    scheme = scheme_for_key(public_key)
+    with KEY_WRAP_SECONDS.time(scheme=scheme, operation='wrap'):
+        if scheme == SCHEME_X25519:
+            return _x25519_wrap(public_key, data)
+        return encrypt_with_public_key(public_key, data)
+
+
+def unwrap_key(private_key, wrapped):
+    """Unwrap (decrypt) a symmetric key with the recipient's private key"""
+    scheme = scheme_for_key(private_key)
+    with KEY_WRAP_SECONDS.time(scheme=scheme, operation='unwrap'):
+        if scheme == SCHEME_X25519:
+            return _x25519_unwrap(private_key, wrapped)
+        return decrypt_with_private_key(private_key, wrapped)
@@ -0,0 +1,141 @@
+"""
+Background pool of pre-generated RSA key pairs
+Keeps RSA-2048 generation (50-300 ms of CPU) out of the registration request
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.backends import default_backend
+
+from utils.rsa_handler import generate_key_pair
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_REFILL_INTERVAL = 0.0  # detik jeda antar key pair yang digenerate
+
+
+def _fill_pool(key_queue, refill_interval):
+    """
+    Worker process loop: generate key pairs forever.
+    put() blocks while the queue is full, so the pool never exceeds its depth.
+    """
+    while True:
+        private_key, _ = generate_key_pair()
+        private_der = private_key.private_bytes(
+            encoding=serialization.Encoding.DER,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+        key_queue.put(private_der)
+        if refill_interval:
+            time.sleep(refill_interval)
+
+
+class KeyPairPool:
+    """
+    Bounded queue of fresh RSA key pairs filled by a background worker process.
+
+    The worker is started lazily in the process that first asks for a key,
+    so pre-fork servers get one pool per worker instead of sharing one
+    across fork(). When the pool is empty, get_key_pair() falls back to
+    inline generation.
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, refill_interval=DEFAULT_REFILL_INTERVAL, enabled=True):
+        self.size = size
+        self.refill_interval = refill_interval
+        self.enabled = enabled
+        self._queue = None
+        self._process = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, size=None, refill_interval=None, enabled=None):
+        """Apply settings from Config (called once at startup, before the pool starts)"""
+        if size is not None:
+            self.size = size
+        if refill_interval is not None:
+            self.refill_interval = refill_interval
+        if enabled is not None:
+            self.enabled = enabled
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._process is not None and self._process.is_alive():
+                return
+            # 'spawn' agar worker tidak mewarisi koneksi DB / thread dari proses Flask
+            context = multiprocessing.get_context('spawn')
+            self._queue = context.Queue(maxsize=self.size)
+            self._process = context.Process(
+                target=_fill_pool,
+                args=(self._queue, self.refill_interval),
+                name='keypair-pool',
+                daemon=True
+            )
+            self._process.start()
+            self._pid = os.getpid()
+
+    def get_key_pair(self):
+        """
+        Take a pre-generated key pair from the pool, or generate one inline.
+
+        Returns:
+            tuple: (private_key, public_key)
+        """
+        if self.enabled and self.size > 0:
+            try:
+                self._ensure_started()
+                private_der = self._queue.get_nowait()
+                # Kunci dibuat sendiri oleh worker, jadi validasi RSA (mahal) boleh dilewati
+                private_key = serialization.load_der_private_key(
+                    private_der, password=None, backend=default_backend(),
+                    unsafe_skip_rsa_key_validation=True
+                )
+                return private_key, private_key.public_key()
+            except queue.Empty:
+                pass
+            except Exception as e:
+                print(f"Key pair pool unavailable, generating inline: {e}")
+
+        return generate_key_pair()
+
+    def stop(self):
+        """Terminate the worker process (tests / shutdown)"""
+        with self._lock:
+            if self._process is not None and self._pid == os.getpid():
+                self._process.terminate()
+            self._process = None
+            self._queue = None
+            self._pid = None
+
+
+keypair_pool = KeyPairPool()
+
+
+def init_keypair_pool(app):
+    """
+    Configure the process-wide key pair pool from the Flask config.
+
+    The pool only holds RSA key pairs, so it stays off unless new users get
+    RSA keys (KEY_WRAP_SCHEME = 'RSA-OAEP'). It is also off when the app
+    module itself is the main script (`python app.py`): the 'spawn' worker
+    re-imports __main__, which would run every init_* side effect of app.py
+    again in the worker. Registration then generates key pairs inline.
+    """
+    from utils.key_wrap import SCHEME_RSA_OAEP
+
+    enabled = app.config.get('KEYPAIR_POOL_ENABLED', True)
+    if enabled and app.config.get('KEY_WRAP_SCHEME') != SCHEME_RSA_OAEP:
+        enabled = False
+    if enabled and app.import_name == '__main__':
+        print("Key pair pool disabled: the app runs as __main__ (python app.py); "
+              "use a WSGI server or `flask run` to enable it")
+        enabled = False
+    keypair_pool.configure(
+        size=app.config.get('KEYPAIR_POOL_SIZE', DEFAULT_POOL_SIZE),
+        refill_interval=app.config.get('KEYPAIR_POOL_REFILL_INTERVAL', DEFAULT_REFILL_INTERVAL),
+        enabled=enabled
+    )
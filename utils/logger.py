@@ -2,9 +2,173 @@
 Utility functions for logging crypto operations
 Logs encryption/decryption activities to the database
 """
+import atexit
+import os
+import threading
+from collections import deque
 from datetime import datetime
-from models.log import CryptoLog
+from models.log import CryptoLog, CryptoLogRollup, CryptoLatencyHistogram
 from extensions import db
+from utils.metrics import CRYPTO_OPERATION_SECONDS, CRYPTO_OPERATION_BYTES, CRYPTO_OPERATION_FAILURES
+from utils.rollups import record_rows, rollup_query, latency_percentiles, bytes_per_second, FILE_OPERATIONS
+
+DEFAULT_BUFFER_SIZE = 10000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0  # detik
+
+# operation_type -> CryptoLog.operation
+OPERATION_NAMES = {
+    'encryption': 'encrypt',
+    'decryption': 'decrypt',
+    'cell_encryption': 'cell_encrypt',
+}
+
+
+class CryptoLogWriter:
+    """
+    Asynchronous sink for CryptoLog rows.
+
+    Rows go into a bounded ring buffer (oldest rows are dropped when it is
+    full) and a background thread inserts them in batches with a single
+    executemany per batch on its own connection, so logging never touches
+    the request's db.session.
+
+    Modes:
+        'buffered' - background thread, flushed every flush_interval seconds
+                     or as soon as batch_size rows are waiting (default)
+        'sync'     - insert each row immediately (still outside db.session)
+    """
+
+    def __init__(self, mode='buffered', buffer_size=DEFAULT_BUFFER_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.app = None
+        self.dropped = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+    def configure(self, app, mode=None, buffer_size=None, batch_size=None, flush_interval=None):
+        """Bind to the app and apply settings from Config"""
+        self.app = app
+        if mode is not None:
+            self.mode = mode
+        if batch_size is not None:
+            self.batch_size = batch_size
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if buffer_size is not None and buffer_size != self._buffer.maxlen:
+            with self._lock:
+                self._buffer = deque(self._buffer, maxlen=buffer_size)
+
+    def _ensure_started(self):
+        # Thread dibuat per proses (aman untuk server pre-fork)
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='crypto-log-writer', daemon=True)
+        self._pid = os.getpid()
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Crypto log flush failed: {e}")
+
+    def append(self, row):
+        """Queue one log row (dict of CryptoLog columns)"""
+        if self.mode == 'sync' or self.app is None:
+            self._insert([row])
+            return
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(row)
+            pending = len(self._buffer)
+            self._ensure_started()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _insert(self, rows):
+        table = CryptoLog.__table__
+        app = self.app
+        if app is None:
+            from flask import current_app
+            app = current_app._get_current_object()
+        with app.app_context():
+            try:
+                self._write(table, rows)
+            except Exception as batch_error:
+                if len(rows) == 1:
+                    print(f"Dropping crypto log row: {batch_error}")
+                    return
+                # Satu baris buruk (mis. file sudah dihapus) jangan menggagalkan seluruh batch
+                for row in rows:
+                    try:
+                        self._write(table, [row])
+                    except Exception as e:
+                        print(f"Dropping crypto log row: {e}")
+
+    @staticmethod
+    def _write(table, rows):
+        # Log dan rollup-nya ditulis dalam satu transaksi
+        log_rows = [{key: value for key, value in row.items() if key in table.c} for row in rows]
+        with db.engine.begin() as connection:
+            connection.execute(table.insert(), log_rows)  # executemany
+            record_rows(connection, rows)
+
+    def flush(self):
+        """Write every buffered row now, in batches of batch_size"""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._buffer:
+                        break
+                    count = min(self.batch_size, len(self._buffer))
+                    rows = [self._buffer.popleft() for _ in range(count)]
+                    dropped, self.dropped = self.dropped, 0
+                if dropped:
+                    print(f"Crypto log buffer full: {dropped} rows dropped")
+                self._insert(rows)
+
+    def shutdown(self):
+        """Stop the background thread and flush what is left (registered with atexit)"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=5)
+        self._thread = None
+        if self.app is not None:
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Crypto log flush failed: {e}")
+
+
+crypto_log_writer = CryptoLogWriter()
+atexit.register(crypto_log_writer.shutdown)
+
+
+def init_crypto_log_writer(app):
+    """Configure the process-wide crypto log writer from the Flask config"""
+    crypto_log_writer.configure(
+        app,
+        mode=app.config.get('CRYPTO_LOG_MODE', 'buffered'),
+        buffer_size=app.config.get('CRYPTO_LOG_BUFFER_SIZE', DEFAULT_BUFFER_SIZE),
+        batch_size=app.config.get('CRYPTO_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        flush_interval=app.config.get('CRYPTO_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+    )
+
 
 def log_crypto_operation(
     user_id,
@@ -14,42 +178,61 @@ def log_crypto_operation(
     file_size,
     execution_time,
     success=True,
-    error_message=None
+    error_message=None,
+    file_type=None,
+    phase_times=None
 ):
     """
     Log a cryptographic operation to the database
+    Rows are written asynchronously by crypto_log_writer (see CryptoLogWriter)
     
     Args:
         user_id (int): ID of the user performing the operation
         file_id (int): ID of the file being encrypted/decrypted
-        operation_type (str): 'encryption' or 'decryption'
+        operation_type (str): 'encryption', 'decryption' or 'cell_encryption'
+                              (all cells of an Excel workbook, logged as one row)
         algorithm (str): 'AES', 'DES', or 'RC4'
         file_size (int): Size of the file in bytes
         execution_time (float): Time taken in seconds
         success (bool): Whether the operation succeeded
         error_message (str, optional): Error message if operation failed (not stored in DB currently)
+        file_type (str, optional): Uploaded file type, only kept in the rollups
+        phase_times (dict, optional): setup_time, cipher_time and padding_time in seconds
+                                      (PhaseTimer.phase_times())
     
     Returns:
-        CryptoLog: The created log entry
+        dict: The queued log row
     """
     # Map 'encryption'/'decryption' to 'encrypt'/'decrypt' for the model
-    operation = 'encrypt' if operation_type == 'encryption' else 'decrypt'
+    operation = OPERATION_NAMES.get(operation_type, 'decrypt')
     
-    log_entry = CryptoLog(
-        user_id=user_id,
-        file_id=file_id,
-        operation=operation,
-        algorithm=algorithm,
-        data_size=file_size,
-        execution_time=execution_time,
-        success=success,
-        timestamp=datetime.utcnow()
-    )
+    log_row = {
+        'user_id': user_id,
+        'file_id': file_id,
+        'operation': operation,
+        'algorithm': algorithm,
+        'data_size': file_size,
+        'execution_time': execution_time,
+        'success': success,
+        'timestamp': datetime.utcnow(),
+        'file_type': file_type,
+        'setup_time': None,
+        'cipher_time': None,
+        'padding_time': None
+    }
+    if phase_times:
+        log_row.update(phase_times)
     
-    db.session.add(log_entry)
-    db.session.commit()
+    # Metrik in-process (/metrics), tidak menunggu log tersimpan di database
+    if success:
+        CRYPTO_OPERATION_SECONDS.observe(execution_time, algorithm=algorithm, operation=operation)
+        CRYPTO_OPERATION_BYTES.inc(file_size or 0, algorithm=algorithm, operation=operation)
+    else:
+        CRYPTO_OPERATION_FAILURES.inc(algorithm=algorithm, operation=operation)
     
-    return log_entry
+    crypto_log_writer.append(log_row)
+    
+    return log_row
 
 def get_user_crypto_stats(user_id):
     """
@@ -61,30 +244,30 @@ def get_user_crypto_stats(user_id):
     Returns:
         dict: Statistics including total operations, average time, etc.
     """
-    logs = CryptoLog.query.filter_by(user_id=user_id).all()
-    
-    if not logs:
-        return {
-            'total_operations': 0,
-            'total_encryptions': 0,
-            'total_decryptions': 0,
-            'avg_encryption_time': 0,
-            'avg_decryption_time': 0,
-            'total_data_processed': 0
-        }
-    
-    encryptions = [log for log in logs if log.operation == 'encrypt']
-    decryptions = [log for log in logs if log.operation == 'decrypt']
-    
     stats = {
-        'total_operations': len(logs),
-        'total_encryptions': len(encryptions),
-        'total_decryptions': len(decryptions),
-        'avg_encryption_time': sum(log.execution_time for log in encryptions) / len(encryptions) if encryptions else 0,
-        'avg_decryption_time': sum(log.execution_time for log in decryptions) / len(decryptions) if decryptions else 0,
-        'total_data_processed': sum(log.data_size for log in logs)
+        'total_operations': 0,
+        'total_encryptions': 0,
+        'total_decryptions': 0,
+        'avg_encryption_time': 0,
+        'avg_decryption_time': 0,
+        'total_data_processed': 0
     }
     
+    # Dibaca dari rollup harian, bukan dari crypto_logs
+    rows = rollup_query(CryptoLogRollup.operation, user_id=user_id, operations=FILE_OPERATIONS).all()
+    
+    for row in rows:
+        count = int(row.operations)
+        avg_time = float(row.total_time) / count if count else 0
+        stats['total_operations'] += count
+        stats['total_data_processed'] += int(row.total_size)
+        if row.operation == 'encrypt':
+            stats['total_encryptions'] = count
+            stats['avg_encryption_time'] = float(avg_time or 0)
+        elif row.operation == 'decrypt':
+            stats['total_decryptions'] = count
+            stats['avg_decryption_time'] = float(avg_time or 0)
+    
     return stats
 
 def get_algorithm_comparison(user_id=None):
@@ -95,32 +278,33 @@ def get_algorithm_comparison(user_id=None):
         user_id (int, optional): If provided, filter by user
     
     Returns:
-        dict: Comparison data by algorithm
+        dict: Comparison data by algorithm (mean and p50/p90/p99/max latency,
+              throughput in bytes/s for files and for Excel cell encryption)
     """
-    query = CryptoLog.query
-    if user_id:
-        query = query.filter_by(user_id=user_id)
-    
-    logs = query.all()
+    query = rollup_query(CryptoLogRollup.algorithm, user_id=user_id or None, operations=FILE_OPERATIONS)
+    latency = latency_percentiles(
+        CryptoLatencyHistogram.algorithm, user_id=user_id or None, operations=FILE_OPERATIONS
+    )
+    cell_rows = rollup_query(
+        CryptoLogRollup.algorithm, user_id=user_id or None, operations=('cell_encrypt',)
+    ).all()
+    cell_throughput = {row.algorithm: bytes_per_second(row.total_size, row.total_time) for row in cell_rows}
     
     algorithms = {}
-    for log in logs:
-        algo = log.algorithm
-        if algo not in algorithms:
-            algorithms[algo] = {
-                'total_operations': 0,
-                'total_time': 0,
-                'avg_time': 0,
-                'total_size': 0
-            }
-        
-        algorithms[algo]['total_operations'] += 1
-        algorithms[algo]['total_time'] += log.execution_time
-        algorithms[algo]['total_size'] += log.data_size
-    
-    # Calculate averages
-    for algo in algorithms:
-        if algorithms[algo]['total_operations'] > 0:
-            algorithms[algo]['avg_time'] = algorithms[algo]['total_time'] / algorithms[algo]['total_operations']
+    for row in query.all():
+        count = int(row.operations)
+        percentiles = latency.get((row.algorithm,), {})
+        algorithms[row.algorithm] = {
+            'total_operations': count,
+            'total_time': float(row.total_time),
+            'avg_time': float(row.total_time) / count if count else 0,
+            'p50_time': percentiles.get('p50', 0),
+            'p90_time': percentiles.get('p90', 0),
+            'p99_time': percentiles.get('p99', 0),
+            'max_time': percentiles.get('max', 0),
+            'total_size': int(row.total_size),
+            'throughput': bytes_per_second(row.total_size, row.total_time),
+            'cell_throughput': cell_throughput.get(row.algorithm)
+        }
     
     return algorithms
@@ -0,0 +1,516 @@
+"""
+In-process metrics registry exposed in the Prometheus text format (/metrics)
+Counters, gauges and histograms for the crypto, key and request hot paths,
+readable without touching MySQL.
+
+Multi-process servers (gunicorn) MUST set METRICS_DIR: without it /metrics
+only shows the numbers of whichever worker answered the scrape. With it,
+every process writes a snapshot of its samples to
+METRICS_DIR/metrics_<pid>_<token>.json every METRICS_FLUSH_INTERVAL seconds
+(and at exit); /metrics merges the live samples of the serving process with
+the other processes' snapshots. The random per-process token keeps a reused
+PID from overwriting the snapshot of the dead worker that had it.
+Counters and histograms are summed, including exited processes, so totals
+never go backwards: the snapshot thread periodically folds the snapshots of
+exited processes into METRICS_DIR/metrics_retired.json and deletes them, so
+the directory does not grow with every worker recycle. Gauges only count
+processes that are still alive. Clear METRICS_DIR when the service is
+(re)deployed.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl  # Unix; tanpa fcntl snapshot proses mati tidak dilipat
+except ImportError:
+    fcntl = None
+
+from flask import g, request
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_FLUSH_INTERVAL = 5.0  # detik
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    """Monotonic count (e.g. bytes encrypted, failures)"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (e.g. requests in progress); summed over live processes"""
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Latency distribution with fixed, cumulative-on-export buckets (seconds)"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [jumlah per bucket (+Inf terakhir), sum, count]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block (perf_counter)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            return [[list(key), [list(entry[0]), entry[1], entry[2]]] for key, entry in self._values.items()]
+
+
+RETIRED_SNAPSHOT = 'metrics_retired.json'
+LOCK_FILE = '.metrics.lock'
+
+
+def _process_start(pid):
+    """Start time of a process in clock ticks (Linux /proc), None when unknown"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # Field 22; comm (field 2) bisa berisi spasi, jadi potong setelah ')'
+            return int(f.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _pid_alive(pid, start=None):
+    """Whether the process that wrote a snapshot is still running (PID reuse aware)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    if start is not None:
+        current_start = _process_start(pid)
+        if current_start is not None and current_start != start:
+            return False  # PID sudah dipakai proses lain
+    return True
+
+
+def _merge_metrics(merged, metrics, include_gauges=True):
+    """Add snapshot metrics into merged (counters/histograms summed, gauges summed when included)"""
+    for name, metric in metrics.items():
+        if metric['type'] == 'gauge' and not include_gauges:
+            continue
+        target = merged.setdefault(name, dict(metric, samples=[]))
+        if target['type'] != metric['type'] or target['buckets'] != metric['buckets']:
+            continue
+        index = {tuple(sample[0]): sample for sample in target['samples']}
+        for labels, value in metric['samples']:
+            existing = index.get(tuple(labels))
+            if existing is None:
+                sample = [labels, value]
+                target['samples'].append(sample)
+                index[tuple(labels)] = sample
+            elif metric['type'] == 'histogram':
+                counts, total, count = existing[1]
+                existing[1] = [[a + b for a, b in zip(counts, value[0])], total + value[1], count + value[2]]
+            else:
+                existing[1] += value
+    return merged
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # file sedang ditulis / rusak / sudah dihapus
+
+
+def _write_json(path, data):
+    # Tulis ke file sementara lalu rename (atomik)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+class MetricsRegistry:
+    """
+    Process-wide registry of named metrics.
+
+    Metrics are declared once at import time (counter()/gauge()/histogram()
+    return the existing metric when the name is already registered).
+    """
+
+    def __init__(self, directory='', flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self._token = None
+        self._token_pid = None
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def configure(self, directory=None, flush_interval=None):
+        """Apply settings from Config"""
+        if directory is not None:
+            self.directory = directory
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    # --- Snapshot multi-proses ---
+
+    def snapshot(self):
+        """JSON-serializable samples of this process"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {
+                'type': metric.type,
+                'help': metric.documentation,
+                'labels': list(metric.labelnames),
+                'buckets': list(getattr(metric, 'buckets', ())),
+                'samples': metric.samples(),
+            }
+            for metric in metrics
+        }
+
+    def _process_token(self):
+        # Token baru per proses (juga setelah fork), jadi PID yang dipakai ulang dapat file baru
+        if self._token_pid != os.getpid():
+            self._token = uuid.uuid4().hex[:12]
+            self._token_pid = os.getpid()
+        return self._token
+
+    def _snapshot_path(self):
+        return os.path.join(self.directory, f'metrics_{os.getpid()}_{self._process_token()}.json')
+
+    @contextmanager
+    def _dir_lock(self, exclusive):
+        """flock on METRICS_DIR/.metrics.lock: readers shared, the retire step exclusive"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, LOCK_FILE), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def write_snapshot(self):
+        """Write this process's samples to METRICS_DIR (atomic rename)"""
+        if not self.directory:
+            return
+        _write_json(self._snapshot_path(), {
+            'pid': os.getpid(),
+            'start': _process_start(os.getpid()),
+            'metrics': self.snapshot(),
+        })
+
+    def _snapshots(self):
+        """(path, data) of every process snapshot in METRICS_DIR except the retired one"""
+        for path in glob.glob(os.path.join(self.directory, 'metrics_*.json')):
+            if os.path.basename(path) == RETIRED_SNAPSHOT:
+                continue
+            data = _read_json(path)
+            if data is not None and isinstance(data.get('pid'), int):
+                yield path, data
+
+    def retire_dead_snapshots(self):
+        """
+        Fold the counters and histograms of exited processes into
+        metrics_retired.json and delete their snapshots.
+
+        Returns:
+            int: Number of snapshots folded
+        """
+        if not self.directory or fcntl is None:
+            return 0
+        retired_path = os.path.join(self.directory, RETIRED_SNAPSHOT)
+        with self._dir_lock(exclusive=True):
+            retired = _read_json(retired_path) or {'metrics': {}, 'folded': []}
+            # Nama file yang sudah dilipat tapi gagal dihapus (mis. crash) tidak dihitung dua kali
+            folded = {name for name in retired['folded'] if os.path.exists(os.path.join(self.directory, name))}
+            dead = []
+            for path, data in self._snapshots():
+                name = os.path.basename(path)
+                if name in folded or _pid_alive(data['pid'], data.get('start')):
+                    continue
+                _merge_metrics(retired['metrics'], data.get('metrics', {}), include_gauges=False)
+                dead.append(path)
+            if not dead:
+                return 0
+            retired['folded'] = sorted(folded | {os.path.basename(path) for path in dead})
+            _write_json(retired_path, retired)
+            for path in dead:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            retired['folded'] = sorted(name for name in retired['folded']
+                                       if os.path.exists(os.path.join(self.directory, name)))
+            _write_json(retired_path, retired)
+        return len(dead)
+
+    def ensure_started(self):
+        """Start the snapshot thread for this process (no-op without METRICS_DIR)"""
+        if not self.directory:
+            return
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            time.sleep(self.flush_interval)
+            try:
+                self.write_snapshot()
+                self.retire_dead_snapshots()
+            except Exception as e:
+                print(f"Metrics snapshot failed: {e}")
+
+    def shutdown(self):
+        """Write a final snapshot (registered with atexit)"""
+        self._stopping = True
+        if self._pid == os.getpid():
+            try:
+                self.write_snapshot()
+            except Exception as e:
+                print(f"Metrics snapshot failed: {e}")
+
+    def collect(self):
+        """Merged samples: this process live + other processes' snapshots + retired totals"""
+        merged = self.snapshot()
+        if not self.directory:
+            return merged
+
+        own_path = self._snapshot_path()
+        with self._dir_lock(exclusive=False):
+            retired = _read_json(os.path.join(self.directory, RETIRED_SNAPSHOT)) or {'metrics': {}, 'folded': []}
+            folded = set(retired.get('folded', ()))
+            _merge_metrics(merged, retired['metrics'], include_gauges=False)
+            for path, data in self._snapshots():
+                if path == own_path or os.path.basename(path) in folded:
+                    continue
+                alive = _pid_alive(data['pid'], data.get('start'))
+                _merge_metrics(merged, data.get('metrics', {}), include_gauges=alive)
+        return merged
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labelnames = metric['labels']
+            for labels, value in sorted(metric['samples']):
+                if metric['type'] != 'histogram':
+                    lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_number(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(list(metric['buckets']) + [float('inf')], counts):
+                    cumulative += bucket_count
+                    le = _format_labels(labelnames, labels, ('le', _format_number(float(bound))))
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_number(float(total))}")
+                lines.append(f"{name}_count{_format_labels(labelnames, labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+atexit.register(metrics.shutdown)
+
+# --- Metrik hot path (dipakai oleh modul terkait) ---
+CRYPTO_OPERATION_SECONDS = metrics.histogram(
+    'crypto_operation_seconds', 'Cipher time of handler encrypt/decrypt operations', ('algorithm', 'operation')
+)
+CRYPTO_OPERATION_BYTES = metrics.counter(
+    'crypto_operation_bytes_total', 'Bytes processed by handler encrypt/decrypt operations', ('algorithm', 'operation')
+)
+CRYPTO_OPERATION_FAILURES = metrics.counter(
+    'crypto_operation_failures_total', 'Failed handler encrypt/decrypt operations', ('algorithm', 'operation')
+)
+KEY_WRAP_SECONDS = metrics.histogram(
+    'key_wrap_seconds', 'File key wrap/unwrap time (RSA-OAEP or X25519)', ('scheme', 'operation')
+)
+PRIVATE_KEY_UNLOCK_SECONDS = metrics.histogram(
+    'private_key_unlock_seconds', 'Private key unlock time (cache hit, or Mongo fetch + KDF)', ('result',)
+)
+MONGO_COMMAND_SECONDS = metrics.histogram(
+    'mongo_command_seconds', 'Key store (MongoDB) command latency', ('command',)
+)
+MONGO_COMMAND_FAILURES = metrics.counter(
+    'mongo_command_failures_total', 'Failed key store (MongoDB) commands', ('command',)
+)
+EXCEL_INGEST_SECONDS = metrics.histogram(
+    'excel_ingest_seconds', 'openpyxl load, parse and cell encryption of uploaded workbooks', ('mode',)
+)
+EXCEL_CELLS = metrics.counter(
+    'excel_cells_encrypted_total', 'Excel cells encrypted during ingestion', ('algorithm',)
+)
+DISK_IO_SECONDS = metrics.histogram(
+    'disk_io_seconds', 'Time spent in upload-directory reads and writes', ('operation',)
+)
+DISK_IO_BYTES = metrics.counter(
+    'disk_io_bytes_total', 'Bytes read from / written to the upload directory', ('operation',)
+)
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    'http_request_duration_seconds', 'Request latency per blueprint (until the response body is sent)',
+    ('blueprint', 'method', 'status')
+)
+HTTP_REQUESTS_IN_PROGRESS = metrics.gauge(
+    'http_requests_in_progress', 'Requests currently being handled', ('blueprint',)
+)
+
+
+def init_metrics(app):
+    """Configure the registry from the Flask config and time every request per blueprint"""
+    metrics.configure(
+        directory=app.config.get('METRICS_DIR', ''),
+        flush_interval=app.config.get('METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+    )
+    if not app.config.get('METRICS_TOKEN') and not app.config.get('METRICS_PUBLIC', False):
+        print("Warning: METRICS_TOKEN is not set; /metrics answers 403. "
+              "Set METRICS_TOKEN (or METRICS_PUBLIC=true to serve it without authentication).")
+
+    def finish(start, blueprint, status):
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start, blueprint=blueprint, method=request.method, status=status
+        )
+        HTTP_REQUESTS_IN_PROGRESS.dec(blueprint=blueprint)
+
+    @app.before_request
+    def _start_request_timer():
+        metrics.ensure_started()
+        g._metrics_start = time.perf_counter()
+        HTTP_REQUESTS_IN_PROGRESS.inc(blueprint=request.blueprint or 'app')
+
+    @app.after_request
+    def _observe_request(response):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return response
+        blueprint, method, status = request.blueprint or 'app', request.method, response.status_code
+
+        # Dicatat saat body selesai dikirim, jadi download streaming ikut terhitung
+        def observe():
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, blueprint=blueprint, method=method, status=status
+            )
+            HTTP_REQUESTS_IN_PROGRESS.dec(blueprint=blueprint)
+
+        response.call_on_close(observe)
+        return response
+
+    @app.teardown_request
+    def _observe_failed_request(error=None):
+        # after_request tidak jalan jika view melempar exception
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            finish(start, request.blueprint or 'app', 500)
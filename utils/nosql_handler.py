@@ -1,71 +1,258 @@
 # utils/nosql_handler.py
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, ASCENDING, monitoring
 import os
+import threading
+from utils.metrics import MONGO_COMMAND_SECONDS, MONGO_COMMAND_FAILURES
 
 # Pastikan MongoDB sudah berjalan
 MONGO_URI = os.environ.get('MONGO_URI') or 'mongodb://localhost:27017/'
-client = MongoClient(MONGO_URI)
-db_nosql = client['secure_file_exchange_keystore']
+MONGO_DB_NAME = 'secure_file_exchange_keystore'
 
-# Collections
-keys_collection = db_nosql['user_keys']
-file_keys_collection = db_nosql['file_keys']
-shared_keys_collection = db_nosql['shared_keys']
 
-def store_file_key(file_id, owner_id, encrypted_key):
+class CommandMetrics(monitoring.CommandListener):
+    """Feeds every key store command into the /metrics registry"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name)
+        MONGO_COMMAND_FAILURES.inc(command=event.command_name)
+
+
+class KeyStore:
+    """
+    Lazily connected MongoDB key store.
+
+    The MongoClient is created on first use and re-created when the PID
+    changes, so pre-fork servers (gunicorn) never share sockets that were
+    opened in the master process. Connection settings come from Config
+    via init_key_store().
+    """
+
+    def __init__(self, uri=MONGO_URI, db_name=MONGO_DB_NAME):
+        self.uri = uri
+        self.db_name = db_name
+        self.client_options = {}
+        # pymongo command listeners, dipasang saat client dibuat
+        self.event_listeners = [CommandMetrics()]
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, uri=None, db_name=None, **client_options):
+        """Apply settings from Config; takes effect on the next connection"""
+        with self._lock:
+            if uri:
+                self.uri = uri
+            if db_name:
+                self.db_name = db_name
+            # None = pakai default pymongo
+            self.client_options = {k: v for k, v in client_options.items() if v is not None}
+        self.reset()
+
+    def add_listener(self, listener):
+        """Add a pymongo command listener; takes effect on the next connection"""
+        with self._lock:
+            self.event_listeners.append(listener)
+        self.reset()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                # Setelah fork, jangan tutup client warisan parent (socket milik parent)
+                self._client = MongoClient(
+                    self.uri, connect=False, event_listeners=self.event_listeners, **self.client_options
+                )
+                self._pid = os.getpid()
+            return self._client
+
+    def collection(self, name):
+        return self.client[self.db_name][name]
+
+    def reset(self):
+        """Close the client owned by this process (next call reconnects)"""
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+    def _ensure_index(self, collection_name, keys, name):
+        # Index biasa (bukan unique): data lama yang duplikat tidak menggagalkan startup.
+        # Jika key yang sama sudah ter-index (nama / opsi lain), index itu dipakai apa adanya.
+        collection = self.collection(collection_name)
+        if any(list(info['key']) == keys for info in collection.index_information().values()):
+            return
+        collection.create_index(keys, name=name)
+
+    def ensure_indexes(self):
+        """Create the lookup indexes used by every key lookup (writes are upserts)"""
+        self._ensure_index('user_keys', [('user_id', ASCENDING)], 'user_id')
+        self._ensure_index('file_keys', [('file_id', ASCENDING), ('owner_id', ASCENDING)], 'file_id_owner_id')
+        self._ensure_index('file_keys', [('owner_id', ASCENDING)], 'owner_id')
+        self._ensure_index('shared_keys', [('file_id', ASCENDING), ('recipient_id', ASCENDING)], 'file_id_recipient_id')
+
+
+key_store = KeyStore()
+
+
+def init_key_store(app):
+    """
+    Configure the key store from the Flask config and create indexes.
+    The startup connection is closed afterwards so forked workers reconnect.
+    """
+    key_store.configure(
+        uri=app.config.get('MONGO_URI'),
+        db_name=app.config.get('MONGO_DB_NAME'),
+        maxPoolSize=app.config.get('MONGO_MAX_POOL_SIZE'),
+        minPoolSize=app.config.get('MONGO_MIN_POOL_SIZE'),
+        connectTimeoutMS=app.config.get('MONGO_CONNECT_TIMEOUT_MS'),
+        serverSelectionTimeoutMS=app.config.get('MONGO_SERVER_SELECTION_TIMEOUT_MS'),
+        socketTimeoutMS=app.config.get('MONGO_SOCKET_TIMEOUT_MS'),
+        readPreference=app.config.get('MONGO_READ_PREFERENCE')
+    )
+    if app.config.get('MONGO_CREATE_INDEXES', True):
+        try:
+            key_store.ensure_indexes()
+        except Exception as e:
+            # Jangan gagalkan startup jika MongoDB belum siap
+            print(f"Warning: could not create key store indexes: {e}")
+        finally:
+            key_store.reset()
+
+
+def _user_keys():
+    return key_store.collection('user_keys')
+
+def _file_keys():
+    return key_store.collection('file_keys')
+
+def _shared_keys():
+    return key_store.collection('shared_keys')
+
+def store_file_key(file_id, owner_id, encrypted_key, wrap_scheme='RSA-OAEP'):
     """
     Menyimpan kunci AES file yang telah dienkripsi dengan Public Key Owner.
+    wrap_scheme mencatat skema pembungkus ('RSA-OAEP' atau 'X25519-HKDF-AESGCM').
     """
-    file_keys_collection.update_one(
+    _file_keys().update_one(
         {'file_id': file_id},
         {'$set': {
             'owner_id': owner_id,
-            'encrypted_key': encrypted_key
+            'encrypted_key': encrypted_key,
+            'wrap_scheme': wrap_scheme
         }},
         upsert=True
     )
 
 def get_file_key(file_id, owner_id):
     """Mengambil encrypted key berdasarkan file_id dan owner_id"""
-    doc = file_keys_collection.find_one({'file_id': file_id, 'owner_id': owner_id})
+    doc = _file_keys().find_one({'file_id': file_id, 'owner_id': owner_id})
     return doc['encrypted_key'] if doc else None
 
-def store_user_keys(user_id, public_key_pem, encrypted_private_key_pem):
-    """Store RSA keys in NoSQL"""
-    keys_collection.update_one(
+def store_user_keys(user_id, public_key_pem, encrypted_private_key_pem, key_scheme='RSA-OAEP'):
+    """Store user key pair (RSA or X25519) in NoSQL"""
+    _user_keys().update_one(
         {'user_id': user_id},
         {'$set': {
             'public_key': public_key_pem,
-            'private_key': encrypted_private_key_pem
+            'private_key': encrypted_private_key_pem,
+            'key_scheme': key_scheme
         }},
         upsert=True
     )
+    # Import di dalam fungsi: key_cache mengimpor modul ini
+    from utils.key_cache import public_key_cache
+    public_key_cache.invalidate(user_id)
 
 # --- [FUNGSI YANG HILANG DITAMBAHKAN DI SINI] ---
 def get_user_public_key(user_id):
     """Retrieve Public Key"""
-    doc = keys_collection.find_one({'user_id': user_id})
+    doc = _user_keys().find_one({'user_id': user_id})
     return doc['public_key'] if doc else None
 # -------------------------------------------------
 
-def store_shared_key(file_id, recipient_id, encrypted_key):
+def store_shared_key(file_id, recipient_id, encrypted_key, wrap_scheme='RSA-OAEP'):
     """
     Menyimpan kunci AES yang sudah dienkripsi dengan Public Key penerima (Consultant).
+    wrap_scheme mencatat skema pembungkus ('RSA-OAEP' atau 'X25519-HKDF-AESGCM').
     """
-    shared_keys_collection.update_one(
+    _shared_keys().update_one(
         {'file_id': file_id, 'recipient_id': recipient_id},
         {'$set': {
-            'encrypted_key': encrypted_key
+            'encrypted_key': encrypted_key,
+            'wrap_scheme': wrap_scheme
         }},
         upsert=True
     )
 
 def get_shared_key(file_id, recipient_id):
     """Mengambil shared key untuk recipient tertentu"""
-    doc = shared_keys_collection.find_one({'file_id': file_id, 'recipient_id': recipient_id})
+    doc = _shared_keys().find_one({'file_id': file_id, 'recipient_id': recipient_id})
     return doc['encrypted_key'] if doc else None
 
+def get_file_keys(file_ids):
+    """
+    Mengambil encrypted key banyak file dalam satu query.
+    Returns: dict {file_id: encrypted_key}
+    """
+    cursor = _file_keys().find(
+        {'file_id': {'$in': list(file_ids)}},
+        {'_id': 0, 'file_id': 1, 'encrypted_key': 1}
+    )
+    return {doc['file_id']: doc['encrypted_key'] for doc in cursor}
+
+def get_shared_keys(file_ids, recipient_id):
+    """
+    Mengambil shared key banyak file untuk satu recipient dalam satu query.
+    Returns: dict {file_id: encrypted_key}
+    """
+    cursor = _shared_keys().find(
+        {'file_id': {'$in': list(file_ids)}, 'recipient_id': recipient_id},
+        {'_id': 0, 'file_id': 1, 'encrypted_key': 1}
+    )
+    return {doc['file_id']: doc['encrypted_key'] for doc in cursor}
+
+def get_owner_file_keys(owner_id):
+    """
+    Mengambil semua encrypted file key milik owner dalam satu query.
+    Returns: list of dict {'file_id', 'encrypted_key', 'wrap_scheme'}
+    """
+    return list(_file_keys().find(
+        {'owner_id': owner_id},
+        {'_id': 0, 'file_id': 1, 'encrypted_key': 1, 'wrap_scheme': 1}
+    ))
+
+def bulk_store_shared_keys(recipient_id, entries):
+    """
+    Menyimpan banyak shared key untuk satu recipient dengan satu bulk_write.
+
+    Args:
+        recipient_id (int): Penerima (Consultant)
+        entries (list): tuple (file_id, encrypted_key, wrap_scheme)
+
+    Returns:
+        int: Jumlah dokumen yang di-insert atau di-update
+    """
+    operations = [
+        UpdateOne(
+            {'file_id': file_id, 'recipient_id': recipient_id},
+            {'$set': {'encrypted_key': encrypted_key, 'wrap_scheme': wrap_scheme}},
+            upsert=True
+        )
+        for file_id, encrypted_key, wrap_scheme in entries
+    ]
+    if not operations:
+        return 0
+    result = _shared_keys().bulk_write(operations, ordered=False)
+    return result.upserted_count + result.modified_count
+
 def get_user_private_key_enc(user_id):
     """Mengambil Encrypted Private Key user dari MongoDB"""
-    doc = keys_collection.find_one({'user_id': user_id})
+    doc = _user_keys().find_one({'user_id': user_id})
     return doc['private_key'] if doc else None
\ No newline at end of file
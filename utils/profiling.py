@@ -0,0 +1,184 @@
+"""
+Opt-in request profiling (PROFILING_ENABLED)
+Breaks a request down into named phases so a slow download/upload shows
+whether Mongo, the private-key KDF, the key unwrap, the disk, the cipher or
+the database is to blame.
+
+Every profiled request gets:
+    - the time of each span() / record() phase (spans may nest, e.g. the
+      'kdf' span runs inside 'unlock_key')
+    - the number and total time of SQL statements and Mongo commands
+    - a Server-Timing header with the phases finished before the response
+      was returned (phases of a streamed body, like the download cipher and
+      disk reads, happen after the headers are sent)
+    - a slow-request log line (all phases, including streamed ones) when the
+      request took longer than PROFILING_SLOW_REQUEST_MS, for a
+      PROFILING_SAMPLE_RATE fraction of slow requests
+
+Server-Timing is visible to the client, so only enable this while
+investigating.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import request
+from pymongo import monitoring
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_SLOW_REQUEST_MS = 500
+DEFAULT_SAMPLE_RATE = 1.0
+
+# Profil request yang sedang berjalan (None = profiling mati / di luar request)
+_current_profile = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Phase timings and SQL/Mongo counters of one request"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}  # name -> [seconds, calls], urutan sesuai kemunculan
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.mongo_count = 0
+        self.mongo_time = 0.0
+
+    def add(self, name, seconds):
+        phase = self.phases.setdefault(name, [0.0, 0])
+        phase[0] += seconds
+        phase[1] += 1
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self):
+        """Server-Timing header value (durations in milliseconds)"""
+        entries = [f'{name};dur={seconds * 1000:.3f}' for name, (seconds, _) in self.phases.items()]
+        entries.append(f'sql;dur={self.sql_time * 1000:.3f};desc="{self.sql_count} statements"')
+        entries.append(f'mongo;dur={self.mongo_time * 1000:.3f};desc="{self.mongo_count} commands"')
+        entries.append(f'total;dur={self.elapsed * 1000:.3f}')
+        return ', '.join(entries)
+
+    def summary(self):
+        """One-line breakdown for the slow-request log"""
+        phases = ' '.join(
+            f'{name}={seconds * 1000:.1f}ms' + (f'x{calls}' if calls > 1 else '')
+            for name, (seconds, calls) in self.phases.items()
+        )
+        return (
+            f'sql={self.sql_count}/{self.sql_time * 1000:.1f}ms '
+            f'mongo={self.mongo_count}/{self.mongo_time * 1000:.1f}ms {phases}'
+        ).rstrip()
+
+
+def current_profile():
+    """RequestProfile of the current request, or None when not profiling"""
+    return _current_profile.get()
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block as phase `name` of the current request (no-op when not profiling)
+
+    Usage:
+        with span('unwrap_key'):
+            raw_file_key = unwrap_key(user_private_key, encrypted_file_key)
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+
+def record(name, seconds):
+    """Add an already measured duration (e.g. PhaseTimer.elapsed) as phase `name`"""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add(name, seconds)
+
+
+# --- Penghitung SQL dan Mongo ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault('profiling_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    starts = conn.info.get('profiling_start')
+    if profile is None or not starts:
+        return
+    profile.sql_count += 1
+    profile.sql_time += time.perf_counter() - starts.pop()
+
+
+class MongoCommandCounter(monitoring.CommandListener):
+    """Counts the key store commands issued by the current request"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._count(event)
+
+    def failed(self, event):
+        self._count(event)
+
+    @staticmethod
+    def _count(event):
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.mongo_count += 1
+            profile.mongo_time += event.duration_micros / 1e6
+
+
+def init_profiling(app):
+    """Register the request hooks and SQL/Mongo counters when PROFILING_ENABLED is set"""
+    if not app.config.get('PROFILING_ENABLED', False):
+        return
+
+    from utils.nosql_handler import key_store
+
+    slow_seconds = app.config.get('PROFILING_SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS) / 1000
+    sample_rate = app.config.get('PROFILING_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    key_store.add_listener(MongoCommandCounter())
+
+    @app.before_request
+    def _start_profile():
+        _current_profile.set(RequestProfile())
+
+    @app.after_request
+    def _add_server_timing(response):
+        profile = _current_profile.get()
+        if profile is None:
+            return response
+        response.headers['Server-Timing'] = profile.server_timing()
+        method, path, status = request.method, request.full_path.rstrip('?'), response.status_code
+
+        # Dicatat setelah body selesai dikirim, jadi fase streaming ikut masuk log
+        def log_if_slow():
+            elapsed = profile.elapsed
+            if elapsed >= slow_seconds and random.random() < sample_rate:
+                print(f"Slow request: {method} {path} {status} {elapsed * 1000:.1f}ms {profile.summary()}")
+
+        response.call_on_close(log_if_slow)
+        return response
+
+    @app.teardown_request
+    def _end_profile(error=None):
+        _current_profile.set(None)
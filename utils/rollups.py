@@ -0,0 +1,385 @@
+"""
+Incremental rollups of CryptoLog metrics
+The crypto log writer folds every batch of log rows into crypto_log_rollups
+(daily buckets) and crypto_latency_histograms (daily, fixed log
+buckets), so dashboards read a few pre-aggregated rows instead of scanning
+crypto_logs.
+"""
+import math
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, and_, func
+
+from extensions import db
+from models.log import CryptoLog, CryptoLogRollup, CryptoLatencyHistogram
+from models.file import File
+
+# Hanya bucket harian: dasbor dan statistik user tidak membaca bucket per jam
+GRANULARITIES = ('day',)
+BACKFILL_BATCH_SIZE = 5000
+
+# Kolom kunci rollup (selain kolom agregat)
+KEY_COLUMNS = ('granularity', 'bucket_start', 'user_id', 'algorithm', 'operation', 'file_type', 'size_bucket')
+ROLLUP_MERGE = {
+    'sum': ('count', 'time_sum', 'time_sum_sq', 'setup_time_sum', 'cipher_time_sum', 'padding_time_sum',
+            'phase_count', 'size_sum', 'size_sum_sq'),
+    'min': ('time_min', 'size_min'),
+    'max': ('time_max', 'size_max'),
+}
+
+HISTOGRAM_KEY_COLUMNS = ('bucket_start', 'user_id', 'algorithm', 'operation', 'file_type', 'size_bucket', 'latency_bucket')
+HISTOGRAM_MERGE = {'sum': ('count',), 'min': (), 'max': ('max_time',)}
+
+# Operasi per file; 'cell_encrypt' (enkripsi per-sel Excel) dilaporkan terpisah
+FILE_OPERATIONS = ('encrypt', 'decrypt')
+
+# Bucket latensi: 8 sub-bucket per kelipatan dua mikrodetik (galat relatif < 9%)
+LATENCY_SUB_BUCKETS = 8
+PERCENTILES = (50, 90, 99)
+
+
+def size_bucket(data_size):
+    """Power-of-two size class: floor(log2(data_size)), 0 for empty / 1-byte data"""
+    if not data_size or data_size <= 1:
+        return 0
+    return int(data_size).bit_length() - 1
+
+
+def bucket_start(timestamp, granularity):
+    """Truncate a timestamp to the start of its hour or day"""
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def latency_bucket(execution_time):
+    """
+    Fixed log bucket for a duration in seconds. Bucket b > 0 covers
+    [2**((b-1)/8), 2**(b/8)) microseconds; bucket 0 is everything below 1 us.
+    """
+    microseconds = (execution_time or 0.0) * 1e6
+    if microseconds < 1:
+        return 0
+    return int(math.floor(math.log2(microseconds) * LATENCY_SUB_BUCKETS)) + 1
+
+
+def latency_bucket_upper(bucket):
+    """Upper bound of a latency bucket in seconds"""
+    return 2 ** (bucket / LATENCY_SUB_BUCKETS) / 1e6
+
+
+def aggregate_rows(rows, aggregates=None):
+    """
+    Fold log rows into per-key aggregates.
+
+    Args:
+        rows (iterable): Mappings with timestamp, user_id, algorithm, operation,
+                         file_type, data_size, execution_time and (optionally)
+                         success, setup_time, cipher_time and padding_time;
+                         failed operations (success=False) are skipped
+        aggregates (dict, optional): Existing aggregates to merge into
+
+    Returns:
+        dict: key tuple (see KEY_COLUMNS) -> aggregate values
+    """
+    if aggregates is None:
+        aggregates = {}
+    for row in rows:
+        # Operasi gagal dicatat dengan execution_time=0: jangan ikut rata-rata / time_min
+        if not row.get('success', True):
+            continue
+        execution_time = row['execution_time'] or 0.0
+        data_size = row['data_size'] or 0
+        phases = {f'{phase}_sum': row.get(phase) or 0.0 for phase in ('setup_time', 'cipher_time', 'padding_time')}
+        # Log lama (sebelum rincian fase) tidak ikut dihitung di phase_count
+        phases['phase_count'] = int(any(row.get(phase) is not None for phase in ('setup_time', 'cipher_time', 'padding_time')))
+        for granularity in GRANULARITIES:
+            key = (
+                granularity, bucket_start(row['timestamp'], granularity), row.get('user_id') or 0,
+                row['algorithm'], row['operation'], row.get('file_type') or '', size_bucket(data_size)
+            )
+            agg = aggregates.get(key)
+            if agg is None:
+                aggregates[key] = {
+                    'count': 1,
+                    'time_sum': execution_time, 'time_sum_sq': execution_time * execution_time,
+                    'time_min': execution_time, 'time_max': execution_time,
+                    **phases,
+                    'size_sum': data_size, 'size_sum_sq': float(data_size) * data_size,
+                    'size_min': data_size, 'size_max': data_size,
+                }
+                continue
+            agg['count'] += 1
+            agg['time_sum'] += execution_time
+            agg['time_sum_sq'] += execution_time * execution_time
+            agg['time_min'] = min(agg['time_min'], execution_time)
+            agg['time_max'] = max(agg['time_max'], execution_time)
+            for column, value in phases.items():
+                agg[column] += value
+            agg['size_sum'] += data_size
+            agg['size_sum_sq'] += float(data_size) * data_size
+            agg['size_min'] = min(agg['size_min'], data_size)
+            agg['size_max'] = max(agg['size_max'], data_size)
+    return aggregates
+
+
+def aggregate_latency(rows, histograms=None):
+    """
+    Fold log rows into daily latency histogram counts.
+    Failed operations (success=False) are skipped: they carry no real
+    duration and would all land in bucket 0.
+
+    Returns:
+        dict: key tuple (see HISTOGRAM_KEY_COLUMNS) -> {'count', 'max_time'}
+    """
+    if histograms is None:
+        histograms = {}
+    for row in rows:
+        if not row.get('success', True):
+            continue
+        execution_time = row['execution_time'] or 0.0
+        key = (
+            bucket_start(row['timestamp'], 'day'), row.get('user_id') or 0, row['algorithm'],
+            row['operation'], row.get('file_type') or '', size_bucket(row['data_size']),
+            latency_bucket(execution_time)
+        )
+        histogram = histograms.get(key)
+        if histogram is None:
+            histograms[key] = {'count': 1, 'max_time': execution_time}
+        else:
+            histogram['count'] += 1
+            histogram['max_time'] = max(histogram['max_time'], execution_time)
+    return histograms
+
+
+def _upsert_mysql(connection, table, values, merge):
+    from sqlalchemy.dialects.mysql import insert as mysql_insert
+    stmt = mysql_insert(table)
+    updates = {column: table.c[column] + stmt.inserted[column] for column in merge['sum']}
+    updates.update({column: func.least(table.c[column], stmt.inserted[column]) for column in merge['min']})
+    updates.update({column: func.greatest(table.c[column], stmt.inserted[column]) for column in merge['max']})
+    connection.execute(stmt.on_duplicate_key_update(**updates), values)  # executemany
+
+
+def _upsert_generic(connection, table, key_columns, values, merge):
+    # Fallback untuk dialek lain (mis. SQLite saat development): select lalu update/insert
+    for value in values:
+        condition = and_(*[table.c[column] == value[column] for column in key_columns])
+        existing = connection.execute(select(table).where(condition).with_for_update()).mappings().first()
+        if existing is None:
+            connection.execute(table.insert(), [value])
+            continue
+        updates = {column: existing[column] + value[column] for column in merge['sum']}
+        updates.update({column: min(existing[column], value[column]) for column in merge['min']})
+        updates.update({column: max(existing[column], value[column]) for column in merge['max']})
+        connection.execute(table.update().where(table.c.id == existing['id']).values(**updates))
+
+
+def _upsert(connection, model, key_columns, aggregates, merge):
+    if not aggregates:
+        return
+    table = model.__table__
+    values = [dict(zip(key_columns, key), **agg) for key, agg in aggregates.items()]
+    if connection.dialect.name == 'mysql':
+        _upsert_mysql(connection, table, values, merge)
+    else:
+        _upsert_generic(connection, table, key_columns, values, merge)
+
+
+def apply_rollups(connection, aggregates):
+    """Add aggregates to crypto_log_rollups inside the caller's transaction"""
+    _upsert(connection, CryptoLogRollup, KEY_COLUMNS, aggregates, ROLLUP_MERGE)
+
+
+def apply_latency_histograms(connection, histograms):
+    """Add histogram counts to crypto_latency_histograms inside the caller's transaction"""
+    _upsert(connection, CryptoLatencyHistogram, HISTOGRAM_KEY_COLUMNS, histograms, HISTOGRAM_MERGE)
+
+
+def record_rows(connection, rows):
+    """Fold freshly inserted log rows into the rollups and latency histograms"""
+    apply_rollups(connection, aggregate_rows(rows))
+    apply_latency_histograms(connection, aggregate_latency(rows))
+
+
+def backfill_rollups(batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Rebuild crypto_log_rollups and crypto_latency_histograms from every
+    crypto_logs row (joined to files for file_type).
+    Logs are read in id order in batches so memory only holds the aggregates.
+
+    Returns:
+        int: Number of log rows folded in
+    """
+    log_columns = [
+        CryptoLog.id, CryptoLog.timestamp, CryptoLog.user_id, CryptoLog.algorithm,
+        CryptoLog.operation, CryptoLog.data_size, CryptoLog.execution_time, CryptoLog.success,
+        CryptoLog.setup_time, CryptoLog.cipher_time, CryptoLog.padding_time, File.file_type
+    ]
+    aggregates = {}
+    histograms = {}
+    total = 0
+    with db.engine.begin() as connection:
+        last_id = 0
+        while True:
+            rows = connection.execute(
+                select(*log_columns)
+                .outerjoin(File, CryptoLog.file_id == File.id)
+                .where(CryptoLog.id > last_id)
+                .order_by(CryptoLog.id)
+                .limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+            aggregate_rows(rows, aggregates)
+            aggregate_latency(rows, histograms)
+            total += len(rows)
+            last_id = rows[-1]['id']
+
+        connection.execute(CryptoLogRollup.__table__.delete())
+        connection.execute(CryptoLatencyHistogram.__table__.delete())
+        apply_rollups(connection, aggregates)
+        apply_latency_histograms(connection, histograms)
+    return total
+
+
+def rollup_query(*group_columns, user_id=None, file_type=None, operations=None, granularity='day'):
+    """
+    Aggregate query over rollups grouped by the given CryptoLogRollup columns.
+    Rows carry the group columns plus operations, total_time, total_size,
+    min_time, max_time, the phase totals setup_time, cipher_time and padding_time,
+    and phase_operations (operations that recorded phase times).
+    """
+    query = db.session.query(
+        *group_columns,
+        func.coalesce(func.sum(CryptoLogRollup.count), 0).label('operations'),
+        func.coalesce(func.sum(CryptoLogRollup.time_sum), 0).label('total_time'),
+        func.coalesce(func.sum(CryptoLogRollup.size_sum), 0).label('total_size'),
+        func.min(CryptoLogRollup.time_min).label('min_time'),
+        func.max(CryptoLogRollup.time_max).label('max_time'),
+        func.coalesce(func.sum(CryptoLogRollup.setup_time_sum), 0).label('setup_time'),
+        func.coalesce(func.sum(CryptoLogRollup.cipher_time_sum), 0).label('cipher_time'),
+        func.coalesce(func.sum(CryptoLogRollup.padding_time_sum), 0).label('padding_time'),
+        func.coalesce(func.sum(CryptoLogRollup.phase_count), 0).label('phase_operations')
+    ).filter(CryptoLogRollup.granularity == granularity)
+    if user_id is not None:
+        query = query.filter(CryptoLogRollup.user_id == user_id)
+    if file_type is not None:
+        query = query.filter(CryptoLogRollup.file_type == file_type)
+    if operations is not None:
+        query = query.filter(CryptoLogRollup.operation.in_(operations))
+    if group_columns:
+        query = query.group_by(*group_columns)
+    return query
+
+
+def histogram_percentiles(buckets, percentiles=PERCENTILES):
+    """
+    Percentiles from merged histogram buckets.
+
+    Args:
+        buckets (dict): latency_bucket -> (count, max_time)
+
+    Returns:
+        dict: count, p50/p90/p99 (seconds, bucket upper bound capped at the
+              bucket's observed max) and max
+    """
+    total = sum(count for count, _ in buckets.values())
+    result = {'count': total, 'max': 0.0}
+    result.update({f'p{p}': 0.0 for p in percentiles})
+    if not total:
+        return result
+    ordered = sorted(buckets.items())
+    result['max'] = float(max(max_time or 0.0 for _, (_, max_time) in ordered))
+    for p in percentiles:
+        rank = max(1, math.ceil(p / 100 * total))
+        seen = 0
+        for bucket, (count, max_time) in ordered:
+            seen += count
+            if seen >= rank:
+                result[f'p{p}'] = min(latency_bucket_upper(bucket), float(max_time or 0.0))
+                break
+    return result
+
+
+def latency_percentiles(*group_columns, user_id=None, file_type=None, operations=None, since=None):
+    """
+    Latency percentiles per group, merged from the daily histograms.
+
+    Args:
+        group_columns: CryptoLatencyHistogram columns to group by
+        user_id (int, optional): Only this user's operations
+        file_type (str, optional): Only this file type
+        operations (iterable, optional): Only these operations
+        since (datetime, optional): Only days starting at or after this time
+
+    Returns:
+        dict: tuple of group values -> histogram_percentiles() result
+    """
+    query = db.session.query(
+        *group_columns,
+        CryptoLatencyHistogram.latency_bucket,
+        func.sum(CryptoLatencyHistogram.count),
+        func.max(CryptoLatencyHistogram.max_time)
+    )
+    if user_id is not None:
+        query = query.filter(CryptoLatencyHistogram.user_id == user_id)
+    if file_type is not None:
+        query = query.filter(CryptoLatencyHistogram.file_type == file_type)
+    if operations is not None:
+        query = query.filter(CryptoLatencyHistogram.operation.in_(operations))
+    if since is not None:
+        query = query.filter(CryptoLatencyHistogram.bucket_start >= bucket_start(since, 'day'))
+    query = query.group_by(*group_columns, CryptoLatencyHistogram.latency_bucket)
+
+    groups = {}
+    for row in query.all():
+        key = tuple(row[:len(group_columns)])
+        bucket, count, max_time = row[len(group_columns):]
+        groups.setdefault(key, {})[bucket] = (int(count), max_time)
+    return {key: histogram_percentiles(buckets) for key, buckets in groups.items()}
+
+
+def bytes_per_second(total_size, total_time):
+    """Aggregate throughput (total bytes / total seconds), None when no time was recorded"""
+    total_time = float(total_time or 0)
+    return int(total_size or 0) / total_time if total_time > 0 else None
+
+
+def throughput_stats(user_id=None, file_type=None, operations=None):
+    """
+    Size-normalized throughput per algorithm, operation and size class.
+    Throughput is total bytes over total time, so large files are not drowned
+    out by many tiny ones (and vice versa).
+
+    Returns:
+        dict: (algorithm, operation, size_bucket) -> operations, total_size,
+              total_time and bytes_per_second
+    """
+    rows = rollup_query(
+        CryptoLogRollup.algorithm, CryptoLogRollup.operation, CryptoLogRollup.size_bucket,
+        user_id=user_id, file_type=file_type, operations=operations
+    ).all()
+    return {
+        (row.algorithm, row.operation, row.size_bucket): {
+            'operations': int(row.operations),
+            'total_size': int(row.total_size),
+            'total_time': float(row.total_time),
+            'bytes_per_second': bytes_per_second(row.total_size, row.total_time),
+        }
+        for row in rows
+    }
+
+
+@click.command('backfill-rollups')
+@with_appcontext
+def backfill_rollups_command():
+    """Rebuild rollups and latency histograms from crypto_logs (run while the app is idle)."""
+    total = backfill_rollups()
+    click.echo(f"Rolled up {total} crypto log rows.")
+
+
+def init_rollups(app):
+    """Register the rollup CLI commands (flask backfill-rollups)"""
+    app.cli.add_command(backfill_rollups_command)